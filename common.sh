@@ -60,6 +60,12 @@ VALUE_RPMTRACKEDFILES=$PREUPGRADE_CACHE/rpmtrackedfiles.log
 #
 VALUE_RPM_RHSIGNED=$PREUPGRADE_CACHE/rpm_rhsigned.log
 
+#
+# Full path to file with all installed packages and their dist native flag
+# generated for the DEVEL_MODE and DIST_NATIVE of the assessment
+#
+VALUE_DIST_NATIVE_LIST=$PREUPGRADE_CACHE/dist_native.list
+
 #
 # Full path to log file with all local files
 #
@@ -417,6 +423,56 @@ check_applies_to() {
     fi
 }
 
+#
+# Installed packages loaded from $VALUE_DIST_NATIVE_LIST by _load_dist_native_list
+#
+declare -A _DIST_NATIVE_PKGS
+_DIST_NATIVE_NAMES=()
+_DIST_NATIVE_LOADED=""
+
+_read_dist_native_list() {
+    #
+    # Read $VALUE_DIST_NATIVE_LIST into _DIST_NATIVE_PKGS (package -> 0|1)
+    # and _DIST_NATIVE_NAMES; only shell builtins are used.
+    #
+    # Return 1 when the file is missing, older than the logs or generated
+    # for a different DEVEL_MODE and DIST_NATIVE.
+    #
+    local name native
+    [ -f "$VALUE_DIST_NATIVE_LIST" ] || return 1
+    [ "$VALUE_RPM_QA" -nt "$VALUE_DIST_NATIVE_LIST" ] && return 1
+    [ "$VALUE_RPM_RHSIGNED" -nt "$VALUE_DIST_NATIVE_LIST" ] && return 1
+    {
+        IFS=$'\t' read -r name native
+        [ "$name" == "#mode" ] \
+            && [ "$native" == "$DEVEL_MODE"$'\t'"$DIST_NATIVE" ] || return 1
+        while IFS=$'\t' read -r name native; do
+            [ -n "$name" ] || continue
+            _DIST_NATIVE_PKGS[$name]=$native
+            _DIST_NATIVE_NAMES+=("$name")
+        done
+    } < "$VALUE_DIST_NATIVE_LIST"
+    return 0
+}
+
+_load_dist_native_list() {
+    #
+    # Load the precomputed list of installed packages once per module
+    #
+    # Return 1 when the list can't be used; callers fall back to the logs.
+    #
+    if [ -z "$_DIST_NATIVE_LOADED" ]; then
+        if _read_dist_native_list; then
+            _DIST_NATIVE_LOADED=1
+        else
+            _DIST_NATIVE_PKGS=()
+            _DIST_NATIVE_NAMES=()
+            _DIST_NATIVE_LOADED=0
+        fi
+    fi
+    [ "$_DIST_NATIVE_LOADED" == "1" ]
+}
+
 is_pkg_installed() {
     #
     # Function checks if package is installed.
@@ -424,6 +480,11 @@ is_pkg_installed() {
     # Parameter is a package name which will be checked.
     # Return: 0 - package is installed
     #         1 - package is NOT installed
+    [ -z "$1" ] && return 1
+    if _load_dist_native_list; then
+        [ -n "${_DIST_NATIVE_PKGS[$1]}" ]
+        return
+    fi
     grep -q "^$1[[:space:]]" $VALUE_RPM_QA || return 1
     return 0
 }
@@ -592,6 +653,19 @@ is_dist_native() {
     fi
     local pkg=$1
 
+    if [ -n "$pkg" ] && _load_dist_native_list; then
+        case "${_DIST_NATIVE_PKGS[$pkg]}" in
+            1)
+                return 0
+                ;;
+            0)
+                return 1
+                ;;
+        esac
+        log_warning "Package $pkg is not installed on Red Hat Enterprise Linux system."
+        return 1
+    fi
+
     grep "^$pkg[[:space:]]" $VALUE_RPM_QA > /dev/null
     if [ $? -ne 0 ]; then
         log_warning "Package $pkg is not installed on Red Hat Enterprise Linux system."
@@ -636,6 +710,12 @@ get_dist_native_list() {
     #
     local pkg
     local line
+    if _load_dist_native_list; then
+        for pkg in "${_DIST_NATIVE_NAMES[@]}"; do
+            [ "${_DIST_NATIVE_PKGS[$pkg]}" == "1" ] && echo "$pkg"
+        done
+        return 0
+    fi
     while read line; do
         pkg=$(echo "$line" | grep -Eom1 '^[^[:space:]]+')
         is_dist_native "$pkg" >/dev/null && echo "$pkg"
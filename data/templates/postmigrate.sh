@@ -4,12 +4,13 @@ mkdir -p ${TEMP_DIR}
 cd ${TEMP_DIR}
 PREUPGRADE_LOG=/var/log/preupgrade.log
 touch ${PREUPGRADE_LOG}
-TAR_BALL=preupgrade.tar.gz
+TAR_BALL={TAR_BALL_NAME}
 echo "INFO: prepare tarball ${TAR_BALL}." >> ${PREUPGRADE_LOG}
 echo "{tar_ball}" > data
 base64 --decode data > ${TAR_BALL}
 echo "INFO: unpack tarball ${TAR_BALL}." >> ${PREUPGRADE_LOG}
-tar --selinux -xzvf ${TAR_BALL}
+# the compression (gzip or xz) is detected by tar
+tar --selinux -xvf ${TAR_BALL}
 # create symlinks
 ln -s {RESULT_NAME}/cleanconf cleanconf
 ln -s {RESULT_NAME}/dirtyconf dirtyconf
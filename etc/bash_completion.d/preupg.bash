@@ -4,7 +4,7 @@ _preupg_scan() {
 }
 
 _preupg_result(){
-    echo $(cd /root/preupgrade-results; ls -1 *.tar.gz)
+    echo $(cd /root/preupgrade-results; ls -1 *.tar.gz *.tar.xz 2>/dev/null)
 }
 
 _preupg() {
@@ -13,7 +13,7 @@ _preupg() {
     COMPREPLY=()
     cur="${COMP_WORDS[COMP_CWORD]}"
     prev="${COMP_WORDS[COMP_CWORD-1]}"
-    opts="-s --scan -v --verbose -d --debug --skip-common -u --upload -r --results --list-contents-set -c --contents
+    opts="-s --scan -v --verbose -d --debug --skip-common --refresh-common -j --jobs --engine --module-timeout --progress-format --compression --compression-level -u --upload -r --results --list-contents-set -c --contents
      -a --apply --riskcheck --force --text -m --mode --cleanup --select-rules --list-rules"
 
     #echo "SS${COMP_CWORD} and ${COMP_WORDS} and ${prev} and ${cur}SS"
@@ -41,11 +41,20 @@ _preupg() {
         opts="-v --verbose -d --debug"
         comps="$opts"
         ;;
+        "--engine")
+        comps="oscap native"
+        ;;
+        "--progress-format")
+        comps="tty plain json"
+        ;;
+        "--compression")
+        comps="gzip xz"
+        ;;
         *)
         prev="${COMP_WORDS[COMP_CWORD-2]}"
         case "${prev}" in
             "-s"|"--scan")
-            opts="-v --verbose -d --debug --skip-common --riskcheck --force --text"
+            opts="-v --verbose -d --debug --skip-common --refresh-common -j --jobs --engine --module-timeout --progress-format --compression --compression-level --riskcheck --force --text"
             comps="$opts"
             ;;
             "-u"|"--upload")
@@ -30,6 +30,9 @@ from preupg.xccdf import XccdfHelper
 from preupg.logger import log_message, LoggerHelper, logger, logger_report
 from preupg.logger import logger_debug
 from preupg.report_parser import ReportParser
+from preupg.sce_engine import SCEEngine
+from preupg.tarball import is_gzip
+from preupg.upload import ChunkedUpload
 from preupg.kickstart.application import KickstartGenerator
 from preupg.xmlgen.compose import XCCDFCompose
 from preupg.version import VERSION
@@ -207,15 +210,32 @@ class Application(object):
             log_message("Can't determine what tarball to upload to the UI.",
                         level=logging.ERROR)
             return False
-        file_content = FileHelper.get_file_content(tarball_results, 'rb',
-                                                   False, False)
-
-        binary = xmlrpclib.Binary(file_content)
+        if not is_gzip(tarball_results):
+            log_message("The UI accepts only tarballs compressed by gzip."
+                        " Run preupg with '--compression gzip' to upload"
+                        " the results.", level=logging.ERROR)
+            return False
         host = socket.gethostname()
-        response = proxy.submit.submit_new({
-            'data': binary,
-            'host': host,
-        })
+        upload = ChunkedUpload(proxy, tarball_results, host)
+        try:
+            response = upload.open()
+        except Fault:
+            # the server does not support chunked uploads
+            file_content = FileHelper.get_file_content(tarball_results, 'rb',
+                                                       False, False)
+            response = proxy.submit.submit_new({
+                'data': xmlrpclib.Binary(file_content),
+                'host': host,
+            })
+        else:
+            if response.get('status') == 'OK':
+                try:
+                    response = upload.send()
+                except (socket.error, xmlrpclib.ProtocolError) as ex:
+                    log_message('The upload of the report failed: %s' % ex)
+                    log_message("The upload of %s failed: %s"
+                                % (tarball_results, ex), level=logging.ERROR)
+                    return False
         try:
             status = response['status']
         except KeyError:
@@ -280,20 +300,24 @@ class Application(object):
                                                   self.module_set_dirname),
                                               self.conf.mode)
         # Execute assessment
-        self.scanning_progress = ScanProgress(self.get_total_check(), self.conf.debug)
+        self.scanning_progress = ScanProgress(self.get_total_check(),
+                                              self.conf.debug,
+                                              self.conf.progress_format)
         self.scanning_progress.set_names(self.report_parser.get_name_of_checks())
         log_message('%s:' % settings.assessment_text, new_line=True)
-        log_message('%.3d/%.3d ...running (%s)' % (
-                    1,
-                    self.get_total_check(),
-                    self.scanning_progress.get_full_name(0)),
-                    new_line=False
-                    )
         start_time = datetime.datetime.now()
-        self.scanning_progress.time = start_time
-        self.run_scan(function=self.scanning_progress.show_progress)
+        self.scanning_progress.start()
+        try:
+            self.run_scan(function=self.scanning_progress.show_progress)
+        finally:
+            self.scanning_progress.finish()
         end_time = datetime.datetime.now()
         diff = end_time - start_time
+        ScanningHelper.write_timings(
+            os.path.join(self.conf.assessment_results_dir,
+                         settings.module_timings),
+            self.scanning_progress.get_timings(),
+            self.scanning_progress.names)
         log_message(
             "The assessment finished (time %.2d:%.2ds)" % (diff.seconds / 60,
                                                            diff.seconds % 60)
@@ -304,6 +328,17 @@ class Application(object):
         The function is used for either scanning system or
         for applying changes on the target system
         """
+        if self.conf.engine == "native":
+            engine = SCEEngine(self.openscap_helper.content,
+                               self.openscap_helper.get_default_xml_result_path(),
+                               settings.profile,
+                               self.conf.jobs,
+                               self.conf.module_timeout)
+            ret_val = engine.run(function=function)
+            if self.scanning_progress is not None:
+                # the engine measures more than the progress can
+                self.scanning_progress.timings.update(engine.timings)
+            return ret_val
         cmd = self.openscap_helper.build_command()
         logger_debug.debug('running_command: %s', cmd)
         return ProcessHelper.run_subprocess(cmd, print_output=False, function=function)
@@ -342,15 +377,12 @@ class Application(object):
         """The function prepares a XML file for HTML creation"""
         # Reload XML file
         self.report_parser.reload_xml(self.openscap_helper.get_default_xml_result_path())
-        # strip whitespaces on start and end of stdout/stderr from modules
-        # inside the result.xml file
-        self.report_parser.strip_whitespaces()
-        # Replace fail in case of slight and medium risks with needs_inspection
-        self.report_parser.replace_inplace_risk(scanning_results=self.scanning_progress)
-        if not self.conf.debug:
-            self.report_parser.remove_debug_info()
-        self.report_parser.reload_xml(self.openscap_helper.get_default_xml_result_path())
-        self.report_parser.update_check_description()
+        # strip whitespaces on start and end of stdout/stderr from modules,
+        # replace fail in case of slight and medium risks with
+        # needs_inspection, remove debug messages and format descriptions
+        self.report_parser.postprocess_results(
+            scanning_results=self.scanning_progress,
+            remove_debug_info=not self.conf.debug)
         xml_report = self.openscap_helper.get_default_xml_result_path()
         if self.old_report_style:
             ReportParser.write_xccdf_version(xml_report, direction=True)
@@ -412,7 +444,7 @@ class Application(object):
         # First of all we need to delete the older one assessment
         self.clean_scan()
         self.prepare_scan_directories()
-        self.common = Common(self.conf)
+        self.common = Common(self.conf, self._devel_mode, self._dist_mode)
         if not self.conf.skip_common:
             if not self.common.common_results():
                 return ReturnValues.SCRIPT_TXT_MISSING
@@ -515,9 +547,14 @@ class Application(object):
             settings.assessment_results_dir)
 
         # It prints out result in table format
-        ScanningHelper.format_rules_to_table(main_report, "main contents")
-
-        self.tar_ball_name = TarballHelper.tarball_result_dir(self.conf.tarball_name, self.conf.verbose)
+        ScanningHelper.format_rules_to_table(
+            main_report, "main contents",
+            timings=self.scanning_progress.get_timings())
+
+        self.tar_ball_name = TarballHelper.tarball_result_dir(
+            self.conf.tarball_name, self.conf.verbose,
+            compression=self.conf.compression,
+            level=self.conf.compression_level, jobs=self.conf.jobs)
         log_message("The tarball with results is stored in '%s' ." % self.tar_ball_name)
         log_message("The latest assessment is stored in the '%s' directory." % self.conf.assessment_results_dir)
         # pack all configuration files to tarball
@@ -61,6 +61,66 @@ class CLI(object):
                  " touched, etc.) they can be reused from the previous runs of"
                  " Preupgrade Assistant."
         )
+        self.parser.add_option(
+            "--refresh-common",
+            action="store_true",
+            help="Generate all the files containing information about the"
+                 " system again. By default, the files whose inputs (e.g. RPM"
+                 " database, /etc/passwd) have not changed since the previous"
+                 " run of Preupgrade Assistant are reused."
+        )
+        self.parser.add_option(
+            "-j", "--jobs",
+            metavar="N",
+            type="int",
+            help="Run at most N scripts generating the files containing"
+                 " information about the system in parallel. The same limit"
+                 " applies to modules run by the native engine. The default"
+                 " is %d." % settings.jobs
+        )
+        self.parser.add_option(
+            "--engine",
+            type="choice",
+            choices=settings.engines,
+            help="Select the engine evaluating the modules: 'oscap' runs"
+                 " them one by one in OpenSCAP, 'native' runs independent"
+                 " modules in parallel. The default is '%s'." % settings.engine
+        )
+        self.parser.add_option(
+            "--progress-format",
+            metavar="FORMAT",
+            type="choice",
+            choices=settings.progress_formats,
+            help="Format of the progress of the assessment: 'tty' redraws"
+                 " a status line, 'plain' prints a line per module and"
+                 " 'json' prints a JSON object per event. The default is"
+                 " 'tty' on a terminal and 'plain' otherwise."
+        )
+        self.parser.add_option(
+            "--module-timeout",
+            metavar="SECONDS",
+            type="int",
+            help="Kill a module which does not finish in SECONDS and set its"
+                 " result to error. Applies only to the native engine. By"
+                 " default, modules are not limited."
+        )
+        self.parser.add_option(
+            "--compression",
+            type="choice",
+            choices=settings.compressions,
+            help="Compression of the tarball with results: 'gzip' or 'xz'."
+                 " With more jobs, gzip compresses blocks of the tarball in"
+                 " parallel. The WEB-UI accepts only gzip. The default is"
+                 " '%s'." % settings.compression
+        )
+        self.parser.add_option(
+            "--compression-level",
+            metavar="LEVEL",
+            type="int",
+            help="Compression level of the tarball with results from 0"
+                 " (fastest) to 9 (smallest). The default is %d."
+                 % settings.compression_level
+        )
         self.parser.add_option(
             "-d", "--debug",
             action="store_true",
@@ -193,9 +253,26 @@ class CLI(object):
         )
 
     def resolve_option_dependencies(self):
+        if self.opts.skip_common and self.opts.refresh_common:
+            raise OptionValueError("Use either --skip-common or"
+                                   " --refresh-common option, not both.")
         if self.opts.scan and self.opts.contents:
             raise OptionValueError("Use either --scan or --contents option,"
                                    " not both.")
+        if self.opts.jobs is not None and self.opts.jobs < 1:
+            raise OptionValueError("The --jobs option requires a positive"
+                                   " number.")
+        if self.opts.compression_level is not None and \
+                not 0 <= self.opts.compression_level <= 9:
+            raise OptionValueError("The --compression-level option requires"
+                                   " a number from 0 to 9.")
+        if self.opts.module_timeout is not None:
+            if self.opts.module_timeout < 1:
+                raise OptionValueError("The --module-timeout option requires"
+                                       " a positive number.")
+            if self.opts.engine != "native":
+                raise OptionValueError("The --module-timeout option requires"
+                                       " --engine native.")
 
 
 if __name__ == '__main__':
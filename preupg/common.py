@@ -6,25 +6,38 @@ to assessment
 
 from __future__ import unicode_literals
 import os
-import datetime
+import json
 import shutil
 from distutils import dir_util
 from preupg.utils import FileHelper, DirHelper, ProcessHelper
 from preupg.utils import SystemIdentification
-from preupg.logger import log_message
+from preupg.logger import log_message, logger_debug
+from preupg.scheduler import TaskScheduler
+from preupg.walker import FilesystemWalker, get_local_mount_points
+from preupg.package_index import PackageIndex, dbm, write_dist_native_list
 from preupg import settings
 
+try:
+    from hashlib import sha1
+except ImportError:
+    from sha import sha as sha1
+
 
 class Common(object):
 
     """Class handles with common log files"""
 
-    def __init__(self, conf):
+    def __init__(self, conf, devel_mode=0, dist_native=None):
         self.conf = conf
+        # mode of is_dist_native() of the module API
+        self.devel_mode = devel_mode
+        self.dist_native = "sign" if dist_native is None else dist_native
         self.cwd = ""
         self.lines = FileHelper.get_file_content(self.conf.common_scripts,
                                                  "rb", True)
         self.common_result_dir = ""
+        self.manifest = {}
+        self.old_manifest = {}
 
     def common_logfiles(self, filename):
         """build path for provided filename"""
@@ -46,32 +59,200 @@ class Common(object):
         """Function switch back to self.cwd"""
         os.chdir(self.cwd)
 
+    def get_common_scripts(self):
+        """
+        Returns list of common scripts which are to be run
+
+        Each item is a tuple (command, log file, name) parsed from
+        the lines of the scripts.txt file.
+        """
+        scripts = []
+        for line in self.lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            cmd, log_file, dummy_bash_value, name, dummy_values = line.split("=", 4)
+            scripts.append((cmd, log_file, name))
+        return scripts
+
+    def get_manifest_path(self):
+        """Returns path to the file with fingerprints of common logs"""
+        return self.common_logfiles(settings.common_manifest)
+
+    def load_manifest(self):
+        """Returns fingerprints of common logs stored by the previous run"""
+        try:
+            return json.loads(FileHelper.get_file_content(
+                self.get_manifest_path(), "rb"))
+        except (IOError, ValueError):
+            return {}
+
+    def save_manifest(self):
+        """Store fingerprints of the common logs"""
+        FileHelper.write_to_file(self.get_manifest_path(), "wb",
+                                 json.dumps(self.manifest, indent=4,
+                                            sort_keys=True))
+
+    def get_fingerprint(self, cmd, log_file):
+        """
+        Returns fingerprint of inputs of the log_file
+
+        The fingerprint is made from the command and from mtime and size of
+        the input files (settings.common_inputs) and of the logs the log_file
+        requires (settings.common_requires). Input directories contribute
+        also mtime and size of each of their entries, as editing a file in
+        place changes neither of the directory. None is returned for logs
+        without inputs; these are generated on every run.
+        """
+        inputs = list(settings.common_inputs.get(log_file, []))
+        inputs.extend(self.common_logfiles(x)
+                      for x in settings.common_requires.get(log_file, []))
+        if not inputs:
+            return None
+        fingerprint = [cmd]
+        for path in inputs:
+            try:
+                path_stat = os.stat(path)
+            except OSError:
+                fingerprint.append("%s:missing" % path)
+                continue
+            fingerprint.append("%s:%r:%d" % (path, path_stat.st_mtime,
+                                             path_stat.st_size))
+            if not os.path.isdir(path):
+                continue
+            for name in sorted(os.listdir(path)):
+                entry = os.path.join(path, name)
+                try:
+                    # links in rc.d are not followed, they are the input
+                    entry_stat = os.lstat(entry)
+                except OSError:
+                    continue
+                fingerprint.append("%s:%r:%d" % (entry, entry_stat.st_mtime,
+                                                 entry_stat.st_size))
+        return sha1('\n'.join(fingerprint).encode(settings.defenc)).hexdigest()
+
+    def run_common_script(self, cmd, log_file):
+        """
+        Run one common script and store its output to the log_file
+
+        The script is skipped and None is returned when the log exists and
+        its inputs have not changed since the previous run.
+        """
+        common_file_path = self.common_logfiles(log_file)
+        fingerprint = self.get_fingerprint(cmd, log_file)
+        if fingerprint is not None:
+            if not self.conf.refresh_common and \
+                    os.path.exists(common_file_path) and \
+                    self.old_manifest.get(log_file) == fingerprint:
+                self.manifest[log_file] = fingerprint
+                return None
+        ret_val = ProcessHelper.run_subprocess(cmd, output=common_file_path, shell=True)
+        if fingerprint is not None:
+            self.manifest[log_file] = fingerprint
+        return ret_val
+
+    def run_walker(self, log_files):
+        """Generate all the log_files by a single walk over local filesystems"""
+        walker = FilesystemWalker(get_local_mount_points(),
+                                  temp_dir=self.get_common_dir())
+        for log_file in log_files:
+            walker.add_projection(self.common_logfiles(log_file),
+                                  settings.common_walker_logs[log_file])
+        walker.run()
+        return 0
+
+    def build_package_index(self):
+        """
+        Store index of installed packages used by the module API
+
+        The list of dist native packages is stored for the current mode on
+        every run; None is returned when the stored index is up to date.
+        Both are optional, modules parse the logs themselves when they are
+        missing.
+        """
+        rpm_qa, rpm_rhsigned = [self.common_logfiles(x)
+                                for x in settings.package_index_logs]
+        db_path = self.common_logfiles(settings.package_index_db)
+        index = PackageIndex.from_db(db_path, rpm_qa, rpm_rhsigned)
+        ret_val = None
+        try:
+            if index is None or self.conf.refresh_common:
+                if index is not None:
+                    index.close()
+                index = PackageIndex.from_logs(rpm_qa, rpm_rhsigned)
+                index.write_db(db_path, rpm_qa, rpm_rhsigned)
+                ret_val = 0
+            write_dist_native_list(
+                self.common_logfiles(settings.dist_native_list), index,
+                self.devel_mode, self.dist_native)
+        except (IOError, OSError, dbm.error) as e:
+            logger_debug.debug("Unable to store index of packages '%s': %s",
+                               db_path, e)
+            ret_val = 1
+        if index is not None:
+            index.close()
+        return ret_val
+
     def common_results(self):
-        """run common scripts"""
+        """
+        run common scripts
+
+        Scripts are run in parallel (at most conf.jobs at once). A script
+        which reads a log generated by another script (see
+        settings.common_requires) is started after the log is generated.
+        Logs listed in settings.common_walker_logs are generated together
+        by one walk over the local filesystems instead of their commands.
+        Logs whose inputs have not changed since the previous run are
+        reused unless conf.refresh_common is set.
+        """
         log_message("Gathering logs used by the Preupgrade Assistant:")
         self.switch_dir()
         try:
-            max_length = max(max([len(x.split("=", 4)[3]) for x in self.lines]), len(settings.assessment_text))
-            # Log files which will not be updated
-            # when RPM database is not changed
-            for counter, line in enumerate(self.lines):
-                line = line.strip()
-                if line.startswith("#"):
-                    continue
-                cmd, log_file, dummy_bash_value, name, values = line.split("=", 4)
-                log_message("%s : %.2d/%d ...running" % (name.ljust(max_length),
-                                                         counter+1,
-                                                         len(self.lines)),
-                            new_line=False)
-                start_time = datetime.datetime.now()
-                common_file_path = self.common_logfiles(log_file)
-                ProcessHelper.run_subprocess(cmd, output=common_file_path, shell=True)
-                end_time = datetime.datetime.now()
-                diff = end_time - start_time
-                log_message(" %sfinished (time %.2d:%.2ds)" % ('\b' * 8,
-                                                               diff.seconds / 60,
-                                                               diff.seconds % 60))
-                # os.chmod(common_file_path, 0640)
+            # the manifest is valid again only when all the logs are generated
+            self.old_manifest = self.load_manifest()
+            self.manifest = {}
+            if os.path.exists(self.get_manifest_path()):
+                os.remove(self.get_manifest_path())
+            scripts = self.get_common_scripts()
+            max_length = max(max([len(x[2]) for x in scripts]), len(settings.assessment_text))
+            names = dict((log_file, name) for dummy_cmd, log_file, name in scripts)
+            walker_logs = [x[1] for x in scripts
+                           if x[1] in settings.common_walker_logs]
+            scheduler = TaskScheduler(self.conf.jobs)
+            for cmd, log_file, dummy_name in scripts:
+                if log_file not in walker_logs:
+                    scheduler.add_task(log_file, self.run_common_script,
+                                       args=(cmd, log_file),
+                                       requires=settings.common_requires.get(log_file))
+                elif log_file == walker_logs[0]:
+                    scheduler.add_task(log_file, self.run_walker,
+                                       args=(walker_logs,))
+                else:
+                    # generated by the walker task; finishes together with it
+                    scheduler.add_task(log_file, lambda: 0,
+                                       requires=[walker_logs[0]])
+            if not [x for x in settings.package_index_logs if x not in names]:
+                names[settings.package_index_db] = "Index of installed packages"
+                scheduler.add_task(settings.package_index_db,
+                                   self.build_package_index,
+                                   requires=settings.package_index_logs)
+            finished = []
+
+            def show_progress(log_file, ret_val, diff):
+                finished.append(log_file)
+                if ret_val is None:
+                    status = "cached (not changed since the previous run)"
+                else:
+                    status = "finished (time %.2d:%.2ds)" % (diff.seconds / 60,
+                                                             diff.seconds % 60)
+                log_message("%s : %.2d/%d ...%s"
+                            % (names[log_file].ljust(max_length),
+                               len(finished),
+                               len(names),
+                               status))
+
+            scheduler.run(callback=show_progress)
+            self.save_manifest()
             self.switch_back_dir()
         except IOError:
             return 0
@@ -164,6 +164,7 @@ class KickstartGenerator(object):
         if os.path.exists(tarball):
             tarball_content = FileHelper.get_file_content(tarball, 'rb', decode_flag=False)
             tarball_name = os.path.splitext(os.path.splitext(os.path.basename(tarball))[0])[0]
+            extension = os.path.basename(tarball)[len(tarball_name):]
         script_str = ''
         try:
             script_path = settings.KS_POSTSCRIPT_TEMPLATE
@@ -175,6 +176,13 @@ class KickstartGenerator(object):
             log_message("Cannot open the script template: {0}.".format(script_path))
             return
         if tarball_content is not None:
+            if '{TAR_BALL_NAME}' not in script_str and extension != '.tar.gz':
+                # templates copied by older versions unpack gzip only
+                log_message("The script template %s can not unpack the %s tarball;"
+                            " remove it to get the current one."
+                            % (os.path.join(settings.KS_DIR, script_path), extension))
+                return
+            script_str = script_str.replace('{TAR_BALL_NAME}', 'preupgrade' + extension)
             script_str = script_str.replace('{tar_ball}', base64.b64encode(tarball_content))
             script_str = script_str.replace('{RESULT_NAME}', tarball_name)
             script_str = script_str.replace('{TEMPORARY_PREUPG_DIR}', '/root/preupgrade')
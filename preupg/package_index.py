@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Index of installed packages used by the module API
+
+The index is built from the common logs rpm_qa.log (all installed packages)
+and rpm_rhsigned.log (packages signed by Red Hat). It is built once per
+process and kept in memory. Common also stores the index into a dbm file in
+the common directory, so modules running in separate processes look up
+packages directly from it instead of parsing the logs again.
+
+Common also stores the list of installed packages with their dist native
+flag for the DEVEL_MODE and DIST_NATIVE of the assessment (see
+write_dist_native_list). It is a plain text file with one package per line
+so that Bash modules can load it without running any command.
+"""
+
+from __future__ import unicode_literals
+import os
+
+try:
+    import anydbm as dbm
+except ImportError:
+    import dbm
+
+from preupg import settings
+from preupg.utils import FileHelper
+
+# Key of the record with fingerprint of the logs the dbm index was built
+# from. Package names can't contain spaces, so it can't clash with them.
+SOURCE_KEY = b' source'
+
+# First field of the line of the dist native list with DEVEL_MODE and
+# DIST_NATIVE the list was generated for
+MODE_KEY = '#mode'
+
+
+def _get_source_fingerprint(rpm_qa, rpm_rhsigned):
+    fingerprint = []
+    for path in [rpm_qa, rpm_rhsigned]:
+        stat = os.stat(path)
+        fingerprint.append("%s:%r:%d" % (path, stat.st_mtime, stat.st_size))
+    return '\n'.join(fingerprint)
+
+
+def _parse_log(path):
+    """Returns list of (name, vendor, signature) from a rpm -qa log"""
+    packages = []
+    for line in FileHelper.get_file_content(path, "rb", True):
+        fields = line.rstrip('\n').split('\t')
+        if not fields[0].strip():
+            continue
+        fields += [''] * (3 - len(fields))
+        packages.append((fields[0].strip(), fields[1], fields[2]))
+    return packages
+
+
+class PackageIndex(object):
+
+    """
+    Lookups of installed packages by name
+
+    Each package has a record (position, vendor, signature, signed) where
+    position is the order of the package in rpm_qa.log.
+    """
+
+    def __init__(self, records=None, db=None):
+        self.records = records or {}
+        self.db = db
+        self.names = None
+
+    @staticmethod
+    def from_logs(rpm_qa, rpm_rhsigned):
+        """Build the index from the common logs"""
+        try:
+            signed = set(x[0] for x in _parse_log(rpm_rhsigned))
+        except IOError:
+            # no package is signed when the log is missing
+            signed = set()
+        records = {}
+        for position, (name, vendor, signature) in enumerate(_parse_log(rpm_qa)):
+            if name not in records:
+                records[name] = (position, vendor, signature, name in signed)
+        return PackageIndex(records)
+
+    @staticmethod
+    def from_db(db_path, rpm_qa, rpm_rhsigned):
+        """
+        Open the index stored by write_db
+
+        Returns None when the index does not exist or it was built from
+        logs different from rpm_qa and rpm_rhsigned.
+        """
+        try:
+            db = dbm.open(db_path, 'r')
+        except Exception:
+            return None
+        try:
+            source = db[SOURCE_KEY].decode(settings.defenc)
+            if source != _get_source_fingerprint(rpm_qa, rpm_rhsigned):
+                raise ValueError("Index %s is outdated" % db_path)
+        except Exception:
+            db.close()
+            return None
+        return PackageIndex(db=db)
+
+    def write_db(self, db_path, rpm_qa, rpm_rhsigned):
+        """Store the index into the dbm file db_path"""
+        db = dbm.open(db_path, 'n')
+        try:
+            for name, record in self.records.items():
+                value = '%d\t%s\t%s\t%d' % (record[0], record[1], record[2],
+                                           int(record[3]))
+                db[name.encode(settings.defenc)] = value.encode(settings.defenc)
+            db[SOURCE_KEY] = _get_source_fingerprint(
+                rpm_qa, rpm_rhsigned).encode(settings.defenc)
+        finally:
+            db.close()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    @staticmethod
+    def _decode_record(value):
+        position, vendor, signature, signed = \
+            value.decode(settings.defenc).split('\t')
+        return int(position), vendor, signature, signed == '1'
+
+    def get_record(self, name):
+        """Returns record of the package or None when it is not installed"""
+        try:
+            return self.records[name]
+        except KeyError:
+            if self.db is None:
+                return None
+        try:
+            value = self.db[name.encode(settings.defenc)]
+        except KeyError:
+            return None
+        self.records[name] = self._decode_record(value)
+        return self.records[name]
+
+    def is_installed(self, name):
+        return self.get_record(name) is not None
+
+    def is_signed(self, name):
+        """Returns True when the package is installed and signed by Red Hat"""
+        record = self.get_record(name)
+        return record is not None and record[3]
+
+    def get_vendor(self, name):
+        record = self.get_record(name)
+        if record is None:
+            return None
+        return record[1].strip()
+
+    def get_names(self):
+        """Returns names of all installed packages in order of rpm_qa.log"""
+        if self.names is None:
+            if self.db is not None:
+                for key in self.db.keys():
+                    if key != SOURCE_KEY:
+                        self.records[key.decode(settings.defenc)] = \
+                            self._decode_record(self.db[key])
+            self.names = sorted(self.records,
+                                key=lambda x: self.records[x][0])
+        return self.names
+
+    def get_dist_native_names(self, devel_mode, dist_native):
+        """
+        Returns names of dist native packages in order of rpm_qa.log
+
+        Signed packages are dist native unless devel mode is turned on and
+        dist_native is "all" (all packages) or a path to a file with names
+        of the dist native packages.
+        """
+        names = self.get_names()
+        if int(devel_mode) == 0 or dist_native == "sign":
+            return [x for x in names if self.is_signed(x)]
+        if dist_native == "all":
+            return list(names)
+        try:
+            listed = set(x.strip() for x in
+                         FileHelper.get_file_content(dist_native, "rb", True))
+        except IOError:
+            listed = set()
+        return [x for x in names if x in listed]
+
+
+def _get_mode_line(devel_mode, dist_native):
+    return '%s\t%s\t%s' % (MODE_KEY, devel_mode, dist_native)
+
+
+def write_dist_native_list(path, index, devel_mode, dist_native):
+    """
+    Store installed packages with their dist native flag into path
+
+    The first line holds the mode the list is valid for, each next line
+    a package name and 1 (dist native) or 0 separated by a tab.
+    """
+    native = set(index.get_dist_native_names(devel_mode, dist_native))
+    lines = [_get_mode_line(devel_mode, dist_native)]
+    lines.extend('%s\t%d' % (x, x in native) for x in index.get_names())
+    FileHelper.write_to_file(path, 'wb', '\n'.join(lines) + '\n')
+
+
+def read_dist_native_list(path, logs, devel_mode, dist_native):
+    """
+    Returns list of (name, dist native) stored by write_dist_native_list
+
+    None is returned when the list does not exist, it is older than any
+    of the logs or it was stored for a different mode.
+    """
+    try:
+        mtime = os.stat(path).st_mtime
+        if [x for x in logs if os.stat(x).st_mtime > mtime]:
+            return None
+        lines = FileHelper.get_file_content(path, "rb", True)
+    except (IOError, OSError):
+        return None
+    if not lines or lines[0].rstrip('\n') != _get_mode_line(devel_mode,
+                                                             dist_native):
+        return None
+    packages = []
+    for line in lines[1:]:
+        name, native = line.rstrip('\n').split('\t')
+        packages.append((name, native == '1'))
+    return packages
+
+
+_indexes = {}
+
+
+def get_package_index(rpm_qa, rpm_rhsigned):
+    """
+    Returns the index of packages for the given logs
+
+    The index is created only once per process. The dbm index stored by
+    Common next to the logs is used when it is up to date, otherwise the
+    index is built from the logs.
+    """
+    key = (rpm_qa, rpm_rhsigned)
+    if key not in _indexes:
+        db_path = os.path.join(os.path.dirname(rpm_qa),
+                               settings.package_index_db)
+        index = PackageIndex.from_db(db_path, rpm_qa, rpm_rhsigned)
+        if index is None:
+            index = PackageIndex.from_logs(rpm_qa, rpm_rhsigned)
+        _indexes[key] = index
+    return _indexes[key]
@@ -65,6 +65,41 @@ class ReportParser(object):
         self.changed_results = {}
         self.output_data = []
 
+    def _get_target_tree(self):
+        return self._target_tree
+
+    def _set_target_tree(self, tree):
+        self._target_tree = tree
+        self.invalidate_index()
+
+    # the indexes of the tree are built again when the tree is replaced
+    target_tree = property(_get_target_tree, _set_target_tree)
+
+    def invalidate_index(self):
+        """
+        Drop the indexes of rules and selects by id
+
+        Called when target_tree is replaced. ReportParser never adds or
+        removes Rule or select elements of the tree, only their attributes
+        and results change, so the indexes stay valid until then.
+        """
+        self._rule_index = None
+        self._select_index = None
+
+    def get_rule(self, rule_id):
+        """Returns the Rule element with the id or None"""
+        if self._rule_index is None:
+            self._rule_index = dict((x.get('id', ''), x)
+                                    for x in self._get_all_rules())
+        return self._rule_index.get(rule_id)
+
+    def get_select(self, idref):
+        """Returns the select element of the profile with the idref or None"""
+        if self._select_index is None:
+            self._select_index = dict((x.get('idref', ''), x)
+                                      for x in self.get_select_rules())
+        return self._select_index.get(idref)
+
     def filter_children(self, tree, tag):
         return self.get_nodes(tree, tag, prefix='./')
 
@@ -130,13 +165,24 @@ class ReportParser(object):
         return self.get_nodes(self.target_tree, "Rule", prefix=".//")
 
     def get_name_of_checks(self):
-        """Function returns a names of rules"""
+        """
+        Function returns a names of rules
+
+        Titles are taken from the module manifest of the module set when
+        it exists.
+        """
         list_names = {}
-        rule_nodes = self._get_all_rules()
+        titles = {}
+        modules = XccdfHelper.get_module_manifest(os.path.dirname(self.path))
+        if modules is not None:
+            titles = dict((x["rule_id"], x["title"]) for x in modules)
         for select in self.get_allowed_selected_rules():
             id_ref = select.get('idref', '')
-            rule = [x for x in rule_nodes if x.get('id', '') == id_ref]
-            list_names[id_ref] = self.get_nodes_text(rule[0], "title")
+            if id_ref in titles:
+                list_names[id_ref] = titles[id_ref]
+            else:
+                list_names[id_ref] = self.get_nodes_text(
+                    self.get_rule(id_ref), "title")
         return list_names
 
     def get_all_result_rules(self):
@@ -156,7 +202,6 @@ class ReportParser(object):
         # we really must set encoding here! and suppress it in write_to_file
         data = ElementTree.tostring(self.target_tree, "utf-8")
         FileHelper.write_to_file(self.path, 'wb', data, False)
-        self.target_tree = ElementTree.parse(self.path).getroot()
 
     def modify_result_path(self, result_dir, scenario, mode):
         """Function modifies result path in XML file"""
@@ -186,11 +231,29 @@ class ReportParser(object):
                         self.get_nodes_text(rule, "title"),
                         res.text)
 
+    def postprocess_results(self, scanning_results=None, remove_debug_info=True):
+        """
+        Run all transformations of the results after the scan
+
+        The transformations are passes over the tree in memory; the file
+        is written only once at the end.
+        """
+        self.strip_whitespaces()
+        self._replace_inplace_risk(scanning_results)
+        if remove_debug_info:
+            self._remove_debug_info()
+        self._update_check_description()
+        self.write_xml()
+
     def replace_inplace_risk(self, scanning_results=None):
         """
         This function has aim to replace FAILED to
         NEEDS_INSPECTION in case that risks are SLIGHT or MEDIUM
         """
+        self._replace_inplace_risk(scanning_results)
+        self.write_xml()
+
+    def _replace_inplace_risk(self, scanning_results=None):
         #Filter all rule-result in TestResult
         changed_fields = []
         self.remove_empty_check_import()
@@ -222,8 +285,6 @@ class ReportParser(object):
         if scanning_results:
             scanning_results.update_data(changed_fields)
 
-        self.write_xml()
-
     def remove_empty_check_import(self):
         """Remove stdout or stderr check-import tags whose text is either empty
         or contains nothing but whitespace characters.
@@ -238,6 +299,10 @@ class ReportParser(object):
 
     def remove_debug_info(self):
         """Function removes debug information from report"""
+        self._remove_debug_info()
+        self.write_xml()
+
+    def _remove_debug_info(self):
         re_expr = r'^preupg.log.DEBUG.*'
         for rule in self.get_all_result_rules():
             for check_import in self.filter_grandchildren(rule,
@@ -250,7 +315,6 @@ class ReportParser(object):
                         if not matched:
                             new_check.append(check)
                     check_import.text = '\n'.join(new_check)
-        self.write_xml()
 
     def strip_whitespaces(self):
         """Strip specific whitespace characters from the start and end of
@@ -282,6 +346,10 @@ class ReportParser(object):
         FileHelper.write_to_file(file_name, 'wb', content)
 
     def update_check_description(self):
+        self._update_check_description()
+        self.write_xml()
+
+    def _update_check_description(self):
         logger_report.debug("Update check description")
         for rule in self._get_all_rules():
             for description in self.filter_children(rule, 'description'):
@@ -305,7 +373,6 @@ class ReportParser(object):
                 if found == 1:
                     lines.append('</ns0:' + tag_exp_results + '>')
                     description.text = '\n'.join(lines)
-        self.write_xml()
 
     def select_rules(self, list_rules):
         """
@@ -313,6 +380,7 @@ class ReportParser(object):
 
         :return:
         """
+        list_rules = set(list_rules)
         for select in self.get_select_rules():
             idref = select.get('idref', None)
             logger_report.debug(select)
@@ -330,9 +398,14 @@ class ReportParser(object):
         :return: List of rules which does not exist
         """
         unknown_rules = []
+        idrefs = None
         for select in list_rules:
-            found = [i for i in self.get_select_rules() if select in i.get('idref')]
-            if not found:
+            if self.get_select(select) is not None:
+                continue
+            # a part of a rule id is accepted as well
+            if idrefs is None:
+                idrefs = [i.get('idref', '') for i in self.get_select_rules()]
+            if not [i for i in idrefs if select in i]:
                 unknown_rules.append(select)
         return unknown_rules
 
@@ -1,9 +1,16 @@
 
 from __future__ import unicode_literals
 import datetime
+import fcntl
+import json
 import os
-import subprocess
+import signal
+import struct
+import sys
+import termios
+import time
 from preupg.logger import settings, logger_report, log_message, logging
+from preupg.utils import FileHelper
 
 
 class ScanningHelper(object):
@@ -31,8 +38,56 @@ class ScanningHelper(object):
                 return '99'
 
     @staticmethod
-    def format_rules_to_table(output_data, content):
-        """Function format output_data to table"""
+    def write_timings(path, timings, names):
+        """
+        Store resources used by modules into JSON file
+
+        timings .. {rule id: {'wall_time': seconds, ...}}
+        names .. {rule id: title of the module}
+        """
+        data = {}
+        for rule_id, timing in timings.items():
+            data[rule_id] = dict(timing, title=names.get(rule_id, ''))
+        FileHelper.write_to_file(path, "wb",
+                                 json.dumps(data, indent=4, sort_keys=True))
+
+    @staticmethod
+    def format_slowest_rules(output_data, timings, count):
+        """Function prints count modules which took the longest time"""
+        titles = {}
+        for data in output_data:
+            try:
+                title, rule_id, dummy_result = data.split(':')
+            except ValueError:
+                continue
+            titles[rule_id] = title
+        slowest = sorted([x for x in timings if x in titles],
+                         key=lambda x: timings[x]['wall_time'],
+                         reverse=True)[:count]
+        if not slowest:
+            return
+        max_title_length = max(len(titles[x]) for x in slowest) + 5
+        log_message("The slowest modules:")
+        message = '-' * (max_title_length + 14)
+        log_message(message)
+        for rule_id in slowest:
+            seconds = int(timings[rule_id]['wall_time'])
+            if timings[rule_id].get('timed_out'):
+                duration = 'timeout'
+            else:
+                duration = '%.2d:%.2ds' % (seconds / 60, seconds % 60)
+            log_message(u"|%s |%s|" % (titles[rule_id].ljust(max_title_length),
+                                      duration.ljust(10)))
+        log_message(message)
+
+    @staticmethod
+    def format_rules_to_table(output_data, content, timings=None):
+        """
+        Function format output_data to table
+
+        When timings of modules are given, the slowest modules are listed
+        below the table.
+        """
         if not output_data:
             # If output_data does not contain anything then do not print nothing
             return
@@ -51,19 +106,51 @@ class ScanningHelper(object):
                 log_message(u"|%s |%s|" % (title.ljust(max_title_length),
                                           result.strip().ljust(max_result_length)))
         log_message(message)
+        if timings:
+            ScanningHelper.format_slowest_rules(output_data, timings,
+                                                settings.slowest_modules)
+
+
+def get_terminal_width(default=80):
+    """Function returns width of the terminal on stdout by ioctl"""
+    try:
+        data = fcntl.ioctl(sys.stdout.fileno(), termios.TIOCGWINSZ, b'\0' * 8)
+        width = struct.unpack(b'hhhh', data)[1]
+    except (IOError, OSError, ValueError, AttributeError):
+        return default
+    return width or default
 
 
 class ScanProgress(object):
-    """The class is used for showing progress during the scan check."""
-    def __init__(self, total_count, debug):
+    """
+    The class is used for showing progress during the scan check.
+
+    Output formats (settings.progress_formats):
+      tty   .. a line for each finished rule plus a status line with
+               the running rule, redrawn at most once per
+               settings.progress_refresh_interval seconds
+      plain .. only a line for each finished rule
+      json  .. a JSON object for each event, one per line
+    By default, tty is used when stdout is a terminal, plain otherwise.
+    """
+    def __init__(self, total_count, debug, output_format=None):
         self.total_count = total_count
         self.current_count = 0
         self.output_data = []
         self.debug = debug
         self.names = {}
         self.list_names = []
-        self.width_size = 0
+        if output_format is None:
+            output_format = "tty" if sys.stdout.isatty() else "plain"
+        self.output_format = output_format
+        self.width_size = get_terminal_width()
         self.time = datetime.datetime.now()
+        # {rule id: {'wall_time': seconds, ...}}
+        self.timings = {}
+        # lines waiting for the next redraw and time of the last one
+        self.pending_lines = []
+        self.last_render = 0
+        self.old_sigwinch = None
 
     def get_full_name(self, count):
         """Function returns full name from dictionary"""
@@ -73,59 +160,113 @@ class ScanProgress(object):
             return ''
         return self.names[key]
 
-    @staticmethod
-    def get_terminal_width():
+    def _update_width(self, dummy_signum=None, dummy_frame=None):
+        self.width_size = get_terminal_width()
+
+    def _return_correct_msg(self, msg, width=None):
+        if width is None:
+            width = self.width_size
+        if len(msg) > width:
+            msg = msg[:width - 7] + '...'
+        return msg
+
+    def _emit_json(self, event, **data):
+        data['event'] = event
+        log_message(json.dumps(data, sort_keys=True))
+
+    def _get_status_line(self):
+        if self.total_count <= self.current_count:
+            return ''
+        return self._return_correct_msg(u'%.3d/%.3d ...running (%s)'
+                                        % (self.current_count + 1,
+                                           self.total_count,
+                                           self.get_full_name(self.current_count)))
+
+    def render(self, force=False):
         """
-        Function returns terminal width
+        Print the pending lines and redraw the status line
 
-        :return:
+        Nothing is printed when the previous redraw happened less than
+        settings.progress_refresh_interval seconds ago, unless force is set.
         """
-        cmd = ["stty", "size"]
-        sp = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return int(sp.communicate()[0].split()[1])
+        now = time.time()
+        if not force and now - self.last_render < settings.progress_refresh_interval:
+            return
+        self.last_render = now
+        # return to the start of the status line and clear it
+        output = ['\r\x1b[K' + line + '\n' for line in self.pending_lines]
+        self.pending_lines = []
+        output.append('\r\x1b[K' + self._get_status_line())
+        log_message(''.join(output), new_line=False)
 
-    def _return_correct_msg(self, msg):
-        if len(msg) > self.width_size:
-            msg = msg[:self.width_size - 7] + '...'
-        return msg
+    def start(self):
+        """Function shows that the assessment started"""
+        self.time = datetime.datetime.now()
+        if self.output_format == "json":
+            self._emit_json("started", total=self.total_count)
+        elif self.output_format == "tty":
+            if hasattr(signal, 'SIGWINCH'):
+                try:
+                    self.old_sigwinch = signal.signal(signal.SIGWINCH,
+                                                      self._update_width)
+                except ValueError:
+                    # signals can be handled only in the main thread
+                    pass
+            self.render(force=True)
+
+    def finish(self):
+        """Function prints rest of the progress once the assessment ends"""
+        if self.output_format == "json":
+            self._emit_json("finished", total=self.total_count,
+                            count=self.current_count)
+        elif self.output_format == "tty":
+            self.render(force=True)
+            log_message('\r\x1b[K', new_line=False)
+            if self.old_sigwinch is not None:
+                signal.signal(signal.SIGWINCH, self.old_sigwinch)
+                self.old_sigwinch = None
 
     def show_progress(self, stdout_data):
         """Function shows a progress of assessment"""
-        try:
-            self.width_size = ScanProgress.get_terminal_width()
-        except IndexError:
-            self.width_size = 80
         logger_report.debug(stdout_data.strip())
         xccdf_rule = ""
-        dummy_result = ""
+        result = ""
         try:
-            xccdf_rule, dummy_result = stdout_data.strip().split(':')
+            xccdf_rule, result = stdout_data.strip().split(':')
         except ValueError:
-            print (stdout_data)
+            if self.output_format == "json":
+                self._emit_json("output", text=stdout_data.rstrip('\n'))
+            elif self.output_format == "tty":
+                self.pending_lines.append(stdout_data.rstrip('\n'))
+                self.render(force=True)
+            else:
+                log_message(stdout_data.rstrip('\n'))
             return
-        self.output_data.append(u'{0}:{1}'.format(self.names[xccdf_rule], stdout_data.strip()))
+        title = self.names.get(xccdf_rule, xccdf_rule)
+        self.output_data.append(u'{0}:{1}'.format(title, stdout_data.strip()))
         self.current_count += 1
-        old_width = self.width_size
-        self.width_size -= 21
-        prev_msg = self._return_correct_msg(self.get_full_name(self.current_count - 1))
-        self.width_size = old_width
-        cur_msg = self._return_correct_msg(self.get_full_name(self.current_count))
-        cnt_back = 7 + len(prev_msg) + 3
         curr_time = datetime.datetime.now()
         diff_time = curr_time - self.time
-        msg = (u'%sdone    (%s) (time: %.2d:%.2ds)'
-               % ('\b' * cnt_back,
-                  prev_msg,
+        self.timings[xccdf_rule] = {
+            'wall_time': diff_time.seconds + diff_time.microseconds / 1e6}
+        self.time = curr_time
+        if self.output_format == "json":
+            self._emit_json("rule", rule=xccdf_rule, title=title,
+                            result=result, count=self.current_count,
+                            total=self.total_count,
+                            wall_time=self.timings[xccdf_rule]['wall_time'])
+            return
+        msg = (u'%.3d/%.3d done    (%s) (time: %.2d:%.2ds)'
+               % (self.current_count,
+                  self.total_count,
+                  self._return_correct_msg(title, self.width_size - 40),
                   diff_time.seconds / 60,
                   diff_time.seconds % 60))
-        log_message(msg, new_line=True)
-        if self.total_count > self.current_count:
-            msg = self._return_correct_msg(u'%.3d/%.3d ...running (%s)'
-                                           % (self.current_count + 1,
-                                              self.total_count,
-                                              cur_msg))
-            log_message(msg, new_line=False)
-        self.time = datetime.datetime.now()
+        if self.output_format == "tty":
+            self.pending_lines.append(msg)
+            self.render()
+        else:
+            log_message(msg)
 
     def set_names(self, names):
         """
@@ -138,12 +279,25 @@ class ScanProgress(object):
         self.names = names
         self.list_names = sorted(names)
 
+    def get_timings(self):
+        """Function returns time and resources used by each module"""
+        return self.timings
+
     def get_output_data(self):
         """Function gets an output data from oscap"""
         return self.output_data
 
     def update_data(self, changed_fields):
-        """Function updates a data"""
+        """
+        Function updates a data
+
+        changed_fields are "rule_id:result" strings; the first result of
+        a rule is used.
+        """
+        changed = {}
+        for field in changed_fields:
+            rule_id, result = field.split(':')[:2]
+            changed.setdefault(rule_id, result)
         for index, row in enumerate(self.output_data):
             try:
                 title, rule_id, dummy_result = row.split(':')
@@ -151,6 +305,5 @@ class ScanProgress(object):
             except ValueError:
                 continue
             else:
-                result_list = [x for x in changed_fields if rule_id in x]
-                if result_list:
-                    self.output_data[index] = u"%s:%s:%s" % (title, rule_id, result_list[0].split(':')[1])
+                if rule_id in changed:
+                    self.output_data[index] = u"%s:%s:%s" % (title, rule_id, changed[rule_id])
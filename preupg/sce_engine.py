@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+"""
+Native engine evaluating SCE checks of a module set in parallel.
+
+The engine is an alternative to 'oscap xccdf eval'. It reads the composed
+all-xccdf.xml file, runs the check scripts of all selected rules
+concurrently (modules can declare in module.ini which modules have to
+finish first, see settings.module_run_after) and writes the same XCCDF
+result file as oscap does: the benchmark with a TestResult element holding
+rule-result, check-import (stdout/stderr) and score elements.
+"""
+
+from __future__ import unicode_literals
+import copy
+import datetime
+import getpass
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    from xml.etree import ElementTree
+except ImportError:
+    from elementtree import ElementTree
+
+from preupg import settings
+from preupg.logger import logger_debug
+from preupg.scheduler import TaskScheduler
+from preupg.utils import FileHelper, ConfigHelper
+
+XMLNS = "{http://checklists.nist.gov/xccdf/1.2}"
+SCE_SYSTEM = "http://open-scap.org/page/SCE"
+
+# exit codes of SCE scripts, the same values are exported by oscap
+SCE_RESULTS = [
+    ('PASS', 101, 'pass'),
+    ('FAIL', 102, 'fail'),
+    ('ERROR', 103, 'error'),
+    ('UNKNOWN', 104, 'unknown'),
+    ('NOT_APPLICABLE', 105, 'notapplicable'),
+    ('NOT_CHECKED', 106, 'notchecked'),
+    ('NOT_SELECTED', 107, 'notselected'),
+    ('INFORMATIONAL', 108, 'informational'),
+    ('FIXED', 109, 'fixed'),
+]
+
+# PATH set for the check scripts by oscap
+SCE_PATH = "/bin:/sbin:/usr/bin:/usr/local/bin:/usr/sbin"
+
+# results which are not counted to the score
+UNSCORED_RESULTS = ['notapplicable', 'notchecked', 'notselected',
+                    'informational']
+
+
+def _get_time():
+    return datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _to_env(value):
+    """Environment of a child process can't contain unicode in python 2"""
+    if sys.version_info[0] == 2:
+        return value.encode(settings.defenc)
+    return value
+
+
+class SCEEngine(object):
+
+    """Class evaluates SCE checks of selected rules of a benchmark"""
+
+    def __init__(self, content, result_path, profile, jobs=1, timeout=None):
+        """
+        content .. path to the composed all-xccdf.xml file
+        result_path .. path where the XML with results is written
+        jobs .. maximal number of checks running at the same time
+        timeout .. seconds after which a check is killed and its rule
+                   marked as error; no timeout when it is not set
+        """
+        self.content = content
+        self.content_dir = os.path.dirname(os.path.abspath(content))
+        self.result_path = result_path
+        self.profile = profile
+        self.jobs = jobs
+        self.timeout = timeout
+        self.tree = ElementTree.fromstring(
+            FileHelper.get_file_content(content, 'rb', False, False))
+        self.values = {}
+        self.value_types = {}
+        for value in self.tree.iter(XMLNS + "Value"):
+            self.values[value.get('id')] = self._get_value_text(value)
+            self.value_types[value.get('id')] = value.get('type', 'string')
+        self.rule_results = {}
+        # {rule id: resources used by its check}, see run_check
+        self.timings = {}
+
+    @staticmethod
+    def _get_value_text(value):
+        """Returns the default value of the Value element"""
+        for node in value.findall(XMLNS + "value"):
+            if node.get('selector') is None:
+                return node.text or ''
+        return ''
+
+    def get_rules(self):
+        """Returns all Rule elements in document order"""
+        return list(self.tree.iter(XMLNS + "Rule"))
+
+    def get_selected(self):
+        """Returns {rule id: selected} according to the profile"""
+        selected = {}
+        for rule in self.get_rules():
+            selected[rule.get('id')] = rule.get('selected', 'true') == 'true'
+        for profile in self.tree.findall(XMLNS + "Profile"):
+            if profile.get('id') != self.profile:
+                continue
+            for select in profile.findall(XMLNS + "select"):
+                selected[select.get('idref')] = select.get('selected') == 'true'
+        return selected
+
+    @staticmethod
+    def get_sce_check(rule):
+        for check in rule.findall(XMLNS + "check"):
+            if check.get('system') == SCE_SYSTEM:
+                return check
+        return None
+
+    @staticmethod
+    def get_module_dir(check):
+        """Returns directory of the module relative to the module set"""
+        ref = check.find(XMLNS + "check-content-ref")
+        return os.path.normpath(os.path.dirname(ref.get('href')))
+
+    def get_run_after(self, module_dir):
+        """Returns modules which have to finish before module_dir starts"""
+        module_ini = os.path.join(self.content_dir, module_dir,
+                                  settings.module_ini)
+        value = ConfigHelper.get_preupg_config_file(
+            module_ini, settings.module_run_after, "preupgrade")
+        if not value:
+            return []
+        return [os.path.normpath(x.strip()) for x in value.split(',')
+                if x.strip()]
+
+    def get_environment(self, check):
+        """Returns environment of the check script as oscap sets it"""
+        env = {'PATH': SCE_PATH}
+        for name, code, dummy_result in SCE_RESULTS:
+            env['XCCDF_RESULT_' + name] = str(code)
+        for export in check.findall(XMLNS + "check-export"):
+            name = export.get('export-name')
+            value_id = export.get('value-id')
+            env['XCCDF_VALUE_' + name] = self.values.get(value_id, '')
+            env['XCCDF_TYPE_' + name] = \
+                self.value_types.get(value_id, 'string').upper()
+        return dict((_to_env(k), _to_env(v)) for k, v in env.items())
+
+    @staticmethod
+    def _kill(sp, lock, state):
+        """Kill the check with all processes it started unless it finished"""
+        with lock:
+            # the process group of a reaped check may not exist anymore
+            if state['finished']:
+                return
+            state['killed'] = True
+            try:
+                os.killpg(sp.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def run_check(self, check):
+        """
+        Run the check script
+
+        Returns tuple (result, stdout, stderr, start time, timing) where
+        timing is a dictionary with wall and CPU time (seconds), maximal
+        resident set size of the check and its children (kB), bytes read
+        and written to the disk and whether the check timed out.
+        """
+        ref = check.find(XMLNS + "check-content-ref").get('href')
+        script = os.path.join(self.content_dir, ref)
+        start_time = _get_time()
+        start = time.time()
+        # files are used instead of pipes, so the check can be waited for
+        # by wait4 which returns its resource usage
+        stdout = tempfile.TemporaryFile()
+        stderr = tempfile.TemporaryFile()
+        lock = threading.Lock()
+        state = {'finished': False, 'killed': False}
+        try:
+            try:
+                sp = subprocess.Popen([script],
+                                      stdout=stdout,
+                                      stderr=stderr,
+                                      cwd=os.path.dirname(script),
+                                      env=self.get_environment(check),
+                                      preexec_fn=os.setsid)
+            except OSError as e:
+                logger_debug.debug("Unable to run '%s': %s", script, e)
+                return 'error', '', "Unable to run '%s': %s" % (script, e), \
+                    start_time, {'wall_time': 0.0, 'timed_out': False}
+            timer = None
+            if self.timeout:
+                timer = threading.Timer(self.timeout, self._kill,
+                                        args=(sp, lock, state))
+                timer.daemon = True
+                timer.start()
+            try:
+                dummy_pid, status, usage = os.wait4(sp.pid, 0)
+            finally:
+                with lock:
+                    state['finished'] = True
+                if timer is not None:
+                    timer.cancel()
+            if os.WIFSIGNALED(status):
+                sp.returncode = -os.WTERMSIG(status)
+            else:
+                sp.returncode = os.WEXITSTATUS(status)
+            stdout.seek(0)
+            stderr.seek(0)
+            out = stdout.read().decode(settings.defenc, 'replace')
+            err = stderr.read().decode(settings.defenc, 'replace')
+        finally:
+            stdout.close()
+            stderr.close()
+        # the timer may fire between wait4 and setting finished, the check
+        # finished by itself then
+        timed_out = state['killed'] and os.WIFSIGNALED(status) and \
+            os.WTERMSIG(status) == signal.SIGKILL
+        timing = {
+            'wall_time': time.time() - start,
+            'user_time': usage.ru_utime,
+            'system_time': usage.ru_stime,
+            'max_rss': usage.ru_maxrss,
+            # rusage counts blocks of 512 bytes
+            'read_bytes': usage.ru_inblock * 512,
+            'write_bytes': usage.ru_oublock * 512,
+            'timed_out': timed_out,
+        }
+        if timed_out:
+            logger_debug.debug("Module '%s' timed out", script)
+            err += "\nThe module was killed as it did not finish in %d" \
+                   " seconds.\n" % self.timeout
+            return 'error', out, err, start_time, timing
+        results = dict((code, result) for dummy_name, code, result
+                       in SCE_RESULTS)
+        return results.get(sp.returncode, 'error'), out, err, start_time, \
+            timing
+
+    def add_rule_result(self, test_result, rule, selected):
+        """Append rule-result of the rule to the TestResult element"""
+        rule_id = rule.get('id')
+        node = ElementTree.SubElement(test_result, XMLNS + "rule-result",
+                                      {'idref': rule_id,
+                                       'weight': "%f" % float(rule.get('weight', 1))})
+        check = self.get_sce_check(rule)
+        result = ElementTree.SubElement(node, XMLNS + "result")
+        if not selected:
+            result.text = 'notselected'
+            node.set('time', _get_time())
+            return
+        if check is None:
+            result.text = 'notchecked'
+            node.set('time', _get_time())
+            return
+        result.text, stdout, stderr, node_time, dummy_timing = \
+            self.rule_results[rule_id]
+        node.set('time', node_time)
+        check = copy.deepcopy(check)
+        for check_import in check.findall(XMLNS + "check-import"):
+            if check_import.get('import-name') == 'stdout':
+                check_import.text = stdout
+            elif check_import.get('import-name') == 'stderr':
+                check_import.text = stderr
+        node.append(check)
+
+    def get_scores(self, selected):
+        """Returns (default score, flat score, flat maximum)"""
+        flat_score = flat_maximum = 0.0
+
+        def score_item(item):
+            """Returns (score, count) of a Group or a Rule (default model)"""
+            if item.tag == XMLNS + "Rule":
+                if not selected.get(item.get('id')) or \
+                        item.get('id') not in self.rule_results:
+                    return 0.0, 0
+                result = self.rule_results[item.get('id')][0]
+                if result in UNSCORED_RESULTS:
+                    return 0.0, 0
+                return (100.0 if result in ['pass', 'fixed'] else 0.0), 1
+            score = weights = 0.0
+            count = 0
+            for child in item:
+                if child.tag not in [XMLNS + "Group", XMLNS + "Rule"]:
+                    continue
+                child_score, child_count = score_item(child)
+                if not child_count:
+                    continue
+                weight = float(child.get('weight', 1))
+                score += child_score * weight
+                weights += weight
+                count += 1
+            if weights:
+                score /= weights
+            return score, count
+
+        for rule in self.get_rules():
+            rule_id = rule.get('id')
+            if not selected.get(rule_id) or rule_id not in self.rule_results:
+                continue
+            result = self.rule_results[rule_id][0]
+            if result in UNSCORED_RESULTS:
+                continue
+            weight = float(rule.get('weight', 1))
+            flat_maximum += weight
+            if result in ['pass', 'fixed']:
+                flat_score += weight
+        return score_item(self.tree)[0], flat_score, flat_maximum
+
+    def build_test_result(self, start_time):
+        """Returns TestResult element with the results of all rules"""
+        selected = self.get_selected()
+        test_result = ElementTree.Element(
+            XMLNS + "TestResult",
+            {'id': 'xccdf_org.open-scap_testresult_' + self.profile,
+             'start-time': start_time,
+             'end-time': _get_time(),
+             'version': self.tree.findtext(XMLNS + "version") or ''})
+        ElementTree.SubElement(test_result, XMLNS + "benchmark",
+                               {'href': self.content,
+                                'id': self.tree.get('id', '')})
+        ElementTree.SubElement(test_result, XMLNS + "title").text = \
+            "OSCAP Scan Result"
+        identity = ElementTree.SubElement(
+            test_result, XMLNS + "identity",
+            {'authenticated': 'false',
+             'privileged': 'true' if os.geteuid() == 0 else 'false'})
+        identity.text = getpass.getuser()
+        ElementTree.SubElement(test_result, XMLNS + "profile",
+                               {'idref': self.profile})
+        hostname = socket.gethostname()
+        ElementTree.SubElement(test_result, XMLNS + "target").text = hostname
+        try:
+            addresses = socket.gethostbyname_ex(hostname)[2]
+        except socket.error:
+            addresses = []
+        for address in addresses:
+            ElementTree.SubElement(test_result,
+                                   XMLNS + "target-address").text = address
+        for value in self.tree.iter(XMLNS + "Value"):
+            ElementTree.SubElement(test_result, XMLNS + "set-value",
+                                   {'idref': value.get('id')}).text = \
+                self.values[value.get('id')]
+        for rule in self.get_rules():
+            self.add_rule_result(test_result, rule,
+                                 selected.get(rule.get('id'), False))
+        default_score, flat_score, flat_maximum = self.get_scores(selected)
+        ElementTree.SubElement(test_result, XMLNS + "score",
+                               {'system': 'urn:xccdf:scoring:default',
+                                'maximum': '100.000000'}).text = \
+            "%f" % default_score
+        ElementTree.SubElement(test_result, XMLNS + "score",
+                               {'system': 'urn:xccdf:scoring:flat',
+                                'maximum': "%f" % flat_maximum}).text = \
+            "%f" % flat_score
+        return test_result
+
+    def run(self, function=None):
+        """
+        Evaluate all selected rules and write the result file
+
+        function(line) is called with 'rule_id:result' line every time
+        a check finishes, the same as oscap --progress prints.
+        """
+        start_time = _get_time()
+        selected = self.get_selected()
+        modules = {}
+        checks = []
+        for rule in self.get_rules():
+            check = self.get_sce_check(rule)
+            if not selected.get(rule.get('id')) or check is None:
+                continue
+            module_dir = self.get_module_dir(check)
+            modules[module_dir] = rule.get('id')
+            checks.append((rule.get('id'), module_dir, check))
+
+        scheduler = TaskScheduler(self.jobs)
+        for rule_id, module_dir, check in checks:
+            requires = []
+            for name in self.get_run_after(module_dir):
+                if name in modules:
+                    requires.append(modules[name])
+                else:
+                    logger_debug.debug("Module '%s' required by '%s' is not"
+                                       " selected", name, module_dir)
+            scheduler.add_task(rule_id, self.run_check, args=(check,),
+                               requires=requires)
+
+        def store_result(rule_id, value, dummy_duration):
+            self.rule_results[rule_id] = value
+            self.timings[rule_id] = value[4]
+            if function is not None:
+                function("%s:%s\n" % (rule_id, value[0]))
+
+        scheduler.run(callback=store_result)
+        self.tree.append(self.build_test_result(start_time))
+        FileHelper.write_to_file(self.result_path, "wb",
+                                 ElementTree.tostring(self.tree, "utf-8"),
+                                 False)
+        return 0
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+The scheduler module runs a set of tasks in a bounded pool of worker threads.
+
+Tasks can declare which other tasks they require. A task is started only
+after all the tasks it requires have finished, independent tasks run
+concurrently.
+"""
+
+from __future__ import unicode_literals
+import datetime
+import sys
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from preupg.logger import logger_debug
+
+if sys.version_info[0] >= 3:
+    def reraise(exc_info):
+        """Raise exception of exc_info with its original traceback"""
+        raise exc_info[1].with_traceback(exc_info[2])
+else:
+    # the three-argument raise is a syntax error in Python 3
+    exec("def reraise(exc_info):\n"
+         "    \"\"\"Raise exception of exc_info with its original traceback\"\"\"\n"
+         "    raise exc_info[0], exc_info[1], exc_info[2]\n")
+
+
+class SchedulerError(Exception):
+    """Raised when the tasks can not be scheduled (e.g. cyclic requires)"""
+    pass
+
+
+class TaskScheduler(object):
+
+    """Class runs tasks in parallel with respect to their dependencies"""
+
+    def __init__(self, jobs=1):
+        """jobs is the maximal number of tasks running at the same time"""
+        try:
+            self.jobs = max(1, int(jobs))
+        except (TypeError, ValueError):
+            self.jobs = 1
+        self.tasks = {}
+        self.order = []
+        self.requires = {}
+
+    def add_task(self, name, function, args=(), requires=None):
+        """
+        Register a task
+
+        :param name: unique name of the task
+        :param function: callable executed in a worker thread
+        :param args: arguments passed to the function
+        :param requires: names of tasks which have to finish first
+        """
+        if name in self.tasks:
+            raise SchedulerError("Task '%s' is already scheduled" % name)
+        self.tasks[name] = (function, args)
+        self.order.append(name)
+        self.requires[name] = list(requires or [])
+
+    def _get_ready_tasks(self, pending, finished):
+        """Return pending tasks whose requirements are satisfied"""
+        ready = []
+        for name in self.order:
+            if name not in pending:
+                continue
+            # Requirements which are not scheduled at all are ignored
+            waiting = [x for x in self.requires[name]
+                       if x in self.tasks and x not in finished]
+            if not waiting:
+                ready.append(name)
+        return ready
+
+    def _worker(self, name, results):
+        function, args = self.tasks[name]
+        start_time = datetime.datetime.now()
+        try:
+            value = function(*args)
+        except Exception:
+            results.put((name, None, sys.exc_info(),
+                         datetime.datetime.now() - start_time))
+        else:
+            results.put((name, value, None,
+                         datetime.datetime.now() - start_time))
+
+    def run(self, callback=None):
+        """
+        Run all registered tasks
+
+        callback(name, value, duration) is called from the calling thread
+        every time a task finishes. When a task raises an exception, no new
+        tasks are started and the exception is re-raised once the running
+        tasks finish.
+
+        :return: dictionary {task name: return value of the task}
+        """
+        pending = list(self.order)
+        finished = {}
+        results = queue.Queue()
+        running = 0
+        error = None
+        while pending or running:
+            if error is None:
+                for name in self._get_ready_tasks(pending, finished):
+                    if running >= self.jobs:
+                        break
+                    pending.remove(name)
+                    logger_debug.debug("Starting task '%s'", name)
+                    thread = threading.Thread(target=self._worker,
+                                              args=(name, results))
+                    thread.daemon = True
+                    thread.start()
+                    running += 1
+            if not running:
+                if error is None and pending:
+                    raise SchedulerError("Unable to resolve requirements of"
+                                         " tasks: %s" % ', '.join(pending))
+                break
+            # timeout is used so the main thread stays interruptible
+            try:
+                name, value, exc_info, duration = results.get(True, 1)
+            except queue.Empty:
+                continue
+            running -= 1
+            if exc_info is not None:
+                logger_debug.debug("Task '%s' failed: %s", name, exc_info[1])
+                if error is None:
+                    error = exc_info
+                continue
+            finished[name] = value
+            if callback is not None:
+                callback(name, value, duration)
+        if error is not None:
+            reraise(error)
+        return finished
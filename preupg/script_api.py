@@ -32,6 +32,7 @@ except ImportError:
 
 from preupg import settings
 from preupg.utils import FileHelper, ProcessHelper
+from preupg.package_index import get_package_index, read_dist_native_list
 
 __all__ = (
     'log_debug',
@@ -492,6 +493,11 @@ def switch_to_content():
     os.chdir(os.environ['CURRENT_DIRECTORY'])
 
 
+def _get_package_index():
+    """Returns index of installed packages built from VALUE_RPM_QA"""
+    return get_package_index(VALUE_RPM_QA, VALUE_RPM_RHSIGNED)
+
+
 def is_pkg_installed(pkg_name):
     """
     Function checks if package is installed.
@@ -500,12 +506,10 @@ def is_pkg_installed(pkg_name):
     :return: 0 - package is installed
              1 - package is NOT installed
     """
-    lines = FileHelper.get_file_content(VALUE_RPM_QA, "rb", True)
-    found = [x for x in lines if x.split()[0] == pkg_name]
-    if found:
-        return True
-    else:
-        return False
+    packages = _get_dist_native_list()
+    if packages is not None:
+        return pkg_name in packages[1]
+    return _get_package_index().is_installed(pkg_name)
 
 
 def check_applies_to(check_applies=""):
@@ -542,10 +546,8 @@ def check_rpm_to(check_rpm="", check_bin=""):
 
     if check_rpm != "":
         rpms = check_rpm.split(',')
-        lines = FileHelper.get_file_content(VALUE_RPM_QA, "rb", True)
         for rpm in rpms:
-            lst = [x for x in lines if rpm == x.split('\t')[0]]
-            if not lst:
+            if not is_pkg_installed(rpm):
                 log_high_risk("Package %s is not installed." % rpm)
                 not_applicable = 1
 
@@ -580,15 +582,61 @@ def solution_file(message):
     FileHelper.write_to_file(SOLUTION_FILE, mod, message)
 
 
-def service_is_enabled(service_name):
-    """Returns true if given service is enabled on any runlevel"""
-    return_value = False
-    lines = FileHelper.get_file_content(VALUE_CHKCONFIG, "rb", True)
-    for line in lines:
-        if re.match('^%s.*:on' % service_name, line):
-            return_value = True
-            break
-    return return_value
+_enabled_services = {}
+
+# "name  0:off 1:on ..." lines of chkconfig --list; xinetd based services
+# are indented and have no runlevels, so they do not match
+_chkconfig_line = re.compile(r'^(\S+)\s+(\d:(?:on|off)(?:\s+\d:(?:on|off))*)\s*$')
+
+
+def _get_enabled_services(path):
+    """Returns {runlevel: set of services enabled on it} from chkconfig log"""
+    if path not in _enabled_services:
+        enabled = {}
+        for line in FileHelper.get_file_content(path, "rb", True):
+            match = _chkconfig_line.match(line)
+            if not match:
+                continue
+            for status in match.group(2).split():
+                runlevel, state = status.split(':')
+                enabled.setdefault(int(runlevel), set())
+                if state == 'on':
+                    enabled[int(runlevel)].add(match.group(1))
+        _enabled_services[path] = enabled
+    return _enabled_services[path]
+
+
+def service_is_enabled(service_name, runlevel=None):
+    """
+    Returns true if given service is enabled on any runlevel
+
+    When runlevel is given, only the runlevel is checked.
+    """
+    enabled = _get_enabled_services(VALUE_CHKCONFIG)
+    if runlevel is not None:
+        return service_name in enabled.get(int(runlevel), ())
+    return any(service_name in x for x in enabled.values())
+
+
+_changed_configs = {}
+
+# "S.5....T.  c /etc/file" lines of rpm -Va; the attribute marker is optional
+_rpm_va_line = re.compile(r'^\S+\s+(?:[cdglr]\s+)?(/.*?)\s*$')
+
+
+def _get_changed_configs(path):
+    """Returns set of config files listed in the rpm -Va log"""
+    if path not in _changed_configs:
+        changed = set()
+        try:
+            for line in FileHelper.get_file_content(path, "rb", True):
+                match = _rpm_va_line.match(line)
+                if match:
+                    changed.add(match.group(1))
+        except IOError:
+            pass
+        _changed_configs[path] = changed
+    return _changed_configs[path]
 
 
 def config_file_changed(config_file_name):
@@ -599,16 +647,7 @@ def config_file_changed(config_file_name):
     True if given config file has been changed
     False if given config file hasn't been changed
     """
-    config_changed = False
-    try:
-        lines = FileHelper.get_file_content(VALUE_CONFIGCHANGED, "rb", True)
-        for line in lines:
-            if line.find(config_file_name) != -1:
-                config_changed = True
-                break
-    except:
-        pass
-    return config_changed
+    return config_file_name in _get_changed_configs(VALUE_CONFIGCHANGED)
 
 
 def backup_config_file(config_file_name):
@@ -649,47 +688,76 @@ def is_dist_native(pkg):
     DIST_NATIVE = path_to_file: return True if package is in file else return False
     """
 
-    rpm_qa = FileHelper.get_file_content(VALUE_RPM_QA, "rb", True)
-    found = [x for x in rpm_qa if x.split()[0] == pkg]
-    if not found:
-        log_warning("Package %s is not installed on Red Hat Enterprise Linux system.")
-        return False
+    packages = _get_dist_native_list()
+    if packages is not None:
+        if pkg not in packages[1]:
+            log_warning("Package %s is not installed on Red Hat Enterprise Linux system." % pkg)
+            return False
+        return packages[1][pkg]
 
-    rpm_signed = FileHelper.get_file_content(VALUE_RPM_RHSIGNED, "rb", True)
-    found = [x for x in rpm_signed if x.split()[0] == pkg]
+    index = _get_package_index()
+    if not index.is_installed(pkg):
+        log_warning("Package %s is not installed on Red Hat Enterprise Linux system." % pkg)
+        return False
 
     if int(DEVEL_MODE) == 0:
-        if found:
-            return True
-        else:
-            return False
+        return index.is_signed(pkg)
     else:
         if DIST_NATIVE == "all":
             return True
         if DIST_NATIVE == "sign":
-            if found:
-                return True
-            else:
-                return False
+            return index.is_signed(pkg)
         if os.path.exists(DIST_NATIVE):
-            list_native = map(
-                unicode.strip,
-                FileHelper.get_file_content(DIST_NATIVE, "r", method=True)
-            )
-            if pkg in list_native:
+            if pkg in _get_dist_native_file_pkgs(DIST_NATIVE):
                 return True
         return False
 
 
+_dist_native_file_pkgs = {}
+
+
+def _get_dist_native_file_pkgs(path):
+    """Returns set of packages listed in the DIST_NATIVE file"""
+    if path not in _dist_native_file_pkgs:
+        _dist_native_file_pkgs[path] = set(
+            x.strip() for x in
+            FileHelper.get_file_content(path, "r", method=True))
+    return _dist_native_file_pkgs[path]
+
+
+_dist_native_lists = {}
+
+
+def _get_dist_native_list():
+    """
+    Returns (names, {name: dist native}) of installed packages precomputed
+    by preupg or None when the list is missing or it is not valid for the
+    current DEVEL_MODE and DIST_NATIVE
+    """
+    key = (VALUE_RPM_QA, VALUE_RPM_RHSIGNED, str(DEVEL_MODE), DIST_NATIVE)
+    if key not in _dist_native_lists:
+        path = os.path.join(os.path.dirname(VALUE_RPM_QA),
+                            settings.dist_native_list)
+        packages = read_dist_native_list(path,
+                                         [VALUE_RPM_QA, VALUE_RPM_RHSIGNED],
+                                         DEVEL_MODE, DIST_NATIVE)
+        if packages is not None:
+            packages = ([x[0] for x in packages], dict(packages))
+        _dist_native_lists[key] = packages
+    return _dist_native_lists[key]
+
+
 def get_dist_native_list():
     """
     return list of all dist native packages according to is_dist_native()
     """
 
+    packages = _get_dist_native_list()
+    if packages is not None:
+        return [x for x in packages[0] if packages[1][x]]
+
     native_pkgs = []
-    tmp = FileHelper.get_file_content(VALUE_RPM_QA, "rb", True)
-    pkgs = [i.split("\t")[0] for i in tmp]
-    for pkg in pkgs:
+    for pkg in _get_package_index().get_names():
         if is_dist_native(pkg) is True:
             native_pkgs.append(pkg)
     return native_pkgs
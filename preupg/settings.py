@@ -22,6 +22,20 @@ tarball_base = result_prefix + 's'
 tarball_prefix = "preupg_"
 tarball_name = tarball_prefix + tarball_base + "-{0}"
 
+# compression of the tarball with results and its level (0-9); gzip
+# compresses independent blocks of tarball_block_size bytes in parallel
+# when more jobs are allowed
+compressions = ["gzip", "xz"]
+compression = "gzip"
+compression_level = 6
+tarball_block_size = 1048576
+xz_binary = "/usr/bin/xz"
+
+# the tarball is uploaded to the UI in chunks of upload_chunk_size bytes;
+# an interrupted upload is resumed up to upload_retries times in a row
+upload_chunk_size = 1048576
+upload_retries = 5
+
 xml_result_name = result_prefix + '.xml'
 html_result_name = result_prefix + '.html'
 
@@ -46,6 +60,9 @@ log_dir = "/var/log/preupgrade"
 # file with module set meta info
 properties_ini = "properties.ini"
 module_ini = "module.ini"
+# option of module.ini with modules which have to finish before the module
+# is started by the native engine
+module_run_after = "run_after"
 
 solution_txt = "solution.txt"
 check_script = "check"
@@ -79,6 +96,65 @@ common_name = "common"
 # path to file with definitions of common scripts
 common_scripts = os.path.join(data_dir, "preassessment", "scripts.txt")
 
+# common logs which are generated from other common logs; a common script
+# is started after all the logs it requires are generated
+common_requires = {
+    'rpm_etc_Va.log': ['rpm_Va.log'],
+    'rpm_rhsigned.log': ['rpm_qa.log'],
+}
+
+# maximal number of common scripts running at the same time
+jobs = 4
+
+# RPM database file; its change means that the installed packages changed
+rpm_db = "/var/lib/rpm/Packages"
+
+# files whose state determines the content of a common log; the log is
+# not generated again when none of its inputs (nor the logs it requires)
+# have changed since the previous run. Logs which are not listed here nor
+# in common_requires are generated on every run, as they depend on the
+# whole filesystem (e.g. rpm -Va).
+common_inputs = {
+    'rpm_qa.log': [rpm_db],
+    'rpmtrackedfiles.log': [rpm_db],
+    'passwd.log': ['/etc/passwd', '/etc/nsswitch.conf'],
+    'group.log': ['/etc/group', '/etc/nsswitch.conf'],
+    'chkconfig.log': ['/etc/rc.d/rc%d.d' % x for x in range(7)] +
+                     ['/etc/xinetd.d'],
+}
+
+# file in the common dir with fingerprints of inputs of the common logs
+common_manifest = "manifest.json"
+
+# dbm file in the common dir with index of installed packages used by
+# the module API (see preupg.package_index)
+package_index_db = "rpm_qa.index"
+
+# file in the common dir with installed packages and their dist native flag
+# used by is_dist_native() of the module API (see preupg.package_index)
+dist_native_list = "dist_native.list"
+
+# common logs the index of installed packages is built from
+package_index_logs = ['rpm_qa.log', 'rpm_rhsigned.log']
+
+# common logs generated by a single walk over all local filesystems instead
+# of the command in scripts.txt; {log file: walker projection}
+common_walker_logs = {
+    'allmyfiles.log': 'all',
+    'executable.log': 'executable',
+}
+
+# maximal number of bytes of output of a command read at once
+subprocess_chunk_size = 65536
+
+# maximal number of characters of a report read at once when solution
+# texts are filled in
+report_chunk_size = 1048576
+
+# number of paths sorted in memory by the walker, bigger sets are sorted
+# in chunks stored to temporary files
+walker_chunk_size = 500000
+
 # Default module set descriptor file
 all_xccdf_xml_filename = "all-xccdf.xml"
 
@@ -91,6 +167,10 @@ base_hashed_file = "hashed_file"
 # name of the file which contains a list of rules
 file_list_rules = "list_rules"
 
+# file next to all-xccdf.xml with path, rule id, title, solution file and
+# script type of all modules of the module set (see XCCDFCompose)
+module_manifest = "modules.json"
+
 # kickstart directory name
 kickstart_dir = "kickstart"
 
@@ -117,6 +197,28 @@ needs_action = "needs_action"
 
 openscap_binary = "/usr/bin/oscap"
 
+# engine evaluating the modules: "oscap" runs them one by one by oscap,
+# "native" runs them in parallel (at most jobs at once) by preupg itself
+engines = ["oscap", "native"]
+engine = "oscap"
+
+# seconds after which a module run by the native engine is killed and its
+# result is set to error; 0 means no timeout
+module_timeout = 0
+
+# file in the results directory with time and resources used by modules
+module_timings = "module-timings.json"
+
+# number of the slowest modules listed below the table with results
+slowest_modules = 10
+
+# formats of the progress of the assessment; when no format is selected,
+# tty is used on a terminal and plain otherwise (see ScanProgress)
+progress_formats = ["tty", "plain", "json"]
+
+# minimal number of seconds between two redraws of the progress
+progress_refresh_interval = 0.2
+
 # The full license text
 license = u"""Preupgrade Assistant performs system upgradability assessment
 and gathers information required for successful operating system upgrade.
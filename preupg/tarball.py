@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+The tarball module packs the assessment results in-process.
+
+Members are streamed from their original location into the archive, which
+is written once into its final place. Like tar --numeric-owner --acls
+--selinux, owners are stored as numbers only and POSIX ACLs and SELinux
+contexts are stored in PAX headers under the keys used by GNU tar.
+
+The archive is compressed by gzip (optionally in independent blocks
+compressed in parallel, like pigz --independent) or by xz.
+"""
+
+from __future__ import unicode_literals
+import ctypes
+import ctypes.util
+import errno
+import gzip
+import io
+import os
+import stat
+import struct
+import subprocess
+import tarfile
+import threading
+
+from preupg import settings
+from preupg.logger import log_message
+
+# PAX header keys used by GNU tar
+PAX_ACL_ACCESS = "SCHILY.acl.access"
+PAX_ACL_DEFAULT = "SCHILY.acl.default"
+PAX_SELINUX = "RHT.security.selinux"
+
+XATTRS = {
+    "system.posix_acl_access": PAX_ACL_ACCESS,
+    "system.posix_acl_default": PAX_ACL_DEFAULT,
+    "security.selinux": PAX_SELINUX,
+}
+
+EXTENSIONS = {
+    "gzip": ".tar.gz",
+    "xz": ".tar.xz",
+}
+
+# the UI reads only tarballs compressed by gzip
+GZIP_MAGIC = b"\x1f\x8b"
+
+_libc = None
+
+
+def _lgetxattr_libc(path, name):
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    path = path.encode(settings.defenc) if not isinstance(path, bytes) else path
+    name = name.encode(settings.defenc)
+    size = _libc.lgetxattr(path, name, None, 0)
+    if size >= 0:
+        buf = ctypes.create_string_buffer(size)
+        size = _libc.lgetxattr(path, name, buf, size)
+    if size < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err), path)
+    return buf.raw[:size]
+
+
+def get_xattr(path, name):
+    """Returns value of the extended attribute of path or None"""
+    try:
+        if hasattr(os, "getxattr"):
+            return os.getxattr(path, name, follow_symlinks=False)
+        return _lgetxattr_libc(path, name)
+    except (OSError, AttributeError) as e:
+        # no attribute, attributes not supported or no libc function
+        if isinstance(e, OSError) and e.errno not in (
+                errno.ENODATA, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOSYS):
+            raise
+        return None
+
+
+def is_gzip(path):
+    """Returns True when the file is compressed by gzip"""
+    f = open(path, "rb")
+    try:
+        return f.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+    finally:
+        f.close()
+
+
+# tags of entries of ACL in the system.posix_acl_* attributes
+ACL_TAGS = {
+    0x01: "user::",
+    0x02: "user:%d:",
+    0x04: "group::",
+    0x08: "group:%d:",
+    0x10: "mask::",
+    0x20: "other::",
+}
+
+
+def acl_to_text(data):
+    """
+    Convert system.posix_acl_* attribute to the text stored by GNU tar
+
+    Owners of named entries are stored as numbers.
+    """
+    entries = []
+    for offset in range(4, len(data), 8):
+        tag, perm, ident = struct.unpack("<HHI", data[offset:offset + 8])
+        name = ACL_TAGS.get(tag)
+        if name is None:
+            continue
+        if "%d" in name:
+            name = name % ident
+        entries.append(name + "".join(
+            char if perm & bit else "-"
+            for char, bit in [("r", 4), ("w", 2), ("x", 1)]))
+    return "\n".join(entries)
+
+
+def get_pax_headers(path):
+    """Returns PAX headers with ACLs and SELinux context of path"""
+    headers = {}
+    for name, key in XATTRS.items():
+        value = get_xattr(path, name)
+        if not value:
+            continue
+        if key == PAX_SELINUX:
+            headers[key] = value.rstrip(b"\0").decode(settings.defenc)
+        else:
+            headers[key] = acl_to_text(value)
+    return headers
+
+
+def _compress_block(data, level):
+    out = io.BytesIO()
+    member = gzip.GzipFile(filename="", mode="wb", compresslevel=level,
+                           fileobj=out, mtime=0)
+    member.write(data)
+    member.close()
+    return out.getvalue()
+
+
+class _BlockCompression(threading.Thread):
+
+    def __init__(self, data, level):
+        threading.Thread.__init__(self)
+        self.data = data
+        self.level = level
+        self.result = None
+
+    def run(self):
+        self.result = _compress_block(self.data, self.level)
+        self.data = None
+
+
+class ParallelGzipFile(object):
+
+    """
+    Write-only file object compressing blocks of data in parallel
+
+    Each block is compressed into an independent gzip member; consecutive
+    gzip members form a valid gzip file. At most jobs blocks are being
+    compressed at once.
+    """
+
+    def __init__(self, fileobj, level, jobs, block_size):
+        self.fileobj = fileobj
+        self.level = level
+        self.jobs = jobs
+        self.block_size = block_size
+        self.buffer = []
+        self.buffered = 0
+        self.pending = []
+
+    def write(self, data):
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.block_size:
+            data = b"".join(self.buffer)
+            for start in range(0, len(data) - self.block_size + 1,
+                               self.block_size):
+                self._compress(data[start:start + self.block_size])
+            rest = data[len(data) - len(data) % self.block_size:]
+            self.buffer = [rest]
+            self.buffered = len(rest)
+
+    def _compress(self, block):
+        if len(self.pending) >= self.jobs:
+            self._write_oldest()
+        task = _BlockCompression(block, self.level)
+        task.start()
+        self.pending.append(task)
+
+    def _write_oldest(self):
+        task = self.pending.pop(0)
+        task.join()
+        self.fileobj.write(task.result)
+
+    def close(self):
+        if self.buffered or not self.pending:
+            self._compress(b"".join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+        while self.pending:
+            self._write_oldest()
+
+
+class XzFile(object):
+
+    """Write-only file object compressing data by the xz binary"""
+
+    def __init__(self, fileobj, level, jobs):
+        self.process = subprocess.Popen(
+            [settings.xz_binary, "-z", "-c", "-%d" % level, "-T%d" % jobs],
+            stdin=subprocess.PIPE, stdout=fileobj)
+
+    def write(self, data):
+        self.process.stdin.write(data)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise IOError("%s exited with %d" % (settings.xz_binary,
+                                                 self.process.returncode))
+
+
+class TarballWriter(object):
+
+    """
+    Streaming writer of a compressed tarball
+
+    compression is "gzip" or "xz"; gzip with jobs > 1 compresses blocks in
+    parallel. Use add() to pack a file or a directory tree and close() to
+    finish the archive.
+    """
+
+    def __init__(self, path, compression="gzip", level=6, jobs=1,
+                 verbose=False):
+        self.path = path
+        self.verbose = verbose
+        self.output = open(path, "wb")
+        if compression == "xz":
+            self.compressed = XzFile(self.output, level, jobs)
+        elif jobs > 1:
+            self.compressed = ParallelGzipFile(self.output, level, jobs,
+                                               settings.tarball_block_size)
+        else:
+            self.compressed = gzip.GzipFile(filename="", mode="wb",
+                                            compresslevel=level,
+                                            fileobj=self.output)
+        self.tar = tarfile.open(mode="w|", fileobj=self.compressed,
+                                format=tarfile.PAX_FORMAT)
+
+    def add(self, path, arcname, recursive=True):
+        """Add path to the archive as arcname (directories recursively)"""
+        info = self.tar.gettarinfo(path, arcname)
+        if info is None:
+            # sockets can't be archived
+            return
+        # the same as tar --numeric-owner
+        info.uname = ""
+        info.gname = ""
+        info.pax_headers = get_pax_headers(path)
+        if self.verbose:
+            log_message(arcname)
+        if info.isreg():
+            member = open(path, "rb")
+            try:
+                self.tar.addfile(info, member)
+            finally:
+                member.close()
+        else:
+            self.tar.addfile(info)
+        if recursive and stat.S_ISDIR(os.lstat(path).st_mode):
+            for name in sorted(os.listdir(path)):
+                self.add(os.path.join(path, name),
+                         os.path.join(arcname, name))
+
+    def close(self):
+        try:
+            self.tar.close()
+            self.compressed.close()
+        finally:
+            self.output.close()
+
+    def abort(self):
+        """Close the writer and remove the unfinished archive"""
+        try:
+            self.close()
+        except (IOError, OSError):
+            pass
+        if os.path.exists(self.path):
+            os.unlink(self.path)
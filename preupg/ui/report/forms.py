@@ -3,7 +3,7 @@ from django.db.models import Q
 
 from django import forms
 
-from .models import Host, HostRun, TestResult
+from .models import Host, HostRun, TestResult, Risk
 
 
 class NewHostForm(forms.ModelForm):
@@ -79,6 +79,42 @@ class FilterForm(forms.Form):
             return False
         return True
 
+class SearchForm(forms.Form):
+    """ search in titles, logs and risks of all results """
+    KIND_CHOICES = [
+        ('', 'Everything'),
+        ('group', 'Group Titles'),
+        ('test', 'Test Titles'),
+        ('log', 'Logs'),
+        ('risk', 'Risks'),
+    ]
+    LOG_LEVELS = ['error', 'warning', 'info', 'debug']
+
+    q = forms.CharField(required=False, widget=forms.TextInput(
+        attrs={
+            'id': 'global-search',
+            'placeholder': "Search in all results...",
+            'class': 'form-control',
+        })
+    )
+    kind = forms.ChoiceField(required=False, choices=KIND_CHOICES, widget=forms.Select(
+        attrs={
+            'class': 'selectpicker global-filter',
+        })
+    )
+    level = forms.ChoiceField(required=False, widget=forms.Select(
+        attrs={
+            'class': 'selectpicker global-filter',
+        })
+    )
+
+    def __init__(self, *args, **kwargs):
+        super(SearchForm, self).__init__(*args, **kwargs)
+        risks = sorted(Risk.RISK_LEVELS, key=lambda x: Risk.RISK_LEVELS[x], reverse=True)
+        self.fields['level'].choices = [('', 'All Levels')] + \
+            [(level, level.capitalize()) for level in risks + self.LOG_LEVELS]
+
+
 class StateFilterForm(forms.Form):
     """ filter test results by their state """
 
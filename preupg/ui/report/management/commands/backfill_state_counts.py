@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Store counts of states of tests of results imported before they were stored
+at import
+
+Usage: preupg-ui-manage backfill_state_counts [--all]
+"""
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from preupg.ui.report.models import Result, TestResult
+
+# SQLite limits number of parameters of a query
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Store counts of states of tests of results which miss them."
+    option_list = BaseCommand.option_list + (
+        make_option('--all', action='store_true', default=False,
+                    help='Recount all results.'),
+    )
+
+    @transaction.commit_on_success
+    def handle(self, *args, **options):
+        results = Result.objects.all()
+        if not options['all']:
+            results = results.filter(state_counts__isnull=True)
+        result_ids = list(results.values_list('id', flat=True))
+        for start in range(0, len(result_ids), CHUNK_SIZE):
+            chunk = result_ids[start:start + CHUNK_SIZE]
+            counts = dict((result_id, {}) for result_id in chunk)
+            rows = TestResult.objects.filter(result__in=chunk).order_by() \
+                .values('result', 'state').annotate(count=Count('state'))
+            for row in rows:
+                counts[row['result']][row['state']] = row['count']
+            for result_id, state_counts in counts.items():
+                Result.objects.filter(id=result_id).update(
+                    state_counts=Result.encode_state_counts(state_counts))
+        self.stdout.write("Stored counts of %d results." % len(result_ids))
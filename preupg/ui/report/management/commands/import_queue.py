@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Worker importing results submitted to the UI
+
+Usage: preupg-ui-manage import_queue [--workers N] [--once] [--retry-failed]
+"""
+import multiprocessing
+from optparse import make_option
+
+from django import db
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from preupg.ui.report.models import HostRun
+from preupg.ui.report.service import process_queue
+
+
+def _worker(poll_interval, once):
+    # connection inherited from the parent process can't be shared
+    db.close_connection()
+    process_queue(poll_interval, once)
+
+
+class Command(BaseCommand):
+    help = "Import results queued by the XML-RPC submission endpoint."
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int', default=None,
+                    help='Number of worker processes (default: IMPORT_WORKERS'
+                         ' from settings).'),
+        make_option('--once', action='store_true', default=False,
+                    help='Exit when the queue is empty.'),
+        make_option('--retry-failed', action='store_true', default=False,
+                    help='Queue failed imports again first.'),
+    )
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or settings.IMPORT_WORKERS
+        if workers < 1:
+            raise CommandError("The --workers option requires a positive"
+                               " number.")
+        if options['retry_failed']:
+            count = HostRun.objects.requeue_failed()
+            self.stdout.write("Queued %d failed imports again." % count)
+        poll_interval = settings.IMPORT_POLL_INTERVAL
+        if workers == 1:
+            process_queue(poll_interval, options['once'])
+            return
+        db.close_connection()
+        processes = [multiprocessing.Process(target=_worker,
+                                             args=(poll_interval, options['once']))
+                     for dummy_i in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
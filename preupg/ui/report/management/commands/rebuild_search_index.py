@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+Rebuild full-text index of titles, logs and risks of all results
+
+Usage: preupg-ui-manage rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from preupg.ui.report.models import Result
+from preupg.ui.report.search import create_index, drop_index, index_entries, result_entries
+
+
+class Command(BaseCommand):
+    help = "Index titles, logs and risks of all results for the search."
+
+    def handle(self, *args, **options):
+        # faster than deleting all entries one by one from the full-text table
+        drop_index()
+        create_index()
+        transaction.commit_unless_managed()
+        result_ids = list(Result.objects.values_list('id', flat=True))
+        for result_id in result_ids:
+            index_entries(result_entries(result_id))
+            transaction.commit_unless_managed()
+        self.stdout.write("Indexed %d results." % len(result_ids))
@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
 """ Database schema """
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.urlresolvers import reverse
 from django.db.models import Q
 from django.db.models.aggregates import Count
 from django.http.response import Http404
 import os
 import datetime
+import hashlib
+import json
 
 from django.db import models
 from django.conf import settings
 from preupg.ui.config.models import AppSettings
+from preupg.ui.report.search import remove_result
 from preupg.ui.utils.enum import Enum
 from shutil import rmtree
 
@@ -35,6 +39,15 @@ class OS(models.Model):
                            self.minor)
 
 
+def hash_content(*values):
+    """ return SHA-1 of values of a definition, None is the same as '' """
+    hasher = hashlib.sha1()
+    for value in values:
+        hasher.update((value or u'').encode('utf-8'))
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
 class Host(models.Model):
     """
     host where analysis was executed
@@ -96,6 +109,8 @@ class TestGroup(models.Model):
     title = models.CharField(max_length=255, db_index=True)
     xccdf_id = models.CharField(max_length=128)
     parent = models.ForeignKey('self', blank=True, null=True)
+    # groups with the same content (including parents) are stored once
+    content_hash = models.CharField(max_length=40, blank=True, null=True, db_index=True)
 
     objects = TestGroupManager()
 
@@ -118,6 +133,10 @@ class TestGroup(models.Model):
         """ is this group root group? == does it have parent? """
         return self.parent is None
 
+    @staticmethod
+    def compute_hash(xccdf_id, title, parent_hash=None):
+        return hash_content(xccdf_id, title, parent_hash)
+
 
 class TestGroupResultMixin(object):
     def for_result(self, result):
@@ -129,6 +148,10 @@ class TestGroupResultMixin(object):
     def root(self):
         return self.filter(parent__isnull=True)
 
+    def subtree(self, group):
+        """ group and all its descendants """
+        return self.filter(result=group.result_id, path__startswith=group.path)
+
 
 class TestGroupResultQuerySet(models.query.QuerySet, TestGroupResultMixin):
     pass
@@ -148,6 +171,9 @@ class TestGroupResult(models.Model):
     parent = models.ForeignKey('self', related_name="direct_children_set", blank=True, null=True)
     # this should never be None, but if this group is root also, it has to be saved first
     root = models.ForeignKey('self', related_name="all_children_set", blank=True, null=True)
+    # materialized path: path of parent + position of this group in the
+    # result; subtree of a group shares the prefix of its path
+    path = models.CharField(max_length=255, blank=True, null=True, db_index=True)
 
     test_count = models.SmallIntegerField(blank=True, null=True, default=0)
     failed_test_count = models.SmallIntegerField(blank=True, null=True, default=0)
@@ -156,12 +182,31 @@ class TestGroupResult(models.Model):
 
     objects = TestGroupResultManager()
 
+    # length of one step of path
+    PATH_STEP = 5
+
     class Meta:
         ordering = ('group', )
 
     def __unicode__(self):
         return u"%s %s" % (self.group, self.result)
 
+    @classmethod
+    def make_path(cls, index, parent_path=None):
+        """ return path of group at index of result under parent_path """
+        return (parent_path or '') + '%0*d' % (cls.PATH_STEP, index)
+
+    @classmethod
+    def ancestor_paths(cls, path):
+        """ return paths of ancestors of path from root, including path """
+        return [path[:end] for end in range(cls.PATH_STEP, len(path) + 1, cls.PATH_STEP)]
+
+    def depth(self):
+        return len(self.path) // self.PATH_STEP - 1
+
+    def subtree(self):
+        return TestGroupResult.objects.subtree(self)
+
     def has_children(self):
         return TestGroupResult.objects.filter(parent=self).exists()
 
@@ -175,11 +220,15 @@ class TestGroupResult(models.Model):
         """ return root group -- top-most parent """
         if self.root is not None:
             return self.root
-        group = self
-        parent = self.parent
-        while parent is not None:
-            group = parent
-            parent = group.parent
+        if self.path:
+            group = TestGroupResult.objects.get(
+                result=self.result_id, path=self.path[:self.PATH_STEP])
+        else:
+            group = self
+            parent = self.parent
+            while parent is not None:
+                group = parent
+                parent = group.parent
         self.root = group
         self.save()
         return group
@@ -266,8 +315,8 @@ class Run(models.Model):
         return HostRun.objects.filter(run=self, host__local=False)
 
     def all_done(self):
-        """ if there are no running tasks, everything is done """
-        return not HostRun.objects.for_run(self).running().exists()
+        """ if there are no running or importing tasks, everything is done """
+        return not HostRun.objects.for_run(self).unfinished().exists()
 
     def finish(self):
         self.dt_finished = datetime.datetime.now()
@@ -294,6 +343,43 @@ class HostRunMixin(object):
     def finished(self):
         return self.filter(state=HostRun.FINISHED)
 
+    def queued(self):
+        return self.filter(state=HostRun.QUEUED)
+
+    def importing(self):
+        return self.filter(state=HostRun.IMPORTING)
+
+    def unfinished(self):
+        return self.filter(state__in=(HostRun.RUNNING, HostRun.QUEUED,
+                                      HostRun.IMPORTING))
+
+    def claim_next(self):
+        """
+        mark the oldest queued hostrun as importing and return it; several
+        workers may claim at once, each hostrun is returned to one of them
+
+        importing hostruns whose claim was not refreshed by HostRun.beat for
+        IMPORT_TIMEOUT seconds are claimed again, their worker is considered
+        killed
+        """
+        now = datetime.datetime.now()
+        stale = now - datetime.timedelta(seconds=settings.IMPORT_TIMEOUT)
+        # claimed before dt_claimed was stored are stale as well
+        claimable = Q(state=HostRun.QUEUED) | (Q(state=HostRun.IMPORTING) & (
+            Q(dt_claimed__lt=stale) | Q(dt_claimed__isnull=True)))
+        for hostrun_id in self.filter(claimable).order_by('id').values_list('id', flat=True)[:10]:
+            if HostRun.objects.filter(claimable, id=hostrun_id).update(
+                    state=HostRun.IMPORTING, dt_claimed=now):
+                return HostRun.objects.get(id=hostrun_id)
+        return None
+
+    def requeue_failed(self):
+        """ queue failed imports again and return their number """
+        failed = self.filter(state=HostRun.FAILED, tarball__isnull=False)
+        # their runs are not done anymore
+        Run.objects.filter(hostrun__in=failed).update(dt_finished=None)
+        return failed.update(state=HostRun.QUEUED)
+
     def hosts(self):
         """ return list of hostname strings found in hostruns """
         return self.values_list("result__hostname", flat=True)
@@ -323,17 +409,27 @@ class HostRun(models.Model):
     M2M relationship between run and hosts -- Run on each Host
     """
     RUNNING = 'r'
+    QUEUED = 'q'
+    IMPORTING = 'i'
     FINISHED = 'f'
+    FAILED = 'e'
 
     RUN_STATES = Enum([
         (RUNNING, 'running', 'Scan is active.'),
+        (QUEUED, 'queued', 'Result is waiting for import.'),
+        (IMPORTING, 'importing', 'Result is being imported.'),
         (FINISHED, 'finished', 'Scan has finished.'),
+        (FAILED, 'failed', 'Import of result has failed.'),
     ])
     dt_finished = models.DateTimeField(blank=True, null=True)
     host = models.ForeignKey(Host)
     run = models.ForeignKey(Run)
     state = models.CharField(max_length=1, choices=RUN_STATES.get_mapping(), default=RUNNING, db_index=True)
     risk = models.CharField(max_length=16, blank=True, null=True, db_index=True)
+    # uploaded tarball waiting for import
+    tarball = models.CharField(max_length=255, blank=True, null=True)
+    # when a worker started the import
+    dt_claimed = models.DateTimeField(blank=True, null=True)
 
     objects = HostRunManager()
 
@@ -347,16 +443,51 @@ class HostRun(models.Model):
     def running(self):
         return self.state == self.RUNNING
 
+    @property
+    def queued(self):
+        return self.state == self.QUEUED
+
+    @property
+    def importing(self):
+        return self.state == self.IMPORTING
+
     @property
     def finished(self):
         return self.state == self.FINISHED
 
+    @property
+    def failed(self):
+        return self.state == self.FAILED
+
     def display_groups(self):
         return self.testgroupresult.filter(parent__isnull=True)
 
     def set_finished(self):
         self.state = self.FINISHED
         self.dt_finished = datetime.datetime.now()
+        self.tarball = None
+        self.save(update_fields=["state", "tarball"])
+
+    def set_queued(self, tarball):
+        self.state = self.QUEUED
+        self.tarball = tarball
+        self.save(update_fields=["state", "tarball"])
+
+    def beat(self):
+        """
+        refresh claim of importing hostrun; return False if the claim was
+        taken over by another worker
+        """
+        now = datetime.datetime.now()
+        if not HostRun.objects.filter(id=self.id, dt_claimed=self.dt_claimed) \
+                .update(dt_claimed=now):
+            return False
+        self.dt_claimed = now
+        return True
+
+    def set_failed(self):
+        """ the tarball is kept, see HostRunMixin.requeue_failed """
+        self.state = self.FAILED
         self.save(update_fields=["state"])
 
     def set_risk(self):
@@ -390,9 +521,12 @@ class Result(models.Model):
     failed_test_count = models.SmallIntegerField(blank=True, null=True)
     ni_test_count = models.SmallIntegerField(blank=True, null=True)
     na_test_count = models.SmallIntegerField(blank=True, null=True)
+    # JSON {state: count} of tests, stored at import
+    state_counts = models.CharField(max_length=255, blank=True, null=True)
 
     def delete(self):
         result_dir = self.get_result_dir()
+        remove_result(self.id)
         super(Result, self).delete()
         rmtree(result_dir)
 
@@ -413,13 +547,28 @@ class Result(models.Model):
     def results(self):
         return self.testresult_set.all()
 
+    @staticmethod
+    def encode_state_counts(counts):
+        return json.dumps(counts, sort_keys=True, separators=(',', ':'))
+
+    def get_state_counts(self):
+        """
+        return [(state, count)] of tests in this result ordered by state;
+        results imported before the counts were stored are counted
+        """
+        if self.state_counts is not None:
+            counts = json.loads(self.state_counts).items()
+        else:
+            counts = [(r['state'], r['count'])
+                      for r in TestResult.objects.for_result(self).count_states()]
+        return sorted(counts)
+
     def status_text(self):
         result = []
-        results_dict = TestResult.objects.for_result(self).count_states()
-        for test in results_dict:
+        for state, count in self.get_state_counts():
             test_print = "%s (%d)" % (
-                TestResult.TEST_STATES.display(test['state']),
-                test['count'],
+                TestResult.TEST_STATES.display(state),
+                count,
             )
             result.append(test_print)
         return ', '.join(result)
@@ -436,10 +585,10 @@ class Result(models.Model):
 
         result = {}
 
-        for r in TestResult.objects.for_result(self).count_states():
-            printable_state = TestResult.TEST_STATES.display(r['state'])
-            print_text = "%s (%d)" % (printable_state, r['count'])
-            result[TestResult.TEST_STATES[r['state']]] = print_text
+        for state, count in self.get_state_counts():
+            printable_state = TestResult.TEST_STATES.display(state)
+            print_text = "%s (%d)" % (printable_state, count)
+            result[TestResult.TEST_STATES[state]] = print_text
             # e.g. {'fixed': 'Fixed (8)'}
         return result
 
@@ -488,11 +637,22 @@ class Test(models.Model):
     fix_type = models.CharField(max_length=32, null=True, blank=True)
     fixtext = models.TextField(null=True, blank=True)
     group = models.ForeignKey(TestGroup, blank=True, null=True)
+    # tests with the same content (including group) are stored once
+    content_hash = models.CharField(max_length=40, blank=True, null=True, db_index=True)
     objects = TestManager()
 
+    # fields defining content of test
+    HASH_FIELDS = ['id_ref', 'title', 'description', 'component', 'fix',
+                   'fix_type', 'fixtext']
+
     def __unicode__(self):
         return u"%s %s" % (self.id_ref, self.title)
 
+    @classmethod
+    def compute_hash(cls, values, group_hash=None):
+        """ values is a dict with HASH_FIELDS """
+        return hash_content(*([values.get(key) for key in cls.HASH_FIELDS] + [group_hash]))
+
 
 class TestResultMixin(object):
     def failed(self):
@@ -517,6 +677,10 @@ class TestResultMixin(object):
     def for_tgr(self, group):
         return self.filter(group=group)
 
+    def for_subtree(self, group):
+        """ tests of group and of all its descendants """
+        return self.filter(result=group.result_id, group__path__startswith=group.path)
+
     def search_in_title(self, search_string):
         return self.filter(test__title__icontains=search_string)
 
@@ -601,11 +765,21 @@ class TestResult(models.Model):
     def should_display_solution(self):
         return self.get_state() not in ['pass', 'notapplicable']
 
+    def fixtext(self):
+        """
+        solution text of test with links to files of this result; the test
+        is shared by results, so its links miss the result
+        """
+        if not self.test.fixtext:
+            return self.test.fixtext
+        return self.test.fixtext.replace(
+            '__INSERT_URL__', reverse('show-file', args=(self.result_id,)))
+
 
 class TestLogMixin(object):
-    def bulk_create_logs(self, testlogs, result):
+    def build_logs(self, testlogs, result):
         """
-        create hostruns for list of hosts specified as Query in variable hosts
+        return unsaved TestLog objects of result: testlogs is a list of dicts
         """
         testlog_list = []
         keys = ['date', 'level', 'message']
@@ -615,7 +789,13 @@ class TestLogMixin(object):
             tl = TestLog(**testlog_dict)
             tl.result = result
             testlog_list.append(tl)
-        TestLog.objects.bulk_create(testlog_list)
+        return testlog_list
+
+    def bulk_create_logs(self, testlogs, result):
+        """
+        create logs of result in bulk: testlogs is a list of dicts
+        """
+        TestLog.objects.bulk_create(self.build_logs(testlogs, result))
 
 
 class TestLogQuerySet(models.query.QuerySet, TestLogMixin):
@@ -647,9 +827,9 @@ class RiskMixin(object):
             risks_or |= Q(level=r)
         return self.filter(result__group__result__hostrun=hostrun).filter(risks_or)
 
-    def bulk_create_logs(self, risks, result):
+    def build_logs(self, risks, result):
         """
-        create risk objects in bulk: risks is a list of dicts
+        return unsaved Risk objects of result: risks is a list of dicts
         """
         risks_list = []
 
@@ -657,7 +837,13 @@ class RiskMixin(object):
             tl = Risk(message=risk['message'], level=risk['level'].lower())
             tl.result = result
             risks_list.append(tl)
-        Risk.objects.bulk_create(risks_list)
+        return risks_list
+
+    def bulk_create_logs(self, risks, result):
+        """
+        create risk objects in bulk: risks is a list of dicts
+        """
+        Risk.objects.bulk_create(self.build_logs(risks, result))
 
 
 class RiskQuerySet(models.query.QuerySet, RiskMixin):
@@ -13,6 +13,11 @@ from xml.etree import ElementTree
 
 logger = logging.getLogger('preup_ui')
 
+LOG_RE = re.compile(r"preupg\.log\.(?P<level>(ERROR|WARNING|INFO|DEBUG)): "
+                    r"(?P<date_str>\S+) (?P<time>\S+) (?P<message>.+)")
+RISK_RE = re.compile(r"preupg\.risk\.(?P<level>\w+): (?P<message>.+)")
+LOG_DATE_FORMAT = '%Y-%m-%d %H:%M'
+
 
 def xml_to_html(xml_str):
     """
@@ -88,6 +93,10 @@ class XMLReportParser(object):
         self.run = {'groups': [], }
         # 'symlink' to rules
         self.rules = []
+        # rules by id_ref
+        self.rules_by_id = {}
+        # logs of a report share a few dates
+        self.log_dates = {}
         # everyone loves XML
         self.element_prefix = "{http://checklists.nist.gov/xccdf/1.2}"
 
@@ -121,28 +130,31 @@ class XMLReportParser(object):
 
     def get_test(self, key):
         """ this may throw IndexError if test is not in self.run """
-        #try:
-        return filter(lambda x: x['id_ref'] == key, self.rules)[0]
-        #except IndexError:
-        #    return ''
+        try:
+            return self.rules_by_id[key]
+        except KeyError:
+            raise IndexError(key)
+
+    def parse_rule(self, rule):
+        """ parse <Rule> element and add it to known rules """
+        test = {}
+        test['id_ref'] = rule.attrib['id']
+        set_if_true(test, 'title', self.get_nodes_text(rule, 'title'))
+        set_if_true(test, 'description',
+                    stringify_children(self.get_child(rule, 'description')))
+        set_if_true(test, 'fix', self.get_nodes_text(rule, 'fix'))
+        set_if_true(test, 'fixtext', stringify_children(self.get_child(rule, 'fixtext')))
+        set_if_true(test, 'fix_type',
+                    self.get_nodes_atrib(rule, 'fix', 'system'))
+        self.rules.append(test)
+        self.rules_by_id.setdefault(test['id_ref'], test)
+        return test
 
     def parse_rules(self, root):
         if root is None:
             return []
-        rules = []
-        for rule in self.filter_grandchildren(root, 'Group', 'Rule'):
-            test = {}
-            test['id_ref'] = rule.attrib['id']
-            set_if_true(test, 'title', self.get_nodes_text(rule, 'title'))
-            set_if_true(test, 'description',
-                        stringify_children(self.get_child(rule, 'description')))
-            set_if_true(test, 'fix', self.get_nodes_text(rule, 'fix'))
-            set_if_true(test, 'fixtext', stringify_children(self.get_child(rule, 'fixtext')))
-            set_if_true(test, 'fix_type',
-                        self.get_nodes_atrib(rule, 'fix', 'system'))
-            rules.append(test)
-            self.rules.append(test)
-        return rules
+        return [self.parse_rule(rule)
+                for rule in self.filter_grandchildren(root, 'Group', 'Rule')]
 
     def parse_groups(self, root, parent=None):
         """
@@ -192,32 +204,35 @@ class XMLReportParser(object):
         text = text.strip()
         lines = text.split('\n')
 
-        log_regex = "preupg\.log\.(?P<level>(ERROR|WARNING|INFO|DEBUG)): (?P<date_str>\S+) (?P<time>\S+) (?P<message>.+)"
-        risk_regex = "preupg\.risk\.(?P<level>\w+): (?P<message>.+)"
-        date_format = '%Y-%m-%d %H:%M'
         logs = []
         risks = []
         for line in lines:
-            match = re.match(log_regex, line)
+            match = LOG_RE.match(line)
             if match:
                 match_dict = match.groupdict()
-                try:
-                    dt = match_dict['date_str'] + ' ' + match_dict['time']
-                except KeyError:
-                    pass
-                else:
-                    try:
-                        match_dict['date'] = datetime.strptime(dt, date_format)
-                    except ValueError:
-                        match_dict['date'] = None
+                match_dict['date'] = self.parse_log_date(
+                    match_dict['date_str'] + ' ' + match_dict['time'])
                 logs.append(match_dict)
             else:
-                match = re.match(risk_regex, line)
+                match = RISK_RE.match(line)
                 if match:
                     match_dict = match.groupdict()
                     risks.append(match_dict)
         return logs, risks
 
+    def parse_log_date(self, dt):
+        """ return datetime of log or None; parsed dates are cached """
+        try:
+            return self.log_dates[dt]
+        except KeyError:
+            pass
+        try:
+            date = datetime.strptime(dt, LOG_DATE_FORMAT)
+        except ValueError:
+            date = None
+        self.log_dates[dt] = date
+        return date
+
     def get_test_result_logs(self, elem):
         """ retrieve test's logs from xml """
         # python-2.6: find doesnt know 'name[.*]'
@@ -237,34 +252,42 @@ class XMLReportParser(object):
         parsed_logs, parsed_risks = self.parse_test_result_logs(text)
         return parsed_logs, parsed_risks
 
+    def parse_rule_result(self, result):
+        """ parse <rule-result> element into its test """
+        result_state = self.get_nodes_text(result, 'result')
+        idref = result.attrib['idref']
+        if result_state in ['error', 'notchecked']:
+            logger.error("Test %s crashed.", idref)
+        if result_state in ['notselected']:
+            return
+        try:
+            test = self.get_test(idref)
+        except IndexError:
+            logger.error("Test %s not found", idref)
+        else:
+            set_if_true(test, 'result', result_state)
+            set_if_true(test, 'time', result.attrib['time'])
+
+            # test logs are in element check/check-import[@import-name=stdout]
+            check_elem = self.get_child(result, 'check')
+            if check_elem is not None:
+                parsed_logs, parsed_risks = self.get_test_result_logs(check_elem)
+                set_if_true(test, 'logs', parsed_logs)
+                set_if_true(test, 'risks', parsed_risks)
+
     def parse_rule_results(self, root):
         """ parse info about each test result """
         # element.iter is not on python-2.6
         #for result in root.iter(self.element_prefix + 'rule-result'):
         for result in root.findall('.//' + self.element_prefix + 'rule-result'):
-            result_state = self.get_nodes_text(result, 'result')
-            idref = result.attrib['idref']
-            if result_state in ['error', 'notchecked']:
-                logger.error("Test %s crashed.", idref)
-            if result_state not in ['notselected']:
-                try:
-                    test = self.get_test(idref)
-                except IndexError:
-                    logger.error("Test %s not found", idref)
-                else:
-                    set_if_true(test, 'result', result_state)
-                    set_if_true(test, 'time', result.attrib['time'])
-
-                    # test logs are in element check/check-import[@import-name=stdout]
-                    check_elem = self.get_child(result, 'check')
-                    if check_elem is not None:
-                        parsed_logs, parsed_risks = self.get_test_result_logs(check_elem)
-                        set_if_true(test, 'logs', parsed_logs)
-                        set_if_true(test, 'risks', parsed_risks)
+            self.parse_rule_result(result)
 
     def process_run_info(self, root):
         """ get information about run and info about host """
-        tr = self.get_child(root, 'TestResult')
+        self.parse_test_result(self.get_child(root, 'TestResult'))
+
+    def parse_test_result(self, tr):
+        """ get information about run and info about host from <TestResult> """
         self.run['host'] = self.get_nodes_text(tr, 'target')
         self.run['identity'] = self.get_nodes_text(tr, 'identity')
         self.run['addresses'] = []
@@ -276,8 +299,10 @@ class XMLReportParser(object):
             logger.debug("Started: %s, Finished: %s", self.run['started'], self.run['finished'])
         logger.debug("Host: %s, Identity: %s", self.run['host'], self.run['identity'])
 
-    def parse_report(self):
+    def parse_report(self, stream=False):
         """ parse XML report """
+        if stream:
+            return self.parse_report_stream()
         root = ElementTree.parse(self.path).getroot()
         # rules & groups first
         self.parse_groups(root)
@@ -285,10 +310,93 @@ class XMLReportParser(object):
         self.process_run_info(root)
         return self.run
 
+    def parse_report_stream(self):
+        """
+        parse XML report incrementally
+
+        The result is the same as of parse_report, but <Rule> and
+        <rule-result> elements are freed as soon as they are processed,
+        so the whole document (mostly stdout of tests) is never in memory.
+        Rules have to precede their results, as the XCCDF schema requires.
+        """
+        group_tag = self.element_prefix + 'Group'
+        title_tag = self.element_prefix + 'title'
+        rule_tag = self.element_prefix + 'Rule'
+        result_tag = self.element_prefix + 'rule-result'
+        test_result_tag = self.element_prefix + 'TestResult'
+
+        # every group in document order; whether the group is stored is
+        # known at its end: see parse_groups
+        groups = []
+        group_stack = []
+        elem_stack = []
+        run_info = False
+        for event, elem in ElementTree.iterparse(self.path, ('start', 'end')):
+            if event == 'start':
+                if elem.tag == group_tag:
+                    parent_elem = elem_stack[-1] if elem_stack else None
+                    group = {
+                        'xccdf_id': elem.attrib['id'],
+                        'title': None,
+                        'rules': [],
+                        'top_level': len(elem_stack) == 1,
+                        'has_groups': False,
+                        'parent': None,
+                    }
+                    if parent_elem is not None and parent_elem.tag == group_tag:
+                        group['parent'] = group_stack[-1]
+                        group_stack[-1]['has_groups'] = True
+                    groups.append(group)
+                    group_stack.append(group)
+                elem_stack.append(elem)
+                continue
+
+            elem_stack.pop()
+            parent_elem = elem_stack[-1] if elem_stack else None
+            if elem.tag == group_tag:
+                group_stack.pop()
+                elem.clear()
+            elif elem.tag == title_tag:
+                if parent_elem is not None and parent_elem.tag == group_tag \
+                        and group_stack[-1]['title'] is None:
+                    text = elem.text
+                    group_stack[-1]['title'] = text.strip() if text else ''
+            elif elem.tag == rule_tag:
+                if parent_elem is not None and parent_elem.tag == group_tag \
+                        and group_stack[-1]['parent'] is not None:
+                    group_stack[-1]['parent']['rules'].append(self.parse_rule(elem))
+                elem.clear()
+            elif elem.tag == result_tag:
+                self.parse_rule_result(elem)
+                elem.clear()
+            elif elem.tag == test_result_tag and len(elem_stack) == 1 \
+                    and not run_info:
+                self.parse_test_result(elem)
+                run_info = True
+                elem.clear()
+
+        if not run_info:
+            self.parse_test_result(None)
+        for group in groups:
+            # parents precede their children
+            group['stored'] = group['top_level'] or (
+                group['has_groups'] and group['parent'] is not None and
+                group['parent']['stored'])
+            if not group['stored']:
+                continue
+            group_dict = {}
+            group_dict['xccdf_id'] = group['xccdf_id']
+            group_dict['title'] = group['title'] or ''
+            if group['parent'] is not None:
+                set_if_true(group_dict, 'parent', group['parent']['xccdf_id'])
+            group_dict['rules'] = group['rules']
+            self.run['groups'].append(group_dict)
+        return self.run
+
 
-def parse_xml_report(xml_filepath):
+def parse_xml_report(xml_filepath, stream=False):
     r = XMLReportParser(xml_filepath)
-    return r.parse_report()
+    return r.parse_report(stream)
 
 
 def update_html_report(html_filepath):
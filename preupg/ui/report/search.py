@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Full-text index of titles, logs and risks of all results
+
+Each entry of the index is one title of a group or a test, one log or one
+risk of a result:
+
+    (kind, level, result id, object id, body)
+
+where object is TestGroupResult for 'group' entries and TestResult for the
+others. Entries are kept in an ordinary table indexed by result. SQLite
+searches them by an FTS5 table (FTS4 with older SQLite) with the entries as
+external content, kept in sync by triggers; PostgreSQL by tsvector column
+with GIN index. Other databases and SQLite without full-text search fall
+back to LIKE.
+"""
+import re
+
+from django.db import connection, DatabaseError
+
+TABLE = 'report_searchindex'
+FTS_TABLE = 'report_searchindex_fts'
+KINDS = ('group', 'test', 'log', 'risk')
+COLUMNS = ('kind', 'level', 'result_id', 'object_id', 'body')
+
+PLAIN_TABLE = ("CREATE TABLE %s (id %%s PRIMARY KEY, kind varchar(8) NOT NULL,"
+               " level varchar(32) NOT NULL, result_id integer NOT NULL,"
+               " object_id integer NOT NULL, body text NOT NULL%%s)" % TABLE)
+_NAMES = {'table': TABLE, 'fts': FTS_TABLE}
+# the best available full-text table first, with triggers keeping it in sync
+SQLITE_FTS_TABLES = [
+    ["CREATE VIRTUAL TABLE %(fts)s USING fts5(body, content=%(table)s,"
+     " content_rowid=id)" % _NAMES,
+     "CREATE TRIGGER %(fts)s_insert AFTER INSERT ON %(table)s BEGIN"
+     " INSERT INTO %(fts)s (rowid, body) VALUES (new.id, new.body); END" % _NAMES,
+     "CREATE TRIGGER %(fts)s_delete AFTER DELETE ON %(table)s BEGIN"
+     " INSERT INTO %(fts)s (%(fts)s, rowid, body)"
+     " VALUES ('delete', old.id, old.body); END" % _NAMES],
+    ["CREATE VIRTUAL TABLE %(fts)s USING fts4(body, content=%(table)s)" % _NAMES,
+     "CREATE TRIGGER %(fts)s_insert AFTER INSERT ON %(table)s BEGIN"
+     " INSERT INTO %(fts)s (docid, body) VALUES (new.id, new.body); END" % _NAMES,
+     "CREATE TRIGGER %(fts)s_delete BEFORE DELETE ON %(table)s BEGIN"
+     " DELETE FROM %(fts)s WHERE docid = old.id; END" % _NAMES],
+]
+
+# SQLite limits number of parameters of a query
+CHUNK_SIZE = 500
+
+_backend = {}
+
+
+def create_index():
+    """ create tables of the index for the database in use """
+    cursor = connection.cursor()
+    if connection.vendor == 'sqlite':
+        cursor.execute(PLAIN_TABLE % ('integer', ''))
+        for statements in SQLITE_FTS_TABLES:
+            try:
+                cursor.execute(statements[0])
+            except DatabaseError:
+                continue
+            for sql in statements[1:]:
+                cursor.execute(sql)
+            break
+    elif connection.vendor == 'postgresql':
+        cursor.execute(PLAIN_TABLE % ('serial', ', document tsvector NOT NULL'))
+        cursor.execute("CREATE INDEX %s_document ON %s USING gin(document)" % (TABLE, TABLE))
+    else:
+        cursor.execute(PLAIN_TABLE % ('integer AUTO_INCREMENT', ''))
+    cursor.execute("CREATE INDEX %s_result_id ON %s (result_id)" % (TABLE, TABLE))
+    _backend.clear()
+
+
+def drop_index():
+    cursor = connection.cursor()
+    if get_backend() in ('fts5', 'fts4'):
+        # drops its triggers as well
+        cursor.execute("DROP TABLE %s" % FTS_TABLE)
+    cursor.execute("DROP TABLE %s" % TABLE)
+    _backend.clear()
+
+
+def get_backend():
+    """ return 'fts5', 'fts4', 'postgresql' or 'like' """
+    if connection.vendor not in _backend:
+        backend = 'like'
+        if connection.vendor == 'postgresql':
+            backend = 'postgresql'
+        elif connection.vendor == 'sqlite':
+            cursor = connection.cursor()
+            cursor.execute("SELECT sql FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+            row = cursor.fetchone()
+            sql = row[0].lower() if row else ''
+            for module in ['fts5', 'fts4']:
+                if 'using %s' % module in sql:
+                    backend = module
+        _backend[connection.vendor] = backend
+    return _backend[connection.vendor]
+
+
+def index_entries(entries):
+    """ add entries -- (kind, level, result id, object id, body) -- to the index """
+    values = '%s, %s, %s, %s, %s'
+    columns = ', '.join(COLUMNS)
+    if get_backend() == 'postgresql':
+        # the parser of PostgreSQL keeps paths as one token
+        values += ", to_tsvector('simple', %s)"
+        columns += ', document'
+        entries = [tuple(entry) + (split_words(entry[-1]),) for entry in entries]
+    if entries:
+        connection.cursor().executemany(
+            "INSERT INTO %s (%s) VALUES (%s)" % (TABLE, columns, values), entries)
+
+
+def remove_result(result_id):
+    """ remove entries of result from the index """
+    connection.cursor().execute("DELETE FROM %s WHERE result_id = %%s" % TABLE,
+                                [result_id])
+
+
+def split_words(text):
+    """ return words of text joined by spaces, split on all but letters and digits """
+    return ' '.join(re.findall(r'\w+', text, re.UNICODE))
+
+
+def parse_query(query):
+    """
+    return list of phrases of query; words are split the same way as the
+    index splits them, so a path like /etc/ssh is phrase 'etc ssh'
+    """
+    phrases = []
+    for part in query.split():
+        words = split_words(part)
+        if words:
+            phrases.append(words)
+    return phrases
+
+
+def search(query, kind=None, level=None, limit=100):
+    """
+    return entries -- (kind, level, result id, object id, body) -- matching
+    all phrases of query, the newest first
+    """
+    phrases = parse_query(query)
+    if not phrases:
+        return []
+    backend = get_backend()
+    if backend in ('fts5', 'fts4'):
+        where = ['id IN (SELECT rowid FROM %s WHERE %s MATCH %%s)' % (FTS_TABLE, FTS_TABLE)]
+        params = [' '.join('"%s"' % phrase for phrase in phrases)]
+    elif backend == 'postgresql':
+        # phrases like those of SQLite, requires PostgreSQL 9.6
+        where = ["document @@ (%s)" % ' && '.join(
+            ["phraseto_tsquery('simple', %s)"] * len(phrases))]
+        params = phrases
+    else:
+        params = ['%%%s%%' % part for part in query.split()]
+        where = ['body LIKE %s'] * len(params)
+    if kind:
+        where.append('kind = %s')
+        params.append(kind)
+    if level:
+        where.append('level = %s')
+        params.append(level.lower())
+    params.append(limit)
+    cursor = connection.cursor()
+    cursor.execute("SELECT %s FROM %s WHERE %s ORDER BY id DESC LIMIT %%s" % (
+        ', '.join(COLUMNS), TABLE, ' AND '.join(where)), params)
+    return cursor.fetchall()
+
+
+def result_entries(result_id):
+    """ return entries of stored result for the index """
+    # models import this module
+    from .models import TestGroupResult, TestResult, TestLog, Risk
+    entries = []
+    for group_id, title in TestGroupResult.objects.filter(result=result_id) \
+            .values_list('id', 'group__title'):
+        entries.append(('group', '', result_id, group_id, title))
+    for tr_id, title in TestResult.objects.filter(result=result_id) \
+            .values_list('id', 'test__title'):
+        entries.append(('test', '', result_id, tr_id, title))
+    for kind, model in [('log', TestLog), ('risk', Risk)]:
+        for tr_id, level, message in model.objects.filter(result__result=result_id) \
+                .values_list('result', 'level', 'message'):
+            entries.append((kind, level.lower(), result_id, tr_id, message))
+    return entries
+
+
+def find(query, kind=None, level=None, limit=100):
+    """
+    search the index and return list of hits -- dicts with kind, level,
+    body, result, test result (None for groups) and group result
+    """
+    # models import this module
+    from .models import Result, TestResult, TestGroupResult
+    entries = search(query, kind, level, limit)
+    result_ids = set(entry[2] for entry in entries)
+    tr_ids = set(entry[3] for entry in entries if entry[0] != 'group')
+    group_ids = set(entry[3] for entry in entries if entry[0] == 'group')
+    results = {}
+    trs = {}
+    groups = {}
+    for objects, model, ids, related in [
+            (results, Result, result_ids, ['hostrun__host']),
+            (trs, TestResult, tr_ids, ['test', 'group__group']),
+            (groups, TestGroupResult, group_ids, ['group'])]:
+        ids = list(ids)
+        for start in range(0, len(ids), CHUNK_SIZE):
+            objects.update(model.objects.select_related(*related)
+                           .in_bulk(ids[start:start + CHUNK_SIZE]))
+    hits = []
+    for kind, level, result_id, object_id, body in entries:
+        # results deleted in bulk may stay in the index
+        if result_id not in results:
+            continue
+        if kind == 'group':
+            test_result = None
+            group = groups.get(object_id)
+        else:
+            test_result = trs.get(object_id)
+            group = test_result.group if test_result else None
+        hits.append({
+            'kind': kind,
+            'level': level,
+            'body': body,
+            'result': results[result_id],
+            'test_result': test_result,
+            'group': group,
+        })
+    return hits
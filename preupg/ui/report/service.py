@@ -5,16 +5,20 @@ import os
 import datetime
 import tarfile
 import shutil
+import threading
+import time
 
 from .models import Test, TestResult, HostRun, Result, Address, TestLog, TestGroup, TestGroupResult
 from .models import Risk
 
 from processing import parse_xml_report, update_html_report
+from search import index_entries, remove_result
 
-from django.db import transaction
+from django.db import transaction, connection, close_connection, DatabaseError
+from django.db.models import Count, F, Max
 from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.core.urlresolvers import reverse
+from django.utils.datastructures import SortedDict
 
 
 DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
@@ -30,16 +34,19 @@ def filter_files_by_ext(tar_content, ext, error_msg):
 
 
 def remove_upload(path):
-    """ add exc handling & logging """
+    """ remove uploaded tarball with its directory; errors are logged only """
     abs_path = os.path.abspath(path)
     if not abs_path.startswith(settings.MEDIA_ROOT):
         logger.error("Upload is not in MEDIA_ROOT, canceling cleanup process")
         return
     tb_dir = os.path.dirname(abs_path)
-    if not os.path.samefile(settings.MEDIA_ROOT, tb_dir):
-        shutil.rmtree(tb_dir)
-    else:
-        os.unlink(abs_path)
+    try:
+        if not os.path.samefile(settings.MEDIA_ROOT, tb_dir):
+            shutil.rmtree(tb_dir)
+        else:
+            os.unlink(abs_path)
+    except OSError:
+        logger.exception("Removal of upload %s failed.", path)
 
 
 def extract_tarball(tbpath, target_dir):
@@ -69,6 +76,52 @@ def extract_tarball(tbpath, target_dir):
     return xml_path, html_path
 
 
+# SQLite limits number of parameters of a query
+CHUNK_SIZE = 500
+
+# databases which assign consecutive ids to rows of one bulk insert
+CONSECUTIVE_IDS_VENDORS = ('sqlite', )
+
+
+def bulk_create_with_ids(model, objects, key, **filters):
+    """
+    insert objects with a few queries and set their primary keys
+
+    bulk_create doesn't set primary keys. SQLite assigns consecutive ids and
+    the import transaction holds its write lock since the first insert, so
+    the objects got the last len(objects) ids of the table. Other databases
+    don't guarantee this, so the ids are selected back by field key, which
+    identifies each of the objects among the stored objects matching filters.
+    """
+    if not objects:
+        return
+    model.objects.bulk_create(objects)
+    if connection.vendor in CONSECUTIVE_IDS_VENDORS:
+        last_id = model.objects.aggregate(last_id=Max('id'))['last_id']
+        for obj_id, obj in enumerate(objects, last_id - len(objects) + 1):
+            obj.id = obj_id
+        return
+    attname = model._meta.get_field(key).attname
+    keys = [getattr(obj, attname) for obj in objects]
+    ids = {}
+    for start in range(0, len(keys), CHUNK_SIZE):
+        ids.update(model.objects.filter(**filters)
+                   .filter(**{key + '__in': keys[start:start + CHUNK_SIZE]})
+                   .values_list(key, 'id'))
+    for obj, obj_key in zip(objects, keys):
+        obj.id = ids[obj_key]
+
+
+def get_ids_by_hash(model, hashes):
+    """ return {content hash: id} of stored objects with the given hashes """
+    hashes = list(set(hashes))
+    ids = {}
+    for start in range(0, len(hashes), CHUNK_SIZE):
+        ids.update(model.objects.filter(content_hash__in=hashes[start:start + CHUNK_SIZE])
+                   .values_list('content_hash', 'id'))
+    return ids
+
+
 class ReportImporter(object):
     """
     Imports report on provided path to database
@@ -80,7 +133,11 @@ class ReportImporter(object):
         hostrun = get_object_or_404(HostRun, id=hostrun_id)
         self.hostrun = hostrun
         self.run = hostrun.run
-        self.result = self._create_result()
+        try:
+            # result of a queued import is created when it is queued
+            self.result = hostrun.result
+        except Result.DoesNotExist:
+            self.result = self._create_result()
 
         # initialized in execute_import -> process_tarball
         self.parsed_data = None
@@ -111,98 +168,202 @@ class ReportImporter(object):
     def _process_tarball(self):
         xml_path, html_path = extract_tarball(self.tb_path, self.result.get_result_dir())
         self.html_path = html_path
-        remove_upload(self.tb_path)
         update_html_report(self.html_path)
-        return parse_xml_report(xml_path)
+        return parse_xml_report(xml_path, stream=True)
 
     @transaction.commit_on_success
     def _add_to_db(self):
-        """ add data to dabase """
-        for address in self.parsed_data['addresses']:
-            Address(address=address, result=self.result).save()
+        """ add data to database with a few bulk inserts per model """
+        Address.objects.bulk_create([
+            Address(address=address, result=self.result)
+            for address in self.parsed_data['addresses']])
 
-        test_keys = ['id_ref', 'title', 'description', 'fix', 'fix_type', 'fixtext']
         group_keys = ['xccdf_id', 'title', ]
-        # cache of processed groups -- efficient way of assigning parents
-        groups = {}
-        for group in self.parsed_data['groups']:
-            group_dict = dict((key, group[key]) for key in group_keys if key in group)
+        parsed_groups = self.parsed_data['groups']
+        # groups are parsed parents first, so they can be inserted level by
+        # level with ids of their parents known
+        depths = {}
+        # position of group in result is its step of materialized path
+        indexes = {}
+        for index, group in enumerate(parsed_groups):
+            indexes[group['xccdf_id']] = index
             if 'parent' in group:
-                group_dict['parent'] = groups[group['parent']][0]
-            tg = TestGroup.objects.create(**group_dict)
-
-            trg = TestGroupResult()
-            trg.group = tg
-            trg.result = self.result
-            if 'parent' in group:
-                trg.parent = groups[group['parent']][1]
-            trg.save()
-            trg.root = trg.get_root()
-
-            # save group and group result
-            groups[group_dict['xccdf_id']] = (tg, trg)
-
-            for rule in group['rules']:
-                test_dict = dict((key, rule[key]) for key in test_keys if key in rule)
-                test_dict['group'] = tg
-                try:
-                    # links in fixtext miss id of result, see report/processing.py stringify_children
-                    test_dict['fixtext'] = test_dict['fixtext'].replace(
-                        '__INSERT_URL__',
-                        reverse('show-file', args=(self.result.id,))
-                    )
-                except KeyError:
-                    pass
-                t = Test.objects.create(**test_dict)
-
-                tr = TestResult()
-                try:
-                    tr.set_state(rule['result'], False)
-                except KeyError:
-                    # rule wasn't selected probably
+                depths[group['xccdf_id']] = depths[group['parent']] + 1
+            else:
+                depths[group['xccdf_id']] = 0
+        # processed groups by xccdf_id: content hash, id, group result
+        group_hashes = {}
+        group_ids = {}
+        trgs_by_id = {}
+        for depth in range(max(depths.values()) + 1 if depths else 0):
+            level = [g for g in parsed_groups if depths[g['xccdf_id']] == depth]
+            for group in level:
+                group_hashes[group['xccdf_id']] = TestGroup.compute_hash(
+                    group['xccdf_id'], group.get('title'),
+                    group_hashes.get(group.get('parent')))
+            # groups are shared with other results, create just the new ones
+            ids_by_hash = get_ids_by_hash(
+                TestGroup, [group_hashes[g['xccdf_id']] for g in level])
+            new_groups = SortedDict()
+            for group in level:
+                content_hash = group_hashes[group['xccdf_id']]
+                if content_hash in ids_by_hash or content_hash in new_groups:
                     continue
-                tr.date = datetime.datetime.strptime(rule['time'], DATE_FORMAT)
-                tr.test = t
-                tr.group = trg
-                tr.result = self.result
-                tr.root_group = trg.get_root()
-                tr.save()
-
-                # add logs to DB
-                if 'logs' in rule:
-                    TestLog.objects.bulk_create_logs(rule['logs'], tr)
-                if 'risks' in rule:
-                    Risk.objects.bulk_create_logs(rule['risks'], tr)
-
-    def _calculate_group_stats(self):
-        groups = []
-        def recurs(parent, child):
-            for gch in child.children():
-                recurs(child, gch)
-            child.failed_test_count += TestResult.objects.for_tgr(child).failed().count()
-            child.ni_test_count += TestResult.objects.for_tgr(child).ni().count()
-            child.na_test_count += TestResult.objects.for_tgr(child).na().count()
-            child.test_count += TestResult.objects.for_tgr(child).count()
-            if parent:
-                parent.failed_test_count += child.failed_test_count
-                parent.ni_test_count += child.ni_test_count
-                parent.na_test_count += child.na_test_count
-                parent.test_count += child.test_count
-            groups.append(child)
-
-        for group in self.result.groups:
-            if group in groups:
+                tg = TestGroup(**dict((key, group[key]) for key in group_keys if key in group))
+                tg.content_hash = content_hash
+                if 'parent' in group:
+                    tg.parent_id = group_ids[group['parent']]
+                new_groups[content_hash] = tg
+            bulk_create_with_ids(TestGroup, new_groups.values(), 'content_hash')
+            for content_hash, tg in new_groups.items():
+                ids_by_hash[content_hash] = tg.id
+            for group in level:
+                group_ids[group['xccdf_id']] = ids_by_hash[group_hashes[group['xccdf_id']]]
+
+            trgs = []
+            for group in level:
+                trg = TestGroupResult(group_id=group_ids[group['xccdf_id']],
+                                      result=self.result)
+                if 'parent' in group:
+                    parent = trgs_by_id[group['parent']]
+                    trg.parent_id = parent.id
+                    trg.root_id = parent.root_id
+                    trg.path = TestGroupResult.make_path(indexes[group['xccdf_id']],
+                                                         parent.path)
+                else:
+                    trg.path = TestGroupResult.make_path(indexes[group['xccdf_id']])
+                trgs.append(trg)
+            bulk_create_with_ids(TestGroupResult, trgs, 'path', result=self.result)
+            for group, trg in zip(level, trgs):
+                if trg.root_id is None:
+                    trg.root_id = trg.id
+                trgs_by_id[group['xccdf_id']] = trg
+        # root groups are their own roots
+        TestGroupResult.objects.filter(
+            result=self.result, parent__isnull=True).update(root=F('id'))
+
+        # links in fixtext miss id of result (see report/processing.py
+        # stringify_children), it is inserted by TestResult.fixtext
+        test_rules = []
+        for group in parsed_groups:
+            for rule in group['rules']:
+                content_hash = Test.compute_hash(rule, group_hashes[group['xccdf_id']])
+                test_rules.append((rule, group, content_hash))
+        test_ids = get_ids_by_hash(Test, [x[2] for x in test_rules])
+        new_tests = SortedDict()
+        for rule, group, content_hash in test_rules:
+            if content_hash in test_ids or content_hash in new_tests:
                 continue
-            recurs(None, group)
-
-        for group in groups:
-            group.save()
+            t = Test(**dict((key, rule[key]) for key in Test.HASH_FIELDS if key in rule))
+            t.group_id = group_ids[group['xccdf_id']]
+            t.content_hash = content_hash
+            new_tests[content_hash] = t
+        bulk_create_with_ids(Test, new_tests.values(), 'content_hash')
+        for content_hash, t in new_tests.items():
+            test_ids[content_hash] = t.id
+
+        trs = []
+        tr_rules = []
+        for rule, group, content_hash in test_rules:
+            trg = trgs_by_id[group['xccdf_id']]
+            tr = TestResult(test_id=test_ids[content_hash], group_id=trg.id,
+                            root_group_id=trg.root_id, result=self.result)
+            try:
+                tr.set_state(rule['result'], False)
+            except KeyError:
+                # rule wasn't selected probably
+                continue
+            tr.date = datetime.datetime.strptime(rule['time'], DATE_FORMAT)
+            trs.append(tr)
+            tr_rules.append(rule)
+        # test hashes include the rule id, which is unique in a report
+        bulk_create_with_ids(TestResult, trs, 'test', result=self.result)
+
+        # add logs to DB
+        logs = []
+        risks = []
+        for tr, rule in zip(trs, tr_rules):
+            if 'logs' in rule:
+                logs.extend(TestLog.objects.build_logs(rule['logs'], tr))
+            if 'risks' in rule:
+                risks.extend(Risk.objects.build_logs(rule['risks'], tr))
+        TestLog.objects.bulk_create(logs)
+        Risk.objects.bulk_create(risks)
+
+        # titles, logs and risks are searchable in all results
+        entries = []
+        for group in parsed_groups:
+            entries.append(('group', '', self.result.id,
+                            trgs_by_id[group['xccdf_id']].id, group.get('title') or ''))
+        for tr, rule in zip(trs, tr_rules):
+            entries.append(('test', '', self.result.id, tr.id, rule.get('title') or ''))
+        for kind, objects in [('log', logs), ('risk', risks)]:
+            for obj in objects:
+                entries.append((kind, (obj.level or '').lower(), self.result.id,
+                                obj.result_id, obj.message))
+        index_entries(entries)
+
+    # counters of TestGroupResult and Result and states of tests they count
+    STATS_STATES = [
+        ('failed_test_count', [TestResult.FAILURE]),
+        ('ni_test_count', [TestResult.NEEDS_INSPECTION]),
+        ('na_test_count', [TestResult.NEEDS_ACTION]),
+        ('test_count', None),
+    ]
+
+    def _count_states(self, state_counts):
+        """ return stats for {state: count} as dict of counters """
+        stats = {}
+        for field, states in self.STATS_STATES:
+            stats[field] = sum(count for state, count in state_counts.items()
+                               if states is None or state in states)
+        return stats
 
-    def _calculate_result_stats(self):
-        self.result.test_count = TestResult.objects.for_result(self.result).count()
-        self.result.failed_test_count = TestResult.objects.for_result(self.result).failed().count()
-        self.result.na_test_count = TestResult.objects.for_result(self.result).na().count()
-        self.result.ni_test_count = TestResult.objects.for_result(self.result).ni().count()
+    def _calculate_group_stats(self):
+        """
+        count states of tests in all groups with one query, add them to the
+        groups on their paths in memory and store groups with the same stats
+        by one update
+        """
+        state_counts = {}
+        rows = TestResult.objects.for_result(self.result).order_by() \
+            .values('group', 'state').annotate(count=Count('state'))
+        for row in rows:
+            group_counts = state_counts.setdefault(row['group'], {})
+            group_counts[row['state']] = row['count']
+
+        paths = dict(TestGroupResult.objects.for_result(self.result)
+                     .values_list('id', 'path'))
+        ids_by_path = dict((path, group_id) for group_id, path in paths.items())
+        stats = dict((group_id, self._count_states({})) for group_id in paths)
+        for group_id, group_counts in state_counts.items():
+            group_stats = self._count_states(group_counts)
+            # the group itself and all its ancestors
+            for path in TestGroupResult.ancestor_paths(paths[group_id]):
+                ancestor_stats = stats[ids_by_path[path]]
+                for field, value in group_stats.items():
+                    ancestor_stats[field] += value
+
+        groups_by_stats = {}
+        for group_id, group_stats in stats.items():
+            key = tuple(sorted(group_stats.items()))
+            groups_by_stats.setdefault(key, []).append(group_id)
+        for key, group_ids in groups_by_stats.items():
+            for start in range(0, len(group_ids), CHUNK_SIZE):
+                TestGroupResult.objects.filter(id__in=group_ids[start:start + CHUNK_SIZE]) \
+                    .update(**dict(key))
+
+        # result counts all tests
+        result_counts = {}
+        for group_counts in state_counts.values():
+            for state, count in group_counts.items():
+                result_counts[state] = result_counts.get(state, 0) + count
+        return result_counts
+
+    def _calculate_result_stats(self, state_counts):
+        for field, value in self._count_states(state_counts).items():
+            setattr(self.result, field, value)
+        self.result.state_counts = Result.encode_state_counts(state_counts)
         self.result.save()
 
     def _calculate_stats(self):
@@ -210,21 +371,33 @@ class ReportImporter(object):
         calculate helpful stats functions, like sums
          -- this is best to be done, when everything's in DB
         """
-        self._calculate_group_stats()
-        self._calculate_result_stats()
+        state_counts = self._calculate_group_stats()
+        self._calculate_result_stats(state_counts)
+
+    @transaction.commit_on_success
+    def _remove_imported(self):
+        """ remove data stored by a failed attempt to import the result """
+        Address.objects.filter(result=self.result).delete()
+        TestResult.objects.filter(result=self.result).delete()
+        TestGroupResult.objects.filter(result=self.result).delete()
+        remove_result(self.result.id)
 
     def execute_import(self):
         """ execute import itself, this is the main call """
+        # the filename is stored by _update_result
+        if self.result.filename:
+            self._remove_imported()
         self.parsed_data = self._process_tarball()
         self._update_result()
         self._add_to_db()
+        self._calculate_stats()
 
         self.hostrun.set_finished()
         self.hostrun.set_risk()
         if self.run.all_done():
             self.run.finish()
-
-        self._calculate_stats()
+        # the tarball is kept for another attempt until the import succeeds
+        remove_upload(self.tb_path)
 
 
 def import_report(tb_path, hostrun_id):
@@ -232,6 +405,93 @@ def import_report(tb_path, hostrun_id):
     ri.execute_import()
 
 
+def queue_report(tb_path, hostrun):
+    """
+    queue tarball for import by preupg-ui-manage import_queue and return
+    its (still empty) result; the tarball is imported at once if the queue
+    is disabled
+    """
+    if not settings.IMPORT_QUEUE:
+        try:
+            import_report(tb_path, hostrun.id)
+        except Exception:
+            # imports outside of the queue are not attempted again
+            remove_upload(tb_path)
+            raise
+        return hostrun.result
+    result = Result.objects.create(hostrun=hostrun)
+    hostrun.set_queued(tb_path)
+    return result
+
+
+class ClaimHeartbeat(threading.Thread):
+    """ refresh claim of hostrun every IMPORT_HEARTBEAT seconds until stopped """
+
+    def __init__(self, hostrun):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.hostrun = hostrun
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.IMPORT_HEARTBEAT):
+                try:
+                    if not self.hostrun.beat():
+                        logger.error("Import of %s was taken over by another worker.",
+                                     self.hostrun.tarball)
+                        return
+                except DatabaseError:
+                    logger.exception("Refreshing claim of %s failed.", self.hostrun.tarball)
+        finally:
+            # each thread has its own connection
+            close_connection()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def import_queued(hostrun):
+    """ import tarball of hostrun claimed from the queue """
+    # own copy of hostrun for the thread
+    heartbeat = ClaimHeartbeat(HostRun.objects.get(id=hostrun.id))
+    heartbeat.start()
+    try:
+        import_report(hostrun.tarball, hostrun.id)
+    except Exception:
+        logger.exception("Import of %s failed.", hostrun.tarball)
+        hostrun.set_failed()
+        if hostrun.run.all_done():
+            hostrun.run.finish()
+        return False
+    finally:
+        heartbeat.stop()
+    return True
+
+
+def process_queue(poll_interval, once=False):
+    """
+    import queued tarballs one by one; wait poll_interval seconds when the
+    queue is empty, or return if once is set
+    """
+    while True:
+        try:
+            hostrun = HostRun.objects.claim_next()
+            if hostrun is not None:
+                import_queued(hostrun)
+                continue
+        except DatabaseError:
+            # e.g. locked SQLite database, the worker tries again later
+            logger.exception("Processing of the import queue failed.")
+            close_connection()
+            time.sleep(poll_interval)
+            continue
+        if once:
+            return
+        time.sleep(poll_interval)
+
+
 def main():
     pass
 
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import re
+
+from south.v2 import DataMigration
+from django.core.urlresolvers import reverse
+
+# frozen copy of hashing of the importer at the time of this migration;
+# the hashes have to match those computed by it
+HASH_FIELDS = ['id_ref', 'title', 'description', 'component', 'fix',
+               'fix_type', 'fixtext']
+
+
+def hash_content(*values):
+    """ return SHA-1 of values of a definition, None is the same as '' """
+    hasher = hashlib.sha1()
+    for value in values:
+        hasher.update((value or u'').encode('utf-8'))
+        hasher.update(b'\0')
+    return hasher.hexdigest()
+
+
+def chunks(ids, size=500):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+class Migration(DataMigration):
+
+    def forwards(self, orm):
+        """
+        compute content hashes of groups and tests and collapse duplicates
+
+        Links in fixtext of tests are turned back to __INSERT_URL__, the
+        result is inserted into them on rendering now.
+        """
+        url = reverse('show-file', args=(12345,))
+        url_re = re.compile(re.escape(url).replace('12345', r'\d+'))
+
+        # groups are created after their parents, so parents come first
+        group_hashes = {}
+        kept_groups = {}
+        group_duplicates = {}
+        for group in orm.TestGroup.objects.order_by('id').values('id', 'xccdf_id', 'title', 'parent').iterator():
+            content_hash = hash_content(group['xccdf_id'], group['title'],
+                                        group_hashes.get(group['parent']))
+            group_hashes[group['id']] = content_hash
+            if content_hash in kept_groups:
+                group_duplicates[group['id']] = kept_groups[content_hash]
+            else:
+                kept_groups[content_hash] = group['id']
+                orm.TestGroup.objects.filter(id=group['id']).update(content_hash=content_hash)
+
+        kept_tests = {}
+        test_duplicates = {}
+        fields = ['id', 'group'] + HASH_FIELDS
+        for test in orm.Test.objects.order_by('id').values(*fields).iterator():
+            if test['fixtext']:
+                test['fixtext'] = url_re.sub('__INSERT_URL__', test['fixtext'])
+            content_hash = hash_content(*([test[key] for key in HASH_FIELDS] +
+                                          [group_hashes.get(test['group'])]))
+            if content_hash in kept_tests:
+                test_duplicates[test['id']] = kept_tests[content_hash]
+            else:
+                kept_tests[content_hash] = test['id']
+                orm.Test.objects.filter(id=test['id']).update(
+                    content_hash=content_hash, fixtext=test['fixtext'])
+
+        for old_id, new_id in test_duplicates.items():
+            orm.TestResult.objects.filter(test=old_id).update(test=new_id)
+        for old_id, new_id in group_duplicates.items():
+            orm.TestGroup.objects.filter(parent=old_id).update(parent=new_id)
+            orm.TestGroupResult.objects.filter(group=old_id).update(group=new_id)
+            orm.Test.objects.filter(group=old_id).update(group=new_id)
+        for ids in chunks(test_duplicates):
+            orm.Test.objects.filter(id__in=ids).delete()
+        for ids in chunks(group_duplicates):
+            orm.TestGroup.objects.filter(id__in=ids).delete()
+
+    def backwards(self, orm):
+        "Shared groups and tests are kept shared."
+
+    models = {
+        u'report.address': {
+            'Meta': {'object_name': 'Address'},
+            'address': ('django.db.models.fields.GenericIPAddressField', [], {'max_length': '39'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'result': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['report.Result']"})
+        },
+        u'report.host': {
+            'Meta': {'object_name': 'Host'},
+            'hostname': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'local': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'os': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['report.OS']", 'null': 'True', 'blank': 'True'}),
+            'ssh_name': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'}),
+            'ssh_password': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'}),
+            'su_login': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'}),
+            'sudo_password': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'})
+        },
+        u'report.hostrun': {
+            'Meta': {'ordering': "('-run__dt_submitted',)", 'object_name': 'HostRun'},
+            'dt_finished': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'host': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['report.Host']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'risk': ('django.db.models.fields.CharField', [], {'db_index': 'True', 'max_length': '16', 'null': 'True', 'blank': 'True'}),
+            'run': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['report.Run']"}),
+            'state': ('django.db.models.fields.CharField', [], {'default': "'r'", 'max_length': '1', 'db_index': 'True'}),
+            'tarball': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'})
+        },
+        u'report.os': {
+            'Meta': {'ordering': "('major', 'minor')", 'object_name': 'OS'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'major': ('django.db.models.fields.SmallIntegerField', [], {}),
+            'minor': ('django.db.models.fields.SmallIntegerField', [], {})
+        },
+        u'report.result': {
+            'Meta': {'object_name': 'Result'},
+            'dt_finished': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'dt_submitted': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'failed_test_count': ('django.db.models.fields.SmallIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'filename': ('django.db.models.fields.CharField', [], {'max_length': '128', 'null': 'True', 'blank': 'True'}),
+            'hostname': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'}),
+            'hostrun': ('django.db.models.fields.related.OneToOneField', [], {'to': u"orm['report.HostRun']", 'unique': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'identity': ('django.db.models.fields.CharField', [], {'max_length': '255', 'null': 'True', 'blank': 'True'}),
+            'na_test_count': ('django.db.models.fields.SmallIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'ni_test_count': ('django.db.models.fields.SmallIntegerField', [], {'null': 'True', 'blank': 'True'}),
+            'test_count': ('django.db.models.fields.SmallIntegerField', [], {'null': 'True', 'blank': 'True'})
+        },
+        u'report.risk': {
+            'Meta': {'object_name': 'Risk'},
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'level': ('django.db.models.fields.CharField', [], {'max_length': '32'}),
+            'message': ('django.db.models.fields.TextField', [], {}),
+            'result': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['report.TestResult']"})
+        },
+        u'report.run': {
+            'Meta': {'ordering': "('-dt_submitted',)", 'object_name': 'Run'},
+            'dt_finished': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            'dt_submitted': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'})
+        },
+        u'report.test': {
+            'Meta': {'object_name': 'Test'},
+            'component': ('django.db.models.fields.CharField', [], {'max_length': '128', 'null': 'True', 'blank': 'True'}),
+            'content_hash': ('django.db.models.fields.CharField', [], {'db_index': 'True', 'max_length': '40', 'null': 'True', 'blank': 'True'}),
+            'description': ('django.db.models.fields.TextField', [], {}),
+            'fix': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'fix_type': ('django.db.models.fields.CharField', [], {'max_length': '32', 'null': 'True', 'blank': 'True'}),
+            'fixtext': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'group': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['report.TestGroup']", 'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'id_ref': ('django.db.models.fields.CharField', [], {'max_length': '255'}),
+            'title': ('django.db.models.fields.CharField', [], {'max_length': '255', 'db_index': 'True'})
+        },
+        u'report.testgroup': {
+            'Meta': {'ordering': "('title',)", 'object_name': 'TestGroup'},
+            'content_hash': ('django.db.models.fields.CharField', [], {'db_index': 'True', 'max_length': '40', 'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'parent': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['report.TestGroup']", 'null': 'True', 'blank': 'True'}),
+            'title': ('django.db.models.fields.CharField', [], {'max_length': '255', 'db_index': 'True'}),
+            'xccdf_id': ('django.db.models.fields.CharField', [], {'max_length': '128'})
+        },
+        u'report.testgroupresult': {
+            'Meta': {'ordering': "('group',)", 'object_name': 'TestGroupResult'},
+            'failed_test_count': ('django.db.models.fields.SmallIntegerField', [], {'default': '0', 'null': 'True', 'blank': 'True'}),
+            'group': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['report.TestGroup']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'na_test_count': ('django.db.models.fields.SmallIntegerField', [], {'default': '0', 'null': 'True', 'blank': 'True'}),
+            'ni_test_count': ('django.db.models.fields.SmallIntegerField', [], {'default': '0', 'null': 'True', 'blank': 'True'}),
+            'parent': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'direct_children_set'", 'null': 'True', 'to': u"orm['report.TestGroupResult']"}),
+            'result': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['report.Result']"}),
+            'root': ('django.db.models.fields.related.ForeignKey', [], {'blank': 'True', 'related_name': "'all_children_set'", 'null': 'True', 'to': u"orm['report.TestGroupResult']"}),
+            'test_count': ('django.db.models.fields.SmallIntegerField', [], {'default': '0', 'null': 'True', 'blank': 'True'})
+        },
+        u'report.testlog': {
+            'Meta': {'object_name': 'TestLog'},
+            'date': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'blank': 'True'}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'level': ('django.db.models.fields.CharField', [], {'max_length': '32'}),
+            'message': ('django.db.models.fields.TextField', [], {}),
+            'result': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['report.TestResult']"})
+        },
+        u'report.testresult': {
+            'Meta': {'ordering': "('state',)", 'object_name': 'TestResult'},
+            'date': ('django.db.models.fields.DateTimeField', [], {}),
+            'group': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'testresult_set'", 'to': u"orm['report.TestGroupResult']"}),
+            u'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'result': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['report.Result']"}),
+            'root_group': ('django.db.models.fields.related.ForeignKey', [], {'related_name': "'all_tests'", 'to': u"orm['report.TestGroupResult']"}),
+            'state': ('django.db.models.fields.CharField', [], {'max_length': '3', 'db_index': 'True'}),
+            'test': ('django.db.models.fields.related.ForeignKey', [], {'to': u"orm['report.Test']"})
+        }
+    }
+
+    complete_apps = ['report']
+    symmetrical = True
\ No newline at end of file
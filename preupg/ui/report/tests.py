@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import datetime
 import shutil
 import unittest
 import tempfile
@@ -9,9 +10,20 @@ from xml.etree import ElementTree
 from preupg.application import Application
 from preupg.conf import DummyConf, Conf
 from preupg.ui.report.processing import xml_to_html, stringify_children, parse_xml_report
-from preupg.ui.report.service import extract_tarball
+from preupg.ui.report.models import Host, HostRun, Run, Result, TestGroupResult, TestResult
+from preupg.ui.report.models import Test, TestGroup
+from preupg.ui.report.service import extract_tarball, queue_report, process_queue
+from preupg.ui.report import service
+from preupg.ui.report import search
+from preupg.ui.report.search import find, parse_query
+from preupg.ui.report.service import ReportImporter
+from preupg.ui.utils.tree import render_result
 
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DatabaseError
 from django.test import TestCase
+from django.test.utils import override_settings
 
 
 class TestXML(TestCase):
@@ -57,6 +69,286 @@ Text outside tag <html:div>Text <html:em>inside</html:em> tag</html:div> x <b>y<
         r3 = stringify_children(node3).strip()
         self.assertEqual(r3, 'a <y>t<y2>a</y2>y</y>y')
 
+    def _write_report(self):
+        report = """\
+<ns0:Benchmark xmlns:ns0="http://checklists.nist.gov/xccdf/1.2" id="all">
+  <ns0:Group id="set">
+    <ns0:title>Set</ns0:title>
+    <ns0:Group id="module1"><ns0:title>Module 1</ns0:title>
+      <ns0:Rule id="rule1"><ns0:title>Rule 1</ns0:title></ns0:Rule>
+    </ns0:Group>
+    <ns0:Group id="category"><ns0:title>Category</ns0:title>
+      <ns0:Group id="module2"><ns0:title>Module 2</ns0:title>
+        <ns0:Rule id="rule2"><ns0:title>Rule 2</ns0:title></ns0:Rule>
+      </ns0:Group>
+    </ns0:Group>
+  </ns0:Group>
+  <ns0:TestResult id="result" start-time="2016-08-24T17:39:10" end-time="2016-08-24T17:41:12">
+    <ns0:target>localhost</ns0:target>
+    <ns0:identity>root</ns0:identity>
+    <ns0:target-address>127.0.0.1</ns0:target-address>
+    <ns0:rule-result idref="rule1" time="2016-08-24T17:39:11">
+      <ns0:result>fail</ns0:result>
+      <ns0:check><ns0:check-import import-name="stdout">
+preupg.log.INFO: 2016-08-24 17:39 first
+preupg.log.INFO: 2016-08-24 17:39 second
+preupg.risk.HIGH: risky
+</ns0:check-import></ns0:check>
+    </ns0:rule-result>
+    <ns0:rule-result idref="rule2" time="2016-08-24T17:39:12">
+      <ns0:result>pass</ns0:result>
+    </ns0:rule-result>
+    <ns0:rule-result idref="unknown" time="2016-08-24T17:39:13">
+      <ns0:result>pass</ns0:result>
+    </ns0:rule-result>
+  </ns0:TestResult>
+</ns0:Benchmark>"""
+        report_file = tempfile.NamedTemporaryFile(suffix='.xml')
+        report_file.write(report)
+        report_file.flush()
+        return report_file
+
+    def test_parse_report(self):
+        report_file = self._write_report()
+        try:
+            run = parse_xml_report(report_file.name)
+        finally:
+            report_file.close()
+        self.assertEqual([(g['xccdf_id'], g.get('parent')) for g in run['groups']],
+                         [('set', None), ('category', 'set')])
+        self.assertEqual([r['id_ref'] for r in run['groups'][0]['rules']],
+                         ['rule1'])
+        rule = run['groups'][0]['rules'][0]
+        self.assertEqual(rule['result'], 'fail')
+        self.assertEqual([l['message'] for l in rule['logs']],
+                         ['first', 'second'])
+        self.assertEqual(rule['logs'][0]['date'].minute, 39)
+        self.assertEqual(rule['risks'], [{'level': 'HIGH', 'message': 'risky'}])
+        self.assertEqual(run['groups'][1]['rules'][0]['result'], 'pass')
+        self.assertEqual(run['addresses'], ['127.0.0.1'])
+
+    def test_parse_report_stream(self):
+        report_file = self._write_report()
+        try:
+            self.assertEqual(parse_xml_report(report_file.name, stream=True),
+                             parse_xml_report(report_file.name))
+        finally:
+            report_file.close()
+
+
+@override_settings(IMPORT_QUEUE=True)
+class TestImportQueue(TestCase):
+
+    def setUp(self):
+        host = Host.objects.create(hostname='localhost')
+        self.run = Run.objects.create_for_host(host)
+        self.hostrun = self.run.first_hostrun()
+
+    def test_queue(self):
+        result = queue_report('/nonexistent/result.tar.gz', self.hostrun)
+        hostrun = HostRun.objects.get(id=self.hostrun.id)
+        self.assertTrue(hostrun.queued)
+        self.assertEqual(hostrun.result, result)
+        self.assertFalse(self.run.all_done())
+        claimed = HostRun.objects.claim_next()
+        self.assertEqual(claimed.id, hostrun.id)
+        self.assertTrue(claimed.importing)
+        # each queued hostrun is claimed only once
+        self.assertEqual(HostRun.objects.claim_next(), None)
+
+    def test_stale_import(self):
+        queue_report('/nonexistent/result.tar.gz', self.hostrun)
+        HostRun.objects.claim_next()
+        # the worker importing the hostrun was killed
+        HostRun.objects.filter(id=self.hostrun.id).update(
+            dt_claimed=datetime.datetime.now() - datetime.timedelta(
+                seconds=settings.IMPORT_TIMEOUT + 1))
+        self.assertEqual(HostRun.objects.claim_next().id, self.hostrun.id)
+        self.assertEqual(HostRun.objects.claim_next(), None)
+
+    def test_heartbeat(self):
+        queue_report('/nonexistent/result.tar.gz', self.hostrun)
+        claimed = HostRun.objects.claim_next()
+        stale = datetime.datetime.now() - datetime.timedelta(
+            seconds=settings.IMPORT_TIMEOUT + 1)
+        HostRun.objects.filter(id=claimed.id).update(dt_claimed=stale)
+        claimed.dt_claimed = stale
+        # the claim of a long but live import is refreshed
+        self.assertTrue(claimed.beat())
+        self.assertEqual(HostRun.objects.claim_next(), None)
+        HostRun.objects.filter(id=claimed.id).update(dt_claimed=stale)
+        self.assertEqual(HostRun.objects.claim_next().id, claimed.id)
+        # the claim was taken over
+        self.assertFalse(claimed.beat())
+
+    def test_failed_import(self):
+        queue_report('/nonexistent/result.tar.gz', self.hostrun)
+        process_queue(0, once=True)
+        hostrun = HostRun.objects.get(id=self.hostrun.id)
+        self.assertTrue(hostrun.failed)
+        # the tarball is kept for another attempt
+        self.assertEqual(hostrun.tarball, '/nonexistent/result.tar.gz')
+        self.assertTrue(Run.objects.get(id=self.run.id).dt_finished)
+        self.assertEqual(HostRun.objects.requeue_failed(), 1)
+        self.assertTrue(HostRun.objects.get(id=self.hostrun.id).queued)
+        self.assertEqual(Run.objects.get(id=self.run.id).dt_finished, None)
+
+    def test_database_error(self):
+        queue_report('/nonexistent/result.tar.gz', self.hostrun)
+        claim_next = HostRun.objects.claim_next
+        calls = []
+
+        def locked():
+            calls.append(None)
+            if len(calls) == 1:
+                raise DatabaseError("database is locked")
+            return claim_next()
+        HostRun.objects.claim_next = locked
+        try:
+            # the worker survives the error and imports the queue
+            process_queue(0, once=True)
+        finally:
+            del HostRun.objects.claim_next
+        self.assertTrue(HostRun.objects.get(id=self.hostrun.id).failed)
+
+
+class TestBulkImport(TestCase):
+
+    def _import(self):
+        host = Host.objects.create(hostname='localhost')
+        hostrun = Run.objects.create_for_host(host).first_hostrun()
+        importer = ReportImporter(None, hostrun.id)
+        rule = {'id_ref': 'rule_a', 'title': 'A', 'description': 'A',
+                'fixtext': '<a href="__INSERT_URL__?path=a">a</a>',
+                'result': 'fail', 'time': '2016-08-24T17:39:11',
+                'logs': [{'level': 'INFO', 'message': 'log'}],
+                'risks': [{'level': 'HIGH', 'message': 'risk'}]}
+        importer.parsed_data = {
+            'addresses': [],
+            'groups': [
+                {'xccdf_id': 'root', 'title': 'Root', 'rules': []},
+                {'xccdf_id': 'child', 'title': 'Child', 'parent': 'root', 'rules': []},
+                {'xccdf_id': 'leaf', 'title': 'Leaf', 'parent': 'child', 'rules': [rule]},
+            ],
+        }
+        importer._add_to_db()
+        return importer
+
+    def test_add_to_db(self):
+        importer = self._import()
+        trgs = dict((trg.group.xccdf_id, trg)
+                    for trg in TestGroupResult.objects.for_result(importer.result))
+        self.assertEqual(trgs['root'].root, trgs['root'])
+        self.assertEqual(trgs['leaf'].parent, trgs['child'])
+        self.assertEqual(trgs['leaf'].root, trgs['root'])
+        self.assertEqual(trgs['leaf'].group.parent, trgs['child'].group)
+        self.assertEqual([trgs[x].path for x in ['root', 'child', 'leaf']],
+                         ['00000', '0000000001', '000000000100002'])
+        self.assertEqual(sorted(trg.group.xccdf_id for trg in trgs['child'].subtree()),
+                         ['child', 'leaf'])
+        self.assertEqual(TestResult.objects.for_subtree(trgs['child']).count(), 1)
+        trgs['leaf'].root = None
+        self.assertEqual(trgs['leaf'].get_root(), trgs['root'])
+        tr = TestResult.objects.get(result=importer.result)
+        self.assertEqual(tr.test.id_ref, 'rule_a')
+        self.assertEqual(tr.group, trgs['leaf'])
+        self.assertEqual(tr.root_group, trgs['root'])
+        self.assertEqual([l.message for l in tr.logs()], ['log'])
+        self.assertEqual([r.level for r in tr.risks()], ['high'])
+
+        importer._calculate_stats()
+        for trg in TestGroupResult.objects.for_result(importer.result):
+            self.assertEqual((trg.test_count, trg.failed_test_count,
+                              trg.ni_test_count, trg.na_test_count),
+                             (1, 1, 0, 0))
+        self.assertEqual(importer.result.test_count, 1)
+        self.assertEqual(importer.result.failed_test_count, 1)
+        self.assertEqual(importer.result.na_test_count, 0)
+        result = Result.objects.get(id=importer.result.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(result.get_state_counts(), [(TestResult.FAILURE, 1)])
+            self.assertEqual(result.status_text(), 'Failed (1)')
+
+    def test_add_to_db_selected_ids(self):
+        # ids of bulk inserts are selected back on other databases
+        vendors = service.CONSECUTIVE_IDS_VENDORS
+        service.CONSECUTIVE_IDS_VENDORS = ()
+        try:
+            self.test_add_to_db()
+        finally:
+            service.CONSECUTIVE_IDS_VENDORS = vendors
+
+    def test_backfill_state_counts(self):
+        result = self._import().result
+        Result.objects.filter(id=result.id).update(state_counts=None)
+        call_command('backfill_state_counts')
+        self.assertEqual(Result.objects.get(id=result.id).get_state_counts(),
+                         [(TestResult.FAILURE, 1)])
+
+    def test_shared_definitions(self):
+        first = self._import()
+        second = self._import()
+        # the same groups and tests are stored once
+        self.assertEqual(TestGroup.objects.count(), 3)
+        self.assertEqual(Test.objects.count(), 1)
+        self.assertEqual(TestGroupResult.objects.count(), 6)
+        for importer in [first, second]:
+            tr = TestResult.objects.get(result=importer.result)
+            self.assertTrue('/%d/file/?path=a' % importer.result.id in tr.fixtext())
+
+    def test_render_result(self):
+        result = self._import().result
+        rendered = render_result(result, None, {'fail%d' % result.id: 'on'})
+        self.assertEqual(
+            [(kind, item if kind == 'TAG' else item.group.xccdf_id)
+             for kind, item in rendered],
+            [('GROUP', 'root'), ('TAG', '<ul class="entry-list">'),
+             ('GROUP', 'child'), ('TAG', '<ul class="entry-list">'),
+             ('GROUP_WITH_TESTS', 'leaf'), ('TAG', '</li>'),
+             ('TAG', '</ul>'), ('TAG', '</li>'),
+             ('TAG', '</ul>'), ('TAG', '</li>')])
+        leaf = rendered[4][1]
+        self.assertEqual([tr.test.id_ref for tr in leaf.filtered_tests],
+                         ['rule_a'])
+        self.assertEqual(leaf.displayed_count, 1)
+        # the only test does not match the filter
+        self.assertEqual(render_result(result, None, {'pass%d' % result.id: 'on'}), [])
+
+    def test_search(self):
+        first = self._import().result
+        second = self._import().result
+        hits = find('log')
+        self.assertEqual([(hit['kind'], hit['level'], hit['result']) for hit in hits],
+                         [('log', 'info', second), ('log', 'info', first)])
+        self.assertEqual(hits[0]['test_result'].test.id_ref, 'rule_a')
+        self.assertEqual(hits[0]['group'].group.xccdf_id, 'leaf')
+        self.assertEqual([hit['body'] for hit in find('risk', level='HIGH')],
+                         ['risk', 'risk'])
+        self.assertEqual(find('risk', level='slight'), [])
+        self.assertEqual([hit['group'].group.xccdf_id for hit in find('child', kind='group')],
+                         ['child', 'child'])
+        self.assertEqual(find('log risk'), [])
+        second.delete()
+        self.assertEqual([hit['result'] for hit in find('log')], [first])
+
+    def test_search_path(self):
+        body = u'Option changed in /etc/ssh/sshd_config'
+        search.index_entries([('log', 'info', 1, 1, body)])
+        self.assertEqual([entry[-1] for entry in search.search('/etc/ssh')], [body])
+        # the words of a phrase are adjacent and in order
+        self.assertEqual(search.search('/ssh/etc'), [])
+        search.remove_result(1)
+        self.assertEqual(search.search('/etc/ssh'), [])
+        # PostgreSQL indexes the words of body, which contain the phrases of the query
+        words = ' %s ' % search.split_words(body)
+        for phrase in parse_query('/etc/ssh sshd_config'):
+            self.assertTrue(' %s ' % phrase in words)
+        self.assertFalse(' %s ' % parse_query('/ssh/etc')[0] in words)
+
+    def test_parse_query(self):
+        self.assertEqual(parse_query(' /etc/ssh  sshd_config -- '),
+                         ['etc ssh', 'sshd_config'])
+
 
 # class TestImport(TestCase):
 #     def setUp(self):
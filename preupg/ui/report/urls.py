@@ -4,13 +4,16 @@ from django.conf.urls import patterns, url
 from django.contrib.auth.decorators import login_required as lr
 
 from .views import RunsView, ReportView, NewRunView, NewHostView, DeleteOlderView, \
-    NewLocalRunView, ReportFilesView, RunView, DeleteRunView, ResultViewAjax
+    NewLocalRunView, ReportFilesView, RunView, DeleteRunView, ResultViewAjax, \
+    SearchView, SearchApiView
 
 urlpatterns = patterns(
     '',
     url(r'^$', lr(RunsView.as_view()), name='index'),
     url(r'^$', lr(RunsView.as_view()), name='results-list'),
     url(r'^delete-older/$', lr(DeleteOlderView.as_view()), name='delete-older'),
+    url(r'^search/$', lr(SearchView.as_view()), name='search'),
+    url(r'^search/api/$', lr(SearchApiView.as_view()), name='search-api'),
     url(r'^(?P<result_id>\d+)/detail/$', lr(RunView.as_view()), name='result-detail'),
     #url(r'^run/(?P<run_id>\d+)/$', lr(RunView.as_view()), name='run'),
     # TODO: creating runs from UI is not done and ready for production
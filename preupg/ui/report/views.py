@@ -9,6 +9,9 @@ from preupg.ui.config.models import AppSettings
 
 from .models import Run, Result
 from .forms import *
+from .search import find
+
+from django.conf import settings
 
 from django.views.generic import TemplateView, DeleteView, FormView, View
 from django.views.generic.list import ListView
@@ -200,6 +203,63 @@ class ResultViewAjax(View):
         )
 
 
+class SearchView(TemplateView):
+    """ search in titles, logs and risks of all results """
+    template_name = "report/search.html"
+
+    def get_hits(self):
+        """ return the search form and hits, hits are None without query """
+        form = SearchForm(self.request.GET)
+        hits = None
+        if form.is_valid() and form.cleaned_data['q']:
+            hits = find(form.cleaned_data['q'], form.cleaned_data['kind'],
+                        form.cleaned_data['level'], settings.SEARCH_LIMIT)
+        return form, hits
+
+    def get_context_data(self, **kwargs):
+        context = super(SearchView, self).get_context_data(**kwargs)
+        context['title'] = 'Search'
+        context['search_form'], context['hits'] = self.get_hits()
+        context['limit'] = settings.SEARCH_LIMIT
+        return context
+
+
+class SearchApiView(SearchView):
+    """ the same search as SearchView returning JSON """
+
+    def get(self, request, *args, **kwargs):
+        form, hits = self.get_hits()
+        if hits is None:
+            response = {'status': 'ERROR', 'content': "Nothing to search for."}
+        else:
+            response = {'status': 'OK', 'hits': [self.hit_to_dict(hit) for hit in hits]}
+        return HttpResponse(
+            json.dumps(response),
+            content_type='application/json',
+        )
+
+    @staticmethod
+    def hit_to_dict(hit):
+        result = hit['result']
+        test_result = hit['test_result']
+        if test_result is not None:
+            title = test_result.test.title
+        elif hit['group'] is not None:
+            title = hit['group'].group.title
+        else:
+            title = None
+        return {
+            'kind': hit['kind'],
+            'level': hit['level'],
+            'message': hit['body'],
+            'title': title,
+            'state': test_result.get_state_display() if test_result else None,
+            'hostname': result.hostname or result.hostrun.host.hostname,
+            'result_id': result.id,
+            'url': reverse('result-detail', args=(result.id, )),
+        }
+
+
 class ReportFilesView(View):
     """ display arbitrary files from scan result """
 
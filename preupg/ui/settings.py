@@ -106,9 +106,29 @@ STATIC_ROOT = os.path.join(DATA_DIR, 'static')
 
 MEDIA_URL = '/upload/'
 MEDIA_ROOT = os.path.join(DATA_DIR, 'upload')
+# unfinished chunked uploads of results; these without activity for
+# UPLOAD_SESSIONS_EXPIRE_DAYS are removed
+UPLOAD_SESSIONS_DIR = os.path.join(MEDIA_ROOT, 'sessions')
+UPLOAD_SESSIONS_EXPIRE_DAYS = 7
 
 RESULTS_DIR = os.path.join(DATA_DIR, 'results')
 
+# submitted results are imported on submission; with IMPORT_QUEUE enabled,
+# they are queued and imported by "preupg-ui-manage import_queue" with
+# IMPORT_WORKERS processes, which check the queue every IMPORT_POLL_INTERVAL
+# seconds; the worker has to be started by the administrator
+IMPORT_QUEUE = False
+IMPORT_WORKERS = 2
+IMPORT_POLL_INTERVAL = 5
+# workers refresh claims of their imports every IMPORT_HEARTBEAT seconds;
+# import whose claim was not refreshed for IMPORT_TIMEOUT seconds is taken
+# over by another worker, as its worker was probably killed
+IMPORT_HEARTBEAT = 60
+IMPORT_TIMEOUT = 600
+
+# maximal number of hits of the search in all results
+SEARCH_LIMIT = 100
+
 
 from django.conf.global_settings import TEMPLATE_CONTEXT_PROCESSORS
 TEMPLATE_CONTEXT_PROCESSORS += (
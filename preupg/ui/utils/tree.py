@@ -6,18 +6,27 @@ from preupg.ui.report.models import TestResult, TestGroupResult
 from .views import get_states_to_filter
 
 
-def get_groups_children(group, groups):
+def index_groups_children(groups):
     """
-    we want to operate on the same set of elements, so we can use caching
+    return dict {parent id: [child groups]}; children keep order of groups
     """
-    return [x for x in groups if x.parent and x.parent.id == group.id]
+    children = {}
+    for group in groups:
+        if group.parent_id is not None:
+            children.setdefault(group.parent_id, []).append(group)
+    return children
 
 
-def get_groups_tests(group, tests):
+def index_groups_tests(tests):
     """
-    we want to operate on the same set of elements, so we can use caching
+    return dict {group id: [tests]} and set of ids of the tests
     """
-    return [x for x in tests if x.group.id == group.id]
+    groups_tests = {}
+    test_ids = set()
+    for test in tests:
+        groups_tests.setdefault(test.group_id, []).append(test)
+        test_ids.add(test.id)
+    return groups_tests, test_ids
 
 
 class RecursiveFilter(object):
@@ -28,22 +37,20 @@ class RecursiveFilter(object):
      \ allfiltered_tests -- tests in this category and its children
     """
     def __init__(self, groups, tests):
-        """ groups, tests are queries """
-        self.groups = groups
-        self.tests = tests
-        self.test_ids = tests.values_list('id', flat=True)
+        """ groups, tests are queries; each of them is evaluated once """
+        self.groups = list(groups)
+        self.children = index_groups_children(self.groups)
+        self.groups_tests, self.test_ids = index_groups_tests(tests)
+
+    def get_children(self, group):
+        return self.children.get(group.id, [])
 
     def testresults_filter(self, group):
-        """ self.tests is already performed filter, lets grep tests matching provided group """
+        """ tests are already filtered, lets grep tests matching provided group """
         if hasattr(group, 'filtered_tests'):
             return group.filtered_tests[:]
-        groups_tests = get_groups_tests(group, self.tests)
-        group.filtered_tests = []
-        for groups_test in groups_tests:
-            # django's lazy queries won't evaluate self.test_ids first time
-            # if groups_test.id in self.test_ids:
-            if groups_test.id in iter(self.test_ids):
-                group.filtered_tests.append(groups_test)
+        group.filtered_tests = [x for x in self.groups_tests.get(group.id, [])
+                                if x.id in self.test_ids]
         return group.filtered_tests[:]
 
     def subelements_filter(self, group):
@@ -55,7 +62,7 @@ class RecursiveFilter(object):
 
         allfiltered_tests = self.testresults_filter(group)
 
-        for child in get_groups_children(group, self.groups):
+        for child in self.get_children(group):
             # and do the same for children
             allfiltered_tests += self.subelements_filter(child)
         group.allfiltered_tests = allfiltered_tests
@@ -183,7 +190,7 @@ def render_result(result, search_string=None, get=None):
             is_child_requested = is_requested(child, level == -1 and not filtering_active)
 
             if is_child_requested:
-                groups_gchildren = get_groups_children(child, groups)
+                groups_gchildren = rf.get_children(child)
                 if len(groups_gchildren) > 0:
                     ch_dict[child] = filter_children(groups_gchildren, level + 1)
                 else:
@@ -191,7 +198,7 @@ def render_result(result, search_string=None, get=None):
         return ch_dict
 
     if not filtering_active:
-        root_groups = filter(lambda x: x.parent is None, groups)
+        root_groups = [x for x in rf.groups if x.parent_id is None]
 
     groups_dict = filter_children(root_groups, -1)
 
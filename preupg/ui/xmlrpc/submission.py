@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import json
+import re
+import shutil
+import time
 import uuid
 from django.core.urlresolvers import reverse
 import os
 
-from preupg.ui.report.models import Run, Host
-from preupg.ui.report.service import import_report
+from preupg.ui.report.models import Run, Host, HostRun
+from preupg.ui.report.service import queue_report
 
 from django.conf import settings
 
@@ -12,9 +17,15 @@ from django.conf import settings
 __all__ = (
     'upload_results',
     'submit_new',
+    'upload_open',
+    'upload_chunk',
+    'upload_commit',
     "ping",
 )
 
+# upload sessions are identified by SHA-256 checksum of the tarball
+UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{64}$')
+
 def ping(request):
     """ server verification """
     return {'status': "OK"}
@@ -31,7 +42,7 @@ def upload_results(request, opts):
     p = os.path.join(settings.MEDIA_ROOT, opts['filename'])
     with open(p, 'wb+') as destination:
         destination.write(opts['data'].data)
-    import_report(p, opts['hostrun_id'])
+    queue_report(p, HostRun.objects.get(id=opts['hostrun_id']))
     return 'OK'
 
 def submit_new(request, opts):
@@ -57,11 +68,182 @@ def submit_new(request, opts):
     report_path = os.path.join(tmp_dir, 'result.tar.gz')
     with open(report_path, 'wb+') as destination:
         destination.write(opts['data'].data)
+    return _queue_submitted(request, opts['host'], report_path)
+
 
-    host, created = Host.objects.get_or_create(hostname=opts['host'])
+def _queue_submitted(request, hostname, report_path):
+    host, created = Host.objects.get_or_create(hostname=hostname)
     run_object = Run.objects.create_for_host(host)
     hostrun = run_object.first_hostrun()
 
-    import_report(report_path, hostrun.id)
-    rel_url = reverse('result-detail', args=(hostrun.result.id, ))
+    # the result is imported by a worker, its page shows the progress
+    result = queue_report(report_path, hostrun)
+    rel_url = reverse('result-detail', args=(result.id, ))
     return {'status': 'OK', 'url': request.build_absolute_uri(rel_url)}
+
+
+def _session_dir(upload_id):
+    return os.path.join(settings.UPLOAD_SESSIONS_DIR, upload_id)
+
+
+def _read_session(upload_id):
+    """Returns state of the upload session or None if it does not exist"""
+    if not UPLOAD_ID_RE.match(upload_id or ''):
+        return None
+    try:
+        with open(os.path.join(_session_dir(upload_id), 'state')) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return None
+
+
+def _write_session(upload_id, state):
+    # the state is replaced atomically, so it never acknowledges more data
+    # than has been written
+    path = os.path.join(_session_dir(upload_id), 'state')
+    with open(path + '.new', 'w') as f:
+        json.dump(state, f)
+    os.rename(path + '.new', path)
+
+
+def _error(message):
+    return {'status': 'ERROR', 'message': message}
+
+
+def _remove_expired_sessions():
+    """ remove sessions without activity for UPLOAD_SESSIONS_EXPIRE_DAYS """
+    # each stored chunk replaces the state, which touches the directory
+    limit = time.time() - settings.UPLOAD_SESSIONS_EXPIRE_DAYS * 24 * 60 * 60
+    try:
+        upload_ids = os.listdir(settings.UPLOAD_SESSIONS_DIR)
+    except OSError:
+        return
+    for upload_id in upload_ids:
+        path = _session_dir(upload_id)
+        try:
+            if os.path.getmtime(path) < limit:
+                shutil.rmtree(path)
+        except OSError:
+            # removed by another request
+            pass
+
+
+def upload_open(request, opts):
+    """
+    upload_open(opts)
+
+    open a session of chunked upload of a result or resume an interrupted
+    one; returns upload_id and offset where the upload continues
+
+    opts is dictionary, it has to contain these entries:
+     * host: string with hostname of a host where scan was done
+     * size: size of the tarball in bytes (decimal string)
+     * checksum: SHA-256 checksum of the tarball (hexadecimal)
+    """
+    upload_id = opts['checksum'].lower()
+    if not UPLOAD_ID_RE.match(upload_id):
+        return _error('Invalid checksum of the tarball: %s' % upload_id)
+    try:
+        size = int(opts['size'])
+    except ValueError:
+        return _error('Invalid size of the tarball: %s' % opts['size'])
+    _remove_expired_sessions()
+    state = _read_session(upload_id)
+    if state is None or state['size'] != size or 'url' in state:
+        try:
+            if not os.path.isdir(_session_dir(upload_id)):
+                os.makedirs(_session_dir(upload_id), mode=0o0744)
+        except OSError as e:
+            return _error('Failed to create upload directory: %s' % e)
+        state = {'host': opts['host'], 'size': size, 'offset': 0}
+        _write_session(upload_id, state)
+    return {'status': 'OK', 'upload_id': upload_id,
+            'offset': str(state['offset'])}
+
+
+def upload_chunk(request, opts):
+    """
+    upload_chunk(opts)
+
+    store a chunk of the tarball; returns offset acknowledged by the server
+
+    opts is dictionary, it has to contain these entries:
+     * upload_id: ID returned by upload_open
+     * offset: offset of the chunk in the tarball (decimal string)
+     * data: content of the chunk
+     * checksum: SHA-256 checksum of the chunk (hexadecimal)
+    """
+    state = _read_session(opts['upload_id'])
+    if state is None:
+        return _error('Unknown upload: %s' % opts['upload_id'])
+    try:
+        offset = int(opts['offset'])
+    except ValueError:
+        return _error('Invalid offset of the chunk: %s' % opts['offset'])
+    data = opts['data'].data
+    if offset < state['offset']:
+        # already acknowledged, the client did not get the response
+        return {'status': 'OK', 'offset': str(state['offset'])}
+    if offset > state['offset']:
+        return _error('Chunk at %d does not follow acknowledged offset %d'
+                      % (offset, state['offset']))
+    if hashlib.sha256(data).hexdigest() != opts['checksum'].lower():
+        return _error('Checksum of the chunk at %d does not match' % offset)
+    if state['offset'] + len(data) > state['size']:
+        return _error('The chunk at %d exceeds size of the tarball' % offset)
+    path = os.path.join(_session_dir(opts['upload_id']), 'data')
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o0644)
+    try:
+        # drop a chunk written partially by an interrupted request
+        os.ftruncate(fd, state['offset'])
+        os.lseek(fd, state['offset'], os.SEEK_SET)
+        os.write(fd, data)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    state['offset'] += len(data)
+    _write_session(opts['upload_id'], state)
+    return {'status': 'OK', 'offset': str(state['offset'])}
+
+
+def upload_commit(request, opts):
+    """
+    upload_commit(opts)
+
+    verify the uploaded tarball and queue it for import as a new result of
+    a run on the host given to upload_open; returns the same as submit_new
+
+    opts is dictionary, it has to contain these entries:
+     * upload_id: ID returned by upload_open
+    """
+    upload_id = opts['upload_id']
+    state = _read_session(upload_id)
+    if state is None:
+        return _error('Unknown upload: %s' % upload_id)
+    if 'url' in state:
+        # already imported, the client did not get the response
+        return {'status': 'OK', 'url': state['url']}
+    if state['offset'] != state['size']:
+        return _error('The upload is incomplete: %d of %d bytes'
+                      % (state['offset'], state['size']))
+    path = os.path.join(_session_dir(upload_id), 'data')
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    if hasher.hexdigest() != upload_id:
+        shutil.rmtree(_session_dir(upload_id))
+        return _error('Checksum of the uploaded tarball does not match')
+
+    # as soon as the tarball will be unpacked, this die will be erased
+    tmp_dir = os.path.join(settings.MEDIA_ROOT, uuid.uuid4().hex)
+    try:
+        os.makedirs(tmp_dir, mode=0o0744)
+    except OSError as e:
+        return _error('Failed to create temporary directory: %s' % e)
+    report_path = os.path.join(tmp_dir, 'result.tar.gz')
+    os.rename(path, report_path)
+    response = _queue_submitted(request, state['host'], report_path)
+    state['url'] = response['url']
+    _write_session(upload_id, state)
+    return response
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+The upload module sends the tarball with results to the UI in chunks.
+
+The protocol consists of three XML-RPC calls:
+
+ * submit.upload_open({'host', 'size', 'checksum'}) opens an upload session
+   identified by the SHA-256 checksum of the tarball and returns the offset
+   acknowledged by the server so far,
+ * submit.upload_chunk({'upload_id', 'offset', 'data', 'checksum'}) stores
+   one chunk at the offset and returns the new acknowledged offset,
+ * submit.upload_commit({'upload_id'}) verifies the whole tarball and
+   imports it; it returns the same response as submit.submit_new.
+
+Sizes and offsets are passed as decimal strings, as XML-RPC integers are
+limited to 32 bits. Neither side holds more than one chunk in memory. An interrupted upload is
+resumed from the last acknowledged chunk by opening the session again.
+"""
+
+from __future__ import unicode_literals
+import hashlib
+import socket
+
+try:
+    import xmlrpclib
+except ImportError:
+    import xmlrpc.client as xmlrpclib
+
+from preupg import settings
+from preupg.logger import logger_debug
+
+
+def get_file_checksum(path, block_size=None):
+    """Returns SHA-256 checksum of the file, read in blocks"""
+    hasher = hashlib.sha256()
+    block_size = block_size or settings.upload_chunk_size
+    f = open(path, 'rb')
+    try:
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            hasher.update(data)
+    finally:
+        f.close()
+    return hasher.hexdigest()
+
+
+class ChunkedUpload(object):
+
+    """
+    Client side of the chunked upload of the tarball
+
+    Use open() to open the session (it raises xmlrpclib.Fault when the
+    server does not support chunked uploads) and send() to upload the
+    tarball. Transport errors are retried up to retries times in a row;
+    each retry asks the server where to continue.
+    """
+
+    def __init__(self, proxy, path, host, chunk_size=None, retries=None):
+        self.proxy = proxy
+        self.path = path
+        self.host = host
+        self.chunk_size = chunk_size or settings.upload_chunk_size
+        self.retries = settings.upload_retries if retries is None else retries
+        self.upload_id = None
+        self.offset = 0
+        f = open(path, 'rb')
+        try:
+            f.seek(0, 2)
+            self.size = f.tell()
+        finally:
+            f.close()
+        self.checksum = get_file_checksum(path, self.chunk_size)
+
+    def open(self):
+        """Open or resume the upload session, returns response of server"""
+        response = self.proxy.submit.upload_open({
+            'host': self.host,
+            'size': str(self.size),
+            'checksum': self.checksum,
+        })
+        if response.get('status') == 'OK':
+            self.upload_id = response['upload_id']
+            self.offset = int(response['offset'])
+            if self.offset:
+                logger_debug.debug("Resuming upload %s at %d of %d bytes",
+                                   self.upload_id, self.offset, self.size)
+        return response
+
+    def _send_chunk(self, f):
+        f.seek(self.offset)
+        data = f.read(self.chunk_size)
+        return self.proxy.submit.upload_chunk({
+            'upload_id': self.upload_id,
+            'offset': str(self.offset),
+            'data': xmlrpclib.Binary(data),
+            'checksum': hashlib.sha256(data).hexdigest(),
+        })
+
+    def send(self):
+        """
+        Upload the chunks not acknowledged yet and commit the upload
+
+        Returns response of the server to the last call.
+        """
+        failures = 0
+        f = open(self.path, 'rb')
+        try:
+            while True:
+                try:
+                    if self.offset < self.size:
+                        response = self._send_chunk(f)
+                    else:
+                        return self.proxy.submit.upload_commit({
+                            'upload_id': self.upload_id,
+                        })
+                    if response.get('status') != 'OK':
+                        return response
+                    self.offset = int(response['offset'])
+                    failures = 0
+                except (socket.error, xmlrpclib.ProtocolError) as ex:
+                    failures += 1
+                    if failures > self.retries:
+                        raise
+                    logger_debug.debug("Upload of %s interrupted: %s",
+                                       self.path, ex)
+                    if self.offset >= self.size:
+                        # opening the session again would restart the
+                        # upload if the server imported it already
+                        continue
+                    try:
+                        response = self.open()
+                    except (socket.error, xmlrpclib.ProtocolError):
+                        continue
+                    if response.get('status') != 'OK':
+                        return response
+        finally:
+            f.close()
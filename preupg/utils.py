@@ -19,6 +19,7 @@ except ImportError:
 
 from preupg import settings
 from preupg.logger import log_message, logging, logger, logger_debug
+from preupg.tarball import TarballWriter, EXTENSIONS
 
 from os import path, access, W_OK, R_OK, X_OK
 
@@ -336,32 +337,45 @@ class ProcessHelper(object):
 
     @staticmethod
     def run_subprocess(cmd, output=None, print_output=False, shell=False, function=None):
-        """wrapper for Popen"""
+        """
+        wrapper for Popen
+
+        Output of the command is streamed: it's written to the output file
+        as it comes, in chunks of at most settings.subprocess_chunk_size
+        bytes, and it's not kept in memory. When print_output or function
+        is used, the output is processed line by line.
+        """
         sp = subprocess.Popen(cmd,
                               stdout=subprocess.PIPE,
                               stderr=subprocess.STDOUT,
                               shell=shell,
-                              bufsize=1)
-        stdout = str() # FIXME should't be this bytes()?
-        for stdout_data in iter(sp.stdout.readline, b''):
+                              bufsize=-1)
+        out_file = None
+        try:
+            if output is not None:
+                # raw data, so without encoding
+                out_file = open(output, "wb")
+            if function is None and not print_output:
+                read = lambda: sp.stdout.read(settings.subprocess_chunk_size)
+            else:
+                read = sp.stdout.readline
             # communicate() method buffers everything in memory, we will read stdout directly
-            stdout += stdout_data
-            if function is None:
-                if print_output:
-                    print (stdout_data, end="")
+            for stdout_data in iter(read, b''):
+                if out_file is not None:
+                    out_file.write(stdout_data)
+                if function is None:
+                    if print_output:
+                        print (stdout_data, end="")
                 else:
-                    pass
-            else:
-                # I don't know what functions can come here, however
-                # it's not common so put only unicode data here again.
-                # Should be always raw data so we don't need test stdout_data
-                # on type
-                function(stdout_data.decode(settings.defenc))
-        sp.communicate()
-
-        if output is not None:
-            # raw data, so without encoding
-            FileHelper.write_to_file(output, "wb", stdout, False)
+                    # I don't know what functions can come here, however
+                    # it's not common so put only unicode data here again.
+                    # Should be always raw data so we don't need test stdout_data
+                    # on type
+                    function(stdout_data.decode(settings.defenc))
+        finally:
+            if out_file is not None:
+                out_file.close()
+            sp.communicate()
         return sp.returncode
 
 
@@ -401,52 +415,63 @@ class TarballHelper(object):
         return os.path.join(root_dir, filename)
 
     @staticmethod
-    def tarball_result_dir(result_file, verbose):
+    def get_tarball_members(result_dir):
+        """Returns names of files and directories packed into tarball"""
+        members = [x for x in settings.preupgrade_dirs
+                   if os.path.isdir(os.path.join(result_dir, x))]
+        members.extend(sorted(
+            x for x in os.listdir(result_dir)
+            if (x == settings.PREUPG_README or
+                x.startswith(settings.result_prefix)) and
+            os.path.isfile(os.path.join(result_dir, x))))
+        return members
+
+    @staticmethod
+    def tarball_result_dir(result_file, verbose, compression=None,
+                           level=None, jobs=1):
         """
         pack results to tarball
+
+        Results are streamed from the assessment directory straight into
+        the tarball in settings.tarball_result_dir (see preupg.tarball).
+        The assessment directory gets a hard link to the tarball (or its
+        copy on another filesystem).
         """
-        current_dir = os.getcwd()
-        tar_binary = "/bin/tar"
+        compression = compression or settings.compression
+        if level is None:
+            level = settings.compression_level
         current_time = get_current_time()
-        cmd_pack = "-czvf"
-        cmd = [tar_binary]
-        # numeric UIDs and GIDs are used, ACLs are enabled, SELinux is enabled
-        tar_options = ["--numeric-owner", "--acls", "--selinux"]
-
-        # used for packing directories into tarball
-        os.chdir('/root')
         tarball_dir = TarballHelper._get_tarball_name(result_file, current_time)
-        tarball_name = tarball_dir + '.tar.gz'
-        bkp_tar_dir = os.path.join('/root', tarball_dir)
-
-        if not os.path.exists(bkp_tar_dir):
-            os.makedirs(bkp_tar_dir)
-        for dir_to_pack in settings.preupgrade_dirs:
-            shutil.copytree(os.path.join(settings.assessment_results_dir,
-                                         dir_to_pack),
-                            os.path.join(bkp_tar_dir, dir_to_pack),
-                            symlinks=True)
-        files_to_copy = [settings.PREUPG_README]
-        for _, _, files in os.walk(settings.assessment_results_dir):
-            for f in files:
-                if f.startswith("result"):
-                    files_to_copy.append(f)
-        for f in files_to_copy:
-            shutil.copyfile(os.path.join(settings.assessment_results_dir, f),
-                            os.path.join(bkp_tar_dir, f))
+        tarball_name = tarball_dir + EXTENSIONS[compression]
         tarball = TarballHelper._get_tarball_result_path(
-            settings.assessment_results_dir, tarball_name)
-        cmd.append(cmd_pack)
-        cmd.append(tarball)
-        cmd.append(tarball_dir)
+            settings.tarball_result_dir, tarball_name)
+        if not os.path.exists(settings.tarball_result_dir):
+            os.makedirs(settings.tarball_result_dir)
 
-        cmd.extend(tar_options)
-        ProcessHelper.run_subprocess(cmd, print_output=verbose)
-        shutil.rmtree(bkp_tar_dir)
-        shutil.copy(tarball, settings.tarball_result_dir + "/")
-        os.chdir(current_dir)
+        writer = TarballWriter(tarball, compression, level, jobs or 1,
+                               verbose)
+        try:
+            # the top directory of the tarball
+            writer.add(settings.assessment_results_dir, tarball_dir,
+                       recursive=False)
+            for member in TarballHelper.get_tarball_members(
+                    settings.assessment_results_dir):
+                writer.add(os.path.join(settings.assessment_results_dir,
+                                        member),
+                           os.path.join(tarball_dir, member))
+        except:
+            writer.abort()
+            raise
+        writer.close()
+
+        tarball_copy = TarballHelper._get_tarball_result_path(
+            settings.assessment_results_dir, tarball_name)
+        try:
+            os.link(tarball, tarball_copy)
+        except OSError:
+            shutil.copy(tarball, tarball_copy)
 
-        return os.path.join(settings.tarball_result_dir, tarball_name)
+        return tarball
 
     @staticmethod
     def get_latest_tarball(result_dir):
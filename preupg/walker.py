@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+The walker module enumerates all local filesystems in a single pass.
+
+Every file found during the walk is offered to a set of projections (e.g.
+all files, executable files) and each projection writes the matching paths
+to its own sorted log file. Paths are handled as raw bytes, the output is
+sorted bytewise by an external merge sort so the memory consumption stays
+bounded even on systems with millions of files.
+"""
+
+from __future__ import unicode_literals
+import heapq
+import os
+import stat
+import tempfile
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+from preupg import settings
+from preupg.logger import logger_debug
+from preupg.utils import ProcessHelper
+
+
+def is_executable(entry):
+    """Regular files with any executable bit (find -perm /111 -type f)"""
+    if not entry.is_file(follow_symlinks=False):
+        return False
+    return bool(entry.stat(follow_symlinks=False).st_mode & 0o111)
+
+
+# Available projections: {name: function(entry) -> True if path is logged}
+PROJECTIONS = {
+    'all': lambda entry: True,
+    'executable': is_executable,
+}
+
+
+class _DirEntry(object):
+
+    """Minimal replacement of os.DirEntry for systems without scandir"""
+
+    def __init__(self, dir_name, name):
+        self.name = name
+        self.path = os.path.join(dir_name, name)
+        self._stat = None
+
+    def stat(self, follow_symlinks=False):
+        if self._stat is None:
+            self._stat = os.lstat(self.path)
+        return self._stat
+
+    def is_dir(self, follow_symlinks=False):
+        return stat.S_ISDIR(self.stat().st_mode)
+
+    def is_file(self, follow_symlinks=False):
+        return stat.S_ISREG(self.stat().st_mode)
+
+
+def _list_dir(dir_name):
+    """Return entries of the directory, scandir is used when available"""
+    if scandir is not None:
+        return list(scandir(dir_name))
+    return [_DirEntry(dir_name, name) for name in os.listdir(dir_name)]
+
+
+def get_local_mount_points():
+    """Returns mount points of local filesystems reported by df"""
+    mount_points = []
+
+    def _parse_df_line(line):
+        mount_points.append(line.rstrip('\n').split(' ')[-1])
+
+    ProcessHelper.run_subprocess(['df', '--local', '-P'], function=_parse_df_line)
+    # skip the df header
+    return [x for x in mount_points[1:] if x.startswith('/')]
+
+
+class ExternalSorter(object):
+
+    """
+    Sort lines which do not fit into the memory
+
+    Lines are collected into chunks of chunk_size lines, each full chunk
+    is sorted and stored into a temporary file. The final output is merged
+    from all the chunks.
+    """
+
+    def __init__(self, chunk_size=None, temp_dir=None):
+        self.chunk_size = chunk_size or settings.walker_chunk_size
+        self.temp_dir = temp_dir
+        self.lines = []
+        self.chunks = []
+
+    def add(self, line):
+        """Add one line (bytes ending with a new line)"""
+        self.lines.append(line)
+        if len(self.lines) >= self.chunk_size:
+            self._spill()
+
+    def _spill(self):
+        self.lines.sort()
+        chunk = tempfile.TemporaryFile(dir=self.temp_dir)
+        chunk.writelines(self.lines)
+        chunk.seek(0)
+        self.chunks.append(chunk)
+        self.lines = []
+
+    def write(self, output):
+        """Write all the lines sorted to the output file"""
+        self.lines.sort()
+        f = open(output, 'wb')
+        try:
+            f.writelines(heapq.merge(self.lines, *self.chunks))
+        finally:
+            f.close()
+            for chunk in self.chunks:
+                chunk.close()
+            self.chunks = []
+            self.lines = []
+
+
+class FilesystemWalker(object):
+
+    """Class walks filesystems once and writes all projections from it"""
+
+    def __init__(self, roots, chunk_size=None, temp_dir=None):
+        """
+        roots .. mount points which are walked; the walk does not descend
+                 to other filesystems like find -xdev does
+        """
+        self.roots = roots
+        self.chunk_size = chunk_size
+        self.temp_dir = temp_dir
+        self.projections = []
+
+    def add_projection(self, output, name):
+        """Write paths matching the projection called name to output"""
+        self.projections.append((output, PROJECTIONS[name],
+                                 ExternalSorter(self.chunk_size,
+                                                self.temp_dir)))
+
+    def _process(self, entry):
+        line = entry.path + b'\n'
+        for dummy_output, matches, sorter in self.projections:
+            if matches(entry):
+                sorter.add(line)
+
+    def walk(self, root):
+        """Walk one filesystem, yield DirEntry-like object for each path"""
+        try:
+            root_dev = os.lstat(root).st_dev
+        except OSError as e:
+            logger_debug.debug("Unable to walk '%s': %s", root, e)
+            return
+        yield _DirEntry(os.path.dirname(root), os.path.basename(root) or root)
+        stack = [root]
+        while stack:
+            dir_name = stack.pop()
+            try:
+                entries = _list_dir(dir_name)
+            except OSError as e:
+                logger_debug.debug("Unable to list '%s': %s", dir_name, e)
+                continue
+            for entry in entries:
+                yield entry
+                try:
+                    if entry.is_dir(follow_symlinks=False) and \
+                            entry.stat(follow_symlinks=False).st_dev == root_dev:
+                        stack.append(entry.path)
+                except OSError:
+                    continue
+
+    def run(self):
+        """Walk all roots and write the projections"""
+        for root in self.roots:
+            if not isinstance(root, bytes):
+                root = root.encode(settings.defenc)
+            for entry in self.walk(root):
+                try:
+                    self._process(entry)
+                except OSError:
+                    # the file disappeared during the walk
+                    continue
+        for output, dummy_matches, sorter in self.projections:
+            sorter.write(output)
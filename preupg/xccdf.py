@@ -3,6 +3,7 @@
 from __future__ import unicode_literals
 import re
 import os
+import json
 from operator import itemgetter
 from xml.etree import ElementTree
 
@@ -138,8 +139,24 @@ class XccdfHelper(object):
                     return_val = current_val
         return return_val
 
+    @staticmethod
+    def get_module_manifest(module_set_dir):
+        """
+        Returns list of modules from the manifest written by XCCDFCompose
+        next to all-xccdf.xml or None when the module set has no manifest
+        """
+        manifest = os.path.join(module_set_dir, settings.module_manifest)
+        try:
+            return json.loads(FileHelper.get_file_content(manifest, "rb"))
+        except (IOError, ValueError):
+            return None
+
     @staticmethod
     def get_list_rules(all_xccdf_xml_path):
+        modules = XccdfHelper.get_module_manifest(
+            os.path.dirname(all_xccdf_xml_path))
+        if modules is not None:
+            return [x["rule_id"] for x in modules]
         rules_filepath = os.path.join(os.path.dirname(all_xccdf_xml_path),
                                       settings.file_list_rules)
         rules = FileHelper.get_file_content(rules_filepath, "rb", method=True)
@@ -3,11 +3,14 @@
 from __future__ import unicode_literals, print_function
 import os
 import re
+import codecs
+import shutil
 try:
     import rpm
 except ImportError:
     pass
 from preupg.utils import FileHelper
+from preupg.xccdf import XccdfHelper
 from preupg import settings
 from preupg.logger import logger_report
 
@@ -89,6 +92,9 @@ class XmlManager(object):
     """
     Class operates with XML oscap result
     """
+    # all placeholders of solution texts end with the suffix
+    solution_suffix = "_SOLUTION_MSG"
+
     def __init__(self, assessment_result_path, copied_module_set_path):
         """
         assessment_result_path .. path to the directory where all results of
@@ -100,39 +106,105 @@ class XmlManager(object):
         self.copied_module_set_path = copied_module_set_path
         self.paths_to_all_modules = self.get_module_dirs()
         self.solution_texts = {}
+        self.solution_dirs = {}
+        for dir_name in self.paths_to_all_modules:
+            section = dir_name.replace(
+                self.copied_module_set_path, "").replace("/", "_")
+            self.solution_dirs[section + self.solution_suffix] = dir_name
+        # lengths of the placeholders, the longest first
+        self.placeholder_lengths = sorted(
+            set(len(x) for x in self.solution_dirs), reverse=True)
+        self.suffix_re = re.compile(re.escape(self.solution_suffix))
 
     def update_report(self, report_path):
-        """Update XML or HTML report with relevant solution texts."""
-        if not self.solution_texts:
-            self.load_solution_texts()
+        """
+        Update XML or HTML report with relevant solution texts.
 
+        The report is read in chunks and all placeholders are replaced in
+        one scan; a solution text is loaded only when its placeholder is
+        found.
+        """
         orig_file = os.path.join(self.assessment_result_path, report_path)
-        report_content = FileHelper.get_file_content(orig_file, "rb")
-
-        for solution_placeholer, solution_text in self.solution_texts.items():
-            report_content = report_content.replace(solution_placeholer,
-                                                    solution_text)
-
-        FileHelper.write_to_file(orig_file, "wb", report_content)
-
-    def load_solution_texts(self):
-        """Load solution texts into a dictionary."""
-        for dir_name in self.paths_to_all_modules:
-            section = dir_name.replace(
-                self.copied_module_set_path, "").replace("/", "_")
-            solution_placeholder = section + "_SOLUTION_MSG"
+        new_file = orig_file + ".new"
+        # a placeholder starting in the kept end of the chunk may continue
+        # in the next one
+        keep = max(self.placeholder_lengths or [1]) - 1
+        report = codecs.open(orig_file, "rb", settings.defenc)
+        try:
+            new_report = codecs.open(new_file, "wb", settings.defenc)
+            try:
+                data = ""
+                while True:
+                    chunk = report.read(settings.report_chunk_size)
+                    data += chunk
+                    end = len(data) if not chunk else len(data) - keep
+                    if end <= 0 and chunk:
+                        continue
+                    pos = 0
+                    for start, stop in self._find_placeholders(data, end):
+                        new_report.write(data[pos:start])
+                        new_report.write(self.get_solution_text(data[start:stop]))
+                        pos = stop
+                    end = max(pos, end)
+                    new_report.write(data[pos:end])
+                    data = data[end:]
+                    if not chunk:
+                        break
+            finally:
+                new_report.close()
+            report.close()
+            # the updated report is copied back instead of renamed, so the
+            # original keeps its mode, owner and SELinux context
+            src = open(new_file, "rb")
+            try:
+                dst = open(orig_file, "wb")
+                try:
+                    shutil.copyfileobj(src, dst, settings.report_chunk_size)
+                finally:
+                    dst.close()
+            finally:
+                src.close()
+        finally:
+            report.close()
+            if os.path.exists(new_file):
+                os.remove(new_file)
+
+    def _find_placeholders(self, data, end):
+        """
+        Yields (start, stop) of placeholders in data starting before end
 
+        The placeholders are found by their common suffix; the longest
+        known placeholder ending with the found suffix is used.
+        """
+        pos = 0
+        for match in self.suffix_re.finditer(data):
+            stop = match.end()
+            for length in self.placeholder_lengths:
+                start = stop - length
+                if start < pos:
+                    continue
+                if data[start:stop] in self.solution_dirs:
+                    if start >= end:
+                        return
+                    yield start, stop
+                    pos = stop
+                    break
+
+    def get_solution_text(self, solution_placeholder):
+        """Returns solution text of the placeholder converted to HTML"""
+        if solution_placeholder not in self.solution_texts:
             logger_report.debug("Processing solution placeholder '%s'",
                                 solution_placeholder)
             try:
                 solution_text = FileHelper.get_file_content(
-                    os.path.join(dir_name, settings.solution_txt), "rb")
+                    os.path.join(self.solution_dirs[solution_placeholder],
+                                 settings.solution_txt), "rb")
             except IOError:
                 # solution file is not mandatory
                 solution_text = ""
-
-            updated_solution_text = self.get_updated_solution(solution_text)
-            self.solution_texts[solution_placeholder] = updated_solution_text
+            self.solution_texts[solution_placeholder] = \
+                self.get_updated_solution(solution_text)
+        return self.solution_texts[solution_placeholder]
 
     def get_updated_solution(self, solution_text):
         """Function converts the solution text to HTML"""
@@ -141,7 +213,16 @@ class XmlManager(object):
         return formatted_text
 
     def get_module_dirs(self):
-        """Find all directories that contain a module."""
+        """
+        Find all directories that contain a module.
+
+        The directories are taken from the module manifest of the module set
+        when it exists; otherwise the assessment directory is walked.
+        """
+        modules = XccdfHelper.get_module_manifest(self.copied_module_set_path)
+        if modules is not None:
+            return [os.path.join(self.copied_module_set_path, x["path"])
+                    for x in modules]
         paths_to_all_modules = []
         for path, _, dir_files in os.walk(self.assessment_result_path):
             # Each module has its INI file
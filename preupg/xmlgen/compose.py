@@ -2,6 +2,7 @@ from __future__ import print_function, unicode_literals
 import os
 import sys
 import re
+import json
 import datetime
 import shutil
 
@@ -95,6 +96,17 @@ class XCCDFCompose(object):
             except IOError:
                 raise IOError("Error: Problem with writing file %s"
                               % report_filename)
+            manifest_filename = os.path.join(self.dst_path,
+                                             settings.module_manifest)
+            try:
+                FileHelper.write_to_file(
+                    manifest_filename, "wb",
+                    json.dumps(ComposeXML.get_module_manifest(
+                        target_tree, self.dst_path), indent=1))
+                logger_debug.debug('Generated: %s' % manifest_filename)
+            except IOError:
+                raise IOError("Error: Problem with writing file %s"
+                              % manifest_filename)
         return 0
 
     def get_compose_dir_name(self):
@@ -409,6 +421,44 @@ class ComposeXML(object):
                           % template_file)
         return target_tree
 
+    @staticmethod
+    def get_module_manifest(target_tree, dir_name):
+        """
+        Returns list of modules of the composed tree in order of the tree
+
+        Each module is a dict with its path relative to dir_name, rule id,
+        title, path of the solution file (None when the module has none)
+        and type of the check script ("sh" or "py").
+        """
+        modules = []
+        for rule in target_tree.findall(".//" + xccdf.XMLNS + "Rule"):
+            cref = rule.find("%scheck/%scheck-content-ref" % (xccdf.XMLNS,
+                                                              xccdf.XMLNS))
+            if cref is None:
+                continue
+            path = os.path.dirname(cref.get("href"))
+            solution = os.path.join(path, settings.solution_txt)
+            if not os.path.isfile(os.path.join(dir_name, solution)):
+                solution = None
+            script_type = "sh"
+            try:
+                lines = FileHelper.get_file_content(
+                    os.path.join(dir_name, cref.get("href")), "rb", True)
+                if lines and "python" in lines[0]:
+                    script_type = "py"
+            except IOError:
+                pass
+            title = rule.find(xccdf.XMLNS + "title")
+            modules.append({
+                "path": path,
+                "rule_id": rule.get("id"),
+                "title": (title.text or "").strip() if title is not None
+                         else "",
+                "solution": solution,
+                "script_type": script_type,
+            })
+        return modules
+
     @staticmethod
     def run_compose(dir_name, generate_from_ini=True):
         target_tree = ComposeXML.get_xml_tree()
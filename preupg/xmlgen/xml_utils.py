@@ -57,7 +57,8 @@ class XmlUtils(object):
         """
         allowed_tags = set(['content_description', 'content_title',
                             'applies_to', 'author', 'binary_req', 'bugzilla',
-                            'config_file', 'group_title', 'mode', 'requires'])
+                            'config_file', 'group_title', 'mode', 'requires',
+                            settings.module_run_after])
         for ini_file, ini_content in iter(self.ini_files.items()):
             ini_content_tags = set(ini_content.keys())
             different = ini_content_tags.difference(allowed_tags)
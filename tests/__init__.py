@@ -33,6 +33,11 @@ def suite():
     from tests import test_inplace_risks
     from tests import test_creator
     from tests import test_preupg_diff
+    from tests import test_common
+    from tests import test_sce_engine
+    from tests import test_scanning
+    from tests import test_tarball
+    from tests import test_upload
     suite.addTests(test_preupg.suite())
     suite.addTests(test_xml.suite())
     suite.addTests(test_generation.suite())
@@ -41,6 +46,11 @@ def suite():
     suite.addTests(test_inplace_risks.suite())
     suite.addTests(test_creator.suite())
     suite.addTests(test_preupg_diff.suite())
+    suite.addTests(test_common.suite())
+    suite.addTests(test_sce_engine.suite())
+    suite.addTests(test_scanning.suite())
+    suite.addTests(test_tarball.suite())
+    suite.addTests(test_upload.suite())
     return suite
 
 if __name__ == '__main__':
@@ -0,0 +1,97 @@
+"""
+Benchmark of the post-processing of the results after the scan
+
+Compares the former sequence of transformations, where each of them
+wrote the result file and parsed it again, with
+ReportParser.postprocess_results, which does all of them over one tree.
+
+Usage: python -m tests.benchmarks.report_parser [RULES]
+"""
+
+from __future__ import print_function, unicode_literals
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from preupg import report_parser
+from preupg.report_parser import ReportParser
+from tests.benchmarks.reports import generate_report
+
+
+class CallCounter(object):
+
+    """Counts calls of the parsing and serialization functions"""
+
+    functions = ['fromstring', 'parse', 'tostring']
+
+    def __init__(self):
+        self.calls = dict((x, 0) for x in self.functions)
+        self.originals = {}
+
+    def _wrap(self, name):
+        original = self.originals[name]
+
+        def wrapper(*args, **kwargs):
+            self.calls[name] += 1
+            return original(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        for name in self.functions:
+            self.originals[name] = getattr(report_parser.ElementTree, name)
+            setattr(report_parser.ElementTree, name, self._wrap(name))
+        return self
+
+    def __exit__(self, *args):
+        for name, original in self.originals.items():
+            setattr(report_parser.ElementTree, name, original)
+
+
+def legacy(path):
+    """Transformations as they were done by prepare_xml_for_html before"""
+    parser = ReportParser(path)
+    parser.reload_xml(path)
+    parser.strip_whitespaces()
+    parser.replace_inplace_risk()
+    parser.reload_xml(path)
+    parser.remove_debug_info()
+    parser.reload_xml(path)
+    parser.reload_xml(path)
+    parser.update_check_description()
+    parser.reload_xml(path)
+
+
+def single_pass(path):
+    parser = ReportParser(path)
+    parser.reload_xml(path)
+    parser.postprocess_results()
+
+
+def measure(function, path):
+    with CallCounter() as counter:
+        start = time.time()
+        function(path)
+        duration = time.time() - start
+    return duration, counter.calls
+
+
+def main(rules=2000):
+    temp_dir = tempfile.mkdtemp()
+    try:
+        print("Result file with %d rules" % rules)
+        for name, function in [('legacy', legacy),
+                               ('single pass', single_pass)]:
+            path = os.path.join(temp_dir, 'result.xml')
+            generate_report(path, rules)
+            duration, calls = measure(function, path)
+            print("%-12s %8.3fs  parsed: %d  serialized: %d" % (
+                name, duration, calls['fromstring'] + calls['parse'],
+                calls['tostring']))
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
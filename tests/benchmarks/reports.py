@@ -0,0 +1,88 @@
+"""
+Generator of big result files used by the benchmarks
+"""
+
+from __future__ import unicode_literals
+
+from preupg.utils import FileHelper
+
+XMLNS = "http://checklists.nist.gov/xccdf/1.2"
+
+RULE = """
+    <ns0:Rule id="xccdf_preupg_rule_{name}_check" selected="true">
+      <ns0:title xml:lang="en">Module {name}</ns0:title>
+      <ns0:description xml:lang="en">Module {name} checks the system.
+Details:
+The module checks some files.
+Expected results:
+pass=nothing found
+</ns0:description>
+      <ns0:check system="http://open-scap.org/page/SCE">
+        <ns0:check-import import-name="stdout"/>
+        <ns0:check-import import-name="stderr"/>
+        <ns0:check-content-ref href="{name}/check"/>
+      </ns0:check>
+    </ns0:Rule>"""
+
+RULE_RESULT = """
+    <ns0:rule-result idref="xccdf_preupg_rule_{name}_check" time="2016-08-24T17:39:11" weight="1.000000">
+      <ns0:result>{result}</ns0:result>
+      <ns0:check system="http://open-scap.org/page/SCE">
+        <ns0:check-import import-name="stdout">
+{stdout}
+
+
+</ns0:check-import>
+        <ns0:check-import import-name="stderr"> </ns0:check-import>
+        <ns0:check-content-ref href="{name}/check"/>
+      </ns0:check>
+    </ns0:rule-result>"""
+
+STDOUT = """preupg.log.DEBUG: Module {name} started
+preupg.log.INFO: Checking the configuration files of the module {name}
+preupg.risk.{risk}: The file /etc/{name}.conf was changed
+preupg.log.DEBUG: Module {name} finished"""
+
+LOG_LINE = """
+preupg.log.INFO: 2016-08-24 17:39 Line {line} of the output of {name}"""
+
+RISKS = ['SLIGHT', 'MEDIUM', 'HIGH', 'EXTREME']
+
+
+MODULE_GROUP = """
+    <ns0:Group id="xccdf_preupg_group_{name}" selected="true">
+      <ns0:title xml:lang="en">Module {name}</ns0:title>{rule}
+    </ns0:Group>"""
+
+
+def generate_report(path, rules, module_groups=False, log_lines=0):
+    """
+    Write result file with the given number of rules to path
+
+    With module_groups each rule is in a group of its own like in the
+    real contents; log_lines adds lines to stdout of each rule.
+    """
+    names = ['module%05d' % x for x in range(rules)]
+    content = ['<ns0:Benchmark xmlns:ns0="%s" id="xccdf_preupg-content_benchmark_all">' % XMLNS,
+               '  <ns0:Profile id="xccdf_preupg_profile_default">']
+    content.extend('    <ns0:select idref="xccdf_preupg_rule_%s_check" selected="true"/>' % x
+                   for x in names)
+    content.append('  </ns0:Profile>')
+    content.append('  <ns0:Group id="xccdf_preupg_group_modules" selected="true">')
+    if module_groups:
+        content.extend(MODULE_GROUP.format(name=x, rule=RULE.format(name=x))
+                       for x in names)
+    else:
+        content.extend(RULE.format(name=x) for x in names)
+    content.append('  </ns0:Group>')
+    content.append('  <ns0:TestResult id="xccdf_org.open-scap_testresult_xccdf_preupg_profile_default" start-time="2016-08-24T17:39:10" end-time="2016-08-24T17:41:12">')
+    for index, name in enumerate(names):
+        stdout = STDOUT.format(name=name, risk=RISKS[index % len(RISKS)])
+        stdout += ''.join(LOG_LINE.format(name=name, line=x)
+                          for x in range(log_lines))
+        content.append(RULE_RESULT.format(name=name, stdout=stdout,
+                                          result='fail' if index % 2 else 'pass'))
+    content.append('  </ns0:TestResult>')
+    content.append('</ns0:Benchmark>')
+    FileHelper.write_to_file(path, 'wb', '\n'.join(content))
+    return names
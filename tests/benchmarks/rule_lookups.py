@@ -0,0 +1,108 @@
+"""
+Benchmark of lookups of rules in ReportParser and ScanProgress
+
+Compares the former scans of all rules for each selected rule with the
+lookups by id.
+
+Usage: python -m tests.benchmarks.rule_lookups [RULES]
+"""
+
+from __future__ import print_function, unicode_literals
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from preupg.report_parser import ReportParser
+from preupg.scanning import ScanProgress
+from tests.benchmarks.reports import generate_report
+
+
+def legacy_get_name_of_checks(parser):
+    list_names = {}
+    rule_nodes = parser._get_all_rules()
+    for select in parser.get_allowed_selected_rules():
+        id_ref = select.get('idref', '')
+        rule = [x for x in rule_nodes if x.get('id', '') == id_ref]
+        list_names[id_ref] = parser.get_nodes_text(rule[0], "title")
+    return list_names
+
+
+def legacy_check_rules(parser, list_rules):
+    unknown_rules = []
+    for select in list_rules:
+        found = [i for i in parser.get_select_rules()
+                 if select in i.get('idref')]
+        if not found:
+            unknown_rules.append(select)
+    return unknown_rules
+
+
+def legacy_select_rules(parser, list_rules):
+    for select in parser.get_select_rules():
+        if select.get('idref', None) in list_rules:
+            select.set('selected', 'true')
+        else:
+            select.set('selected', 'false')
+
+
+def legacy_update_data(progress, changed_fields):
+    for index, row in enumerate(progress.output_data):
+        title, rule_id, dummy_result = row.split(':')
+        result_list = [x for x in changed_fields if rule_id in x]
+        if result_list:
+            progress.output_data[index] = "%s:%s:%s" % (
+                title, rule_id, result_list[0].split(':')[1])
+
+
+def select_rules(parser, list_rules):
+    # the same as ReportParser.select_rules without writing the file
+    list_rules = set(list_rules)
+    for select in parser.get_select_rules():
+        if select.get('idref', None) in list_rules:
+            select.set('selected', 'true')
+        else:
+            select.set('selected', 'false')
+
+
+def measure(name, function, *args):
+    start = time.time()
+    function(*args)
+    print("  %-20s %8.3fs" % (name, time.time() - start))
+
+
+def get_progress(names):
+    progress = ScanProgress(len(names), False, 'plain')
+    progress.output_data = ['Module %s:xccdf_preupg_rule_%s_check:fail' % (x, x)
+                            for x in names]
+    return progress
+
+
+def main(rules=5000):
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'all-xccdf.xml')
+        names = generate_report(path, rules)
+        ids = ['xccdf_preupg_rule_%s_check' % x for x in names]
+        changed = ['%s:needs_inspection' % x for x in ids[::2]]
+        print("%d rules" % rules)
+        print("legacy:")
+        parser = ReportParser(path)
+        measure('get_name_of_checks', legacy_get_name_of_checks, parser)
+        measure('check_rules', legacy_check_rules, parser, ids)
+        measure('select_rules', legacy_select_rules, parser, ids)
+        measure('update_data', legacy_update_data, get_progress(names),
+                changed)
+        print("indexed:")
+        parser = ReportParser(path)
+        measure('get_name_of_checks', parser.get_name_of_checks)
+        measure('check_rules', parser.check_rules, ids)
+        measure('select_rules', select_rules, parser, ids)
+        measure('update_data', get_progress(names).update_data, changed)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
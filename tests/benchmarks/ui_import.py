@@ -0,0 +1,234 @@
+"""
+Benchmark of the import of a result into the database of the UI
+
+Imports a synthetic report into an in-memory SQLite database with the
+former importer, which saved each group, test and test result separately,
+and with ReportImporter._add_to_db, which inserts them in bulk. The bulk
+import runs also as on databases which do not assign consecutive ids, where
+the ids of inserted rows are selected back. Then it calculates the
+statistics of groups with the former per-group queries and with
+ReportImporter._calculate_stats. Prints the time and the number of queries
+of each.
+
+Requires Django. Usage: python -m tests.benchmarks.ui_import [RULES]
+"""
+
+from __future__ import print_function, unicode_literals
+import datetime
+import shutil
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+
+RESULTS_DIR = tempfile.mkdtemp()
+settings.configure(
+    # queries are recorded only in debug mode
+    DEBUG=True,
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3',
+                           'NAME': ':memory:'}},
+    INSTALLED_APPS=('django.contrib.auth', 'django.contrib.contenttypes',
+                    'preupg.ui.config', 'preupg.ui.report'),
+    ROOT_URLCONF='preupg.ui.report.urls',
+    RESULTS_DIR=RESULTS_DIR,
+)
+
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import connection, transaction
+
+from preupg.ui.report.models import (Host, Run, Test, TestResult, TestLog,
+                                     TestGroup, TestGroupResult, Risk,
+                                     Address)
+from preupg.ui.report import service
+from preupg.ui.report.search import create_index
+from preupg.ui.report.service import ReportImporter, DATE_FORMAT
+
+RISKS = ['SLIGHT', 'MEDIUM', 'HIGH', 'EXTREME']
+
+
+def generate_parsed_data(rules):
+    """
+    Data of a report as returned by parse_xml_report: modules are in groups
+    of ten under one root group, each module is a group with one rule
+    """
+    groups = [{'xccdf_id': 'xccdf_preupg_group_all', 'title': 'All',
+               'rules': []}]
+    for index in range(rules):
+        name = 'module%05d' % index
+        if index % 10 == 0:
+            category = 'xccdf_preupg_group_category%05d' % index
+            groups.append({'xccdf_id': category, 'title': category,
+                           'parent': groups[0]['xccdf_id'], 'rules': []})
+        date = datetime.datetime(2016, 8, 24, 17, 39)
+        groups.append({
+            'xccdf_id': 'xccdf_preupg_group_%s' % name,
+            'title': 'Module %s' % name,
+            'parent': category,
+            'rules': [{
+                'id_ref': 'xccdf_preupg_rule_%s_check' % name,
+                'title': 'Module %s' % name,
+                'description': 'Module %s checks the system.' % name,
+                'fixtext': 'See <a href="__INSERT_URL__?path=%s">it</a>.' % name,
+                'result': 'fail' if index % 2 else 'pass',
+                'time': '2016-08-24T17:39:11',
+                'logs': [{'level': 'INFO', 'date': date,
+                          'message': 'Checking %s %d' % (name, x)}
+                         for x in range(3)],
+                'risks': [{'level': RISKS[index % len(RISKS)],
+                           'message': 'The file /etc/%s.conf was changed' % name}],
+            }],
+        })
+    return {'groups': groups, 'addresses': ['127.0.0.1'],
+            'host': 'localhost', 'identity': 'root'}
+
+
+@transaction.commit_on_success
+def legacy_add_to_db(importer):
+    """ReportImporter._add_to_db as it was before the bulk inserts"""
+    for address in importer.parsed_data['addresses']:
+        Address(address=address, result=importer.result).save()
+
+    test_keys = ['id_ref', 'title', 'description', 'fix', 'fix_type', 'fixtext']
+    group_keys = ['xccdf_id', 'title', ]
+    groups = {}
+    for group in importer.parsed_data['groups']:
+        group_dict = dict((key, group[key]) for key in group_keys if key in group)
+        if 'parent' in group:
+            group_dict['parent'] = groups[group['parent']][0]
+        tg = TestGroup.objects.create(**group_dict)
+
+        trg = TestGroupResult()
+        trg.group = tg
+        trg.result = importer.result
+        if 'parent' in group:
+            trg.parent = groups[group['parent']][1]
+        trg.save()
+        trg.root = trg.get_root()
+        groups[group_dict['xccdf_id']] = (tg, trg)
+
+        for rule in group['rules']:
+            test_dict = dict((key, rule[key]) for key in test_keys if key in rule)
+            test_dict['group'] = tg
+            try:
+                test_dict['fixtext'] = test_dict['fixtext'].replace(
+                    '__INSERT_URL__',
+                    reverse('show-file', args=(importer.result.id,))
+                )
+            except KeyError:
+                pass
+            t = Test.objects.create(**test_dict)
+
+            tr = TestResult()
+            try:
+                tr.set_state(rule['result'], False)
+            except KeyError:
+                continue
+            tr.date = datetime.datetime.strptime(rule['time'], DATE_FORMAT)
+            tr.test = t
+            tr.group = trg
+            tr.result = importer.result
+            tr.root_group = trg.get_root()
+            tr.save()
+
+            if 'logs' in rule:
+                TestLog.objects.bulk_create_logs(rule['logs'], tr)
+            if 'risks' in rule:
+                Risk.objects.bulk_create_logs(rule['risks'], tr)
+
+
+def legacy_calculate_stats(importer):
+    """ReportImporter._calculate_stats as it was before the aggregation"""
+    groups = []
+
+    def recurs(parent, child):
+        for gch in child.children():
+            recurs(child, gch)
+        child.failed_test_count += TestResult.objects.for_tgr(child).failed().count()
+        child.ni_test_count += TestResult.objects.for_tgr(child).ni().count()
+        child.na_test_count += TestResult.objects.for_tgr(child).na().count()
+        child.test_count += TestResult.objects.for_tgr(child).count()
+        if parent:
+            parent.failed_test_count += child.failed_test_count
+            parent.ni_test_count += child.ni_test_count
+            parent.na_test_count += child.na_test_count
+            parent.test_count += child.test_count
+        groups.append(child)
+
+    for group in importer.result.groups:
+        if group in groups:
+            continue
+        recurs(None, group)
+    for group in groups:
+        group.save()
+
+    result = importer.result
+    result.test_count = TestResult.objects.for_result(result).count()
+    result.failed_test_count = TestResult.objects.for_result(result).failed().count()
+    result.na_test_count = TestResult.objects.for_result(result).na().count()
+    result.ni_test_count = TestResult.objects.for_result(result).ni().count()
+    result.save()
+
+
+def add_to_db_selecting_ids(importer):
+    """ReportImporter._add_to_db on databases without consecutive ids"""
+    vendors = service.CONSECUTIVE_IDS_VENDORS
+    service.CONSECUTIVE_IDS_VENDORS = ()
+    try:
+        ReportImporter._add_to_db(importer)
+    finally:
+        service.CONSECUTIVE_IDS_VENDORS = vendors
+
+
+def summarize(result):
+    """Comparable form of the stored tree of groups and tests"""
+    return sorted(TestResult.objects.filter(result=result).values_list(
+        'test__id_ref', 'group__path', 'group__group__xccdf_id',
+        'root_group__path', 'testlog__message', 'risk__message'))
+
+
+def measure(parsed_data, add_to_db, calculate_stats):
+    # groups and tests stored by the previous import would be shared
+    call_command('flush', interactive=False, verbosity=0)
+    host = Host.objects.create(hostname='localhost')
+    hostrun = Run.objects.create_for_host(host).first_hostrun()
+    importer = ReportImporter(None, hostrun.id)
+    importer.parsed_data = parsed_data
+    measured = []
+    for function in [add_to_db, calculate_stats]:
+        connection.queries = []
+        start = time.time()
+        function(importer)
+        measured.append((time.time() - start, len(connection.queries)))
+    return measured, summarize(importer.result)
+
+
+def main(rules=700):
+    try:
+        call_command('syncdb', interactive=False, verbosity=0)
+        # the index is created by a migration
+        create_index()
+        parsed_data = generate_parsed_data(rules)
+        print("Report with %d rules" % rules)
+        stored = {}
+        for name, add_to_db, calculate_stats in [
+                ('legacy', legacy_add_to_db, legacy_calculate_stats),
+                ('bulk', ReportImporter._add_to_db,
+                 ReportImporter._calculate_stats),
+                ('selected', add_to_db_selecting_ids,
+                 ReportImporter._calculate_stats)]:
+            measured, stored[name] = measure(parsed_data, add_to_db,
+                                             calculate_stats)
+            for step, (duration, queries) in zip(['import', 'stats'], measured):
+                print("%-8s %-7s %8.3fs  queries: %6d" % (
+                    name, step, duration, queries))
+        if stored['bulk'] != stored['selected']:
+            raise AssertionError("Imports with consecutive and selected ids"
+                                 " differ")
+    finally:
+        shutil.rmtree(RESULTS_DIR)
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
@@ -0,0 +1,146 @@
+"""
+Benchmark of the rendering of the tree of a result in the UI
+
+Imports a synthetic report into an in-memory SQLite database and renders
+its tree with the former render_result, which scanned all groups and tests
+for each group, and with preupg.ui.utils.tree.render_result, which indexes
+them first. Prints the time and the number of queries of each, without
+filters, with a state filter and with a state filter and a search.
+
+Requires Django. Usage: python -m tests.benchmarks.ui_render [RULES]
+"""
+
+from __future__ import print_function, unicode_literals
+import shutil
+import sys
+import time
+
+# configures the settings of Django
+from tests.benchmarks import ui_import
+
+from django.core.management import call_command
+from django.db import connection
+from django.utils.datastructures import SortedDict
+
+from preupg.ui.config.models import AppSettings
+from preupg.ui.report.models import Host, Run, TestResult, TestGroupResult
+from preupg.ui.report.search import create_index
+from preupg.ui.report.service import ReportImporter
+from preupg.ui.utils.tree import render_result, RecursiveRenderer
+from preupg.ui.utils.views import get_states_to_filter
+
+
+class LegacyRecursiveFilter(object):
+
+    """RecursiveFilter as it was before the indexes"""
+
+    def __init__(self, groups, tests):
+        self.groups = groups
+        self.tests = tests
+        self.test_ids = tests.values_list('id', flat=True)
+
+    def get_children(self, group):
+        return [x for x in self.groups if x.parent and x.parent.id == group.id]
+
+    def testresults_filter(self, group):
+        if hasattr(group, 'filtered_tests'):
+            return group.filtered_tests[:]
+        groups_tests = [x for x in self.tests if x.group.id == group.id]
+        group.filtered_tests = []
+        for groups_test in groups_tests:
+            if groups_test.id in iter(self.test_ids):
+                group.filtered_tests.append(groups_test)
+        return group.filtered_tests[:]
+
+    def subelements_filter(self, group):
+        if hasattr(group, 'allfiltered_tests'):
+            return group.allfiltered_tests[:]
+        allfiltered_tests = self.testresults_filter(group)
+        for child in self.get_children(group):
+            allfiltered_tests += self.subelements_filter(child)
+        group.allfiltered_tests = allfiltered_tests
+        return allfiltered_tests[:]
+
+
+def legacy_render_result(result, search_string=None, get=None):
+    """render_result as it was before the indexes"""
+    filtering_active = bool(search_string or get)
+    state_filter = TestResult.TEST_STATES.list_keys(get_states_to_filter(get))
+    if not state_filter:
+        state_filter = TestResult.TEST_STATES.list_keys(AppSettings.get_initial_state_filter())
+    groups = TestGroupResult.objects.for_result(result)
+    root_groups = groups.root()
+    tests = TestResult.objects.for_result(result).by_states(state_filter)
+    if search_string:
+        groups = groups.search_in_title(search_string)
+        tests = tests.search_in_title(search_string)
+    groups = groups.select_related('parent', 'group', 'group__parent')
+    tests = tests.select_related().prefetch_related('testlog_set', 'risk_set')
+
+    rf = LegacyRecursiveFilter(groups, tests)
+
+    def is_requested(group, force=False):
+        count = len(rf.subelements_filter(group))
+        if count > 0 or force:
+            group.displayed_count = count
+            return True
+        return False
+
+    def filter_children(children, level):
+        ch_dict = SortedDict()
+        for child in children:
+            child.left_margin = level + 1
+            child.child_left_margin = level + 2
+            if is_requested(child, level == -1 and not filtering_active):
+                groups_gchildren = rf.get_children(child)
+                if len(groups_gchildren) > 0:
+                    ch_dict[child] = filter_children(groups_gchildren, level + 1)
+                else:
+                    ch_dict[child] = None
+        return ch_dict
+
+    if not filtering_active:
+        root_groups = filter(lambda x: x.parent is None, groups)
+    return RecursiveRenderer(filter_children(root_groups, -1)).render()
+
+
+def summarize(rendered):
+    """Comparable form of the rendered tree"""
+    return [(kind, item if kind == 'TAG' else item.id) for kind, item in rendered]
+
+
+def main(rules=1000):
+    try:
+        call_command('syncdb', interactive=False, verbosity=0)
+        # the index is created by a migration
+        create_index()
+        host = Host.objects.create(hostname='localhost')
+        hostrun = Run.objects.create_for_host(host).first_hostrun()
+        importer = ReportImporter(None, hostrun.id)
+        importer.parsed_data = ui_import.generate_parsed_data(rules)
+        importer._add_to_db()
+        importer._calculate_stats()
+        result = importer.result
+
+        print("Result with %d rules" % rules)
+        for filters, search_string, get in [
+                ('none', None, None),
+                ('state', None, {'fail%d' % result.id: 'on'}),
+                ('search', '0', {'fail%d' % result.id: 'on'})]:
+            rendered = []
+            for name, function in [('legacy', legacy_render_result),
+                                   ('indexed', render_result)]:
+                connection.queries = []
+                start = time.time()
+                rendered.append(summarize(function(result, search_string, get)))
+                print("%-8s %-7s %8.3fs  queries: %4d  items: %5d" % (
+                    name, filters, time.time() - start,
+                    len(connection.queries), len(rendered[-1])))
+            if rendered[0] != rendered[1]:
+                raise AssertionError("Rendered trees differ")
+    finally:
+        shutil.rmtree(ui_import.RESULTS_DIR)
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
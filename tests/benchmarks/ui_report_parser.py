@@ -0,0 +1,92 @@
+"""
+Benchmark of the parsing of results in the UI
+
+Compares XMLReportParser with the former scan of all rules for each
+rule-result and per-line regular expressions and strptime, and the tree
+and streaming modes of parse_report. Each mode runs in a process of its
+own, so the peak memory of the process can be reported.
+
+Usage: python -m tests.benchmarks.ui_report_parser [RULES] [LOG_LINES]
+"""
+
+from __future__ import print_function, unicode_literals
+from datetime import datetime
+import multiprocessing
+import os
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from preupg.ui.report.processing import XMLReportParser
+from tests.benchmarks.reports import generate_report
+
+
+class LegacyXMLReportParser(XMLReportParser):
+
+    """XMLReportParser as it was before the lookups by id"""
+
+    def get_test(self, key):
+        return [x for x in self.rules if x['id_ref'] == key][0]
+
+    def parse_test_result_logs(self, text):
+        if not text:
+            return None, None
+        log_regex = "preupg\\.log\\.(?P<level>(ERROR|WARNING|INFO|DEBUG)): (?P<date_str>\\S+) (?P<time>\\S+) (?P<message>.+)"
+        risk_regex = "preupg\\.risk\\.(?P<level>\\w+): (?P<message>.+)"
+        logs = []
+        risks = []
+        for line in text.strip().split('\n'):
+            match = re.match(log_regex, line)
+            if match:
+                match_dict = match.groupdict()
+                dt = match_dict['date_str'] + ' ' + match_dict['time']
+                try:
+                    match_dict['date'] = datetime.strptime(dt, '%Y-%m-%d %H:%M')
+                except ValueError:
+                    match_dict['date'] = None
+                logs.append(match_dict)
+            else:
+                match = re.match(risk_regex, line)
+                if match:
+                    risks.append(match.groupdict())
+        return logs, risks
+
+
+def run(parser_class, path, stream, queue):
+    start = time.time()
+    parser_class(path).parse_report(stream)
+    queue.put((time.time() - start,
+               resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+
+def measure(name, parser_class, path, stream):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run,
+                                      args=(parser_class, path, stream, queue))
+    process.start()
+    process.join()
+    if process.exitcode:
+        raise RuntimeError("Parsing with %s failed" % name)
+    duration, maxrss = queue.get()
+    print("%-8s %8.3fs  peak RSS: %7d kB" % (name, duration, maxrss))
+
+
+def main(rules=3000, log_lines=100):
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'all-xccdf.xml')
+        generate_report(path, rules, module_groups=True, log_lines=log_lines)
+        print("%d rules, %d lines of logs each, %d kB" % (
+            rules, log_lines, os.path.getsize(path) // 1024))
+        measure('legacy', LegacyXMLReportParser, path, False)
+        measure('tree', XMLReportParser, path, False)
+        measure('stream', XMLReportParser, path, True)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -0,0 +1,84 @@
+"""
+Benchmark of the search in logs and risks of all results in the UI
+
+Imports synthetic reports into an in-memory SQLite database and searches
+their logs and risks with case-insensitive LIKE queries on TestLog and Risk,
+which scan all rows, and with preupg.ui.report.search.find, which uses the
+full-text index. Prints the time and the number of hits of each, for a word
+found in every result and for a word found in few logs, and the time of
+removing one result from the index.
+
+Requires Django. Usage: python -m tests.benchmarks.ui_search [RESULTS [RULES]]
+"""
+
+from __future__ import print_function, unicode_literals
+import shutil
+import sys
+import time
+
+# configures the settings of Django
+from tests.benchmarks import ui_import
+
+from django.core.management import call_command
+
+from preupg.ui.report.models import Host, Run, TestLog, Risk
+from preupg.ui.report.search import create_index, get_backend, find, remove_result
+from preupg.ui.report.service import ReportImporter
+
+
+def legacy_find(query, limit):
+    """Search without the index"""
+    hits = []
+    for kind, model in [('log', TestLog), ('risk', Risk)]:
+        objects = model.objects.filter(message__icontains=query) \
+            .select_related('result__result', 'result__test') \
+            .order_by('-id')[:limit]
+        hits += [(kind, obj.result.id) for obj in objects]
+    return hits
+
+
+def indexed_find(query, limit):
+    """Search with the index"""
+    hits = []
+    for kind in ['log', 'risk']:
+        hits += [(kind, hit['test_result'].id)
+                 for hit in find(query, kind=kind, limit=limit)]
+    return hits
+
+
+def main(results=20, rules=500):
+    try:
+        call_command('syncdb', interactive=False, verbosity=0)
+        # the index is created by a migration
+        create_index()
+        host = Host.objects.create(hostname='localhost')
+        for _ in range(results):
+            hostrun = Run.objects.create_for_host(host).first_hostrun()
+            importer = ReportImporter(None, hostrun.id)
+            importer.parsed_data = ui_import.generate_parsed_data(rules)
+            importer._add_to_db()
+
+        print("%d results with %d rules, index: %s" % (results, rules, get_backend()))
+        # large enough limit to return all hits of both
+        limit = results * rules * 4
+        for query in ['module00042', 'conf']:
+            hits = []
+            for name, function in [
+                    ('legacy', legacy_find),
+                    ('indexed', indexed_find)]:
+                start = time.time()
+                hits.append(sorted(function(query, limit)))
+                print("%-8s %-12s %8.3fs  hits: %6d" % (
+                    name, query, time.time() - start, len(hits[-1])))
+            if hits[0] != hits[1]:
+                raise AssertionError("Hits differ")
+        # done by each deletion and re-import of a result
+        start = time.time()
+        remove_result(importer.result.id)
+        print("%-21s %8.3fs" % ('remove result', time.time() - start))
+    finally:
+        shutil.rmtree(ui_import.RESULTS_DIR)
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -80,10 +80,17 @@ class TestAPICheck(base.TestCase):
         expected_service_disabled = "foonetwork"
         self.assertTrue(script_api.service_is_enabled(expected_service_enabled))
         self.assertFalse(script_api.service_is_enabled(expected_service_disabled))
+        # only the exact service name matches
+        self.assertFalse(script_api.service_is_enabled("fo"))
+        self.assertTrue(script_api.service_is_enabled("foo", runlevel=3))
+        self.assertFalse(script_api.service_is_enabled("foo", runlevel=4))
 
     def test_config_file_changed(self):
         self.assertTrue(script_api.config_file_changed("/etc/foo/test.conf"))
         self.assertFalse(script_api.config_file_changed("/etc/foobar/test.conf"))
+        # only the exact path matches
+        self.assertFalse(script_api.config_file_changed("/etc/foo"))
+        self.assertFalse(script_api.config_file_changed("test.conf"))
 
     def test_is_dist_native(self):
         self.assertTrue(script_api.is_dist_native('foobar'))
@@ -102,6 +109,35 @@ class TestAPICheck(base.TestCase):
                          'footest']
         self.assertEqual(script_api.get_dist_native_list(), expected_list)
 
+    def test_dist_native_precomputed_list(self):
+        # the list stored by preupg is used instead of the logs
+        cache_dir = os.path.join(self.dirname, 'cache')
+        os.makedirs(cache_dir)
+        rpm_qa = script_api.VALUE_RPM_QA
+        devel_mode = script_api.DEVEL_MODE
+        dist_native = script_api.DIST_NATIVE
+        try:
+            script_api.VALUE_RPM_QA = os.path.join(cache_dir, 'rpm_qa.log')
+            shutil.copyfile(rpm_qa, script_api.VALUE_RPM_QA)
+            FileHelper.write_to_file(
+                os.path.join(cache_dir, settings.dist_native_list), 'wb',
+                '#mode\t1\tall\nfoobar\t1\nnew-package\t0\n')
+            script_api.DEVEL_MODE = 1
+            script_api.DIST_NATIVE = "all"
+            self.assertTrue(script_api.is_pkg_installed('new-package'))
+            self.assertFalse(script_api.is_dist_native('new-package'))
+            self.assertFalse(script_api.is_pkg_installed('testbar'))
+            self.assertEqual(script_api.get_dist_native_list(), ['foobar'])
+            # the list is not valid for other mode
+            script_api.DIST_NATIVE = "sign"
+            self.assertEqual(script_api.get_dist_native_list(),
+                             ['foobar', 'barfoo', 'testbar', 'footest'])
+        finally:
+            script_api.VALUE_RPM_QA = rpm_qa
+            script_api.DEVEL_MODE = devel_mode
+            script_api.DIST_NATIVE = dist_native
+            shutil.rmtree(cache_dir)
+
     def test_add_pkg_to_kickstart(self):
         expected_list = ['my_foo_pkg', 'my_bar_pkg']
         script_api.add_pkg_to_kickstart(['my_foo_pkg', 'my_bar_pkg'])
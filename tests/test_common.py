@@ -0,0 +1,312 @@
+from __future__ import unicode_literals
+import unittest
+import tempfile
+import shutil
+import os
+import sys
+import threading
+import time
+import traceback
+
+from preupg.common import Common
+from preupg.conf import Conf, DummyConf
+from preupg.scheduler import TaskScheduler, SchedulerError
+from preupg.walker import FilesystemWalker, ExternalSorter
+from preupg.package_index import PackageIndex, write_dist_native_list, \
+    read_dist_native_list
+from preupg.utils import FileHelper
+from preupg import settings
+
+try:
+    import base
+except ImportError:
+    import tests.base as base
+
+
+class TestTaskScheduler(base.TestCase):
+
+    def test_requires_order(self):
+        finished = []
+        lock = threading.Lock()
+
+        def task(name, delay):
+            time.sleep(delay)
+            lock.acquire()
+            finished.append(name)
+            lock.release()
+            return name
+
+        scheduler = TaskScheduler(4)
+        scheduler.add_task('slow', task, args=('slow', 0.2))
+        scheduler.add_task('fast', task, args=('fast', 0))
+        scheduler.add_task('after_slow', task, args=('after_slow', 0),
+                           requires=['slow', 'not_scheduled'])
+        results = scheduler.run()
+        self.assertEqual(finished, ['fast', 'slow', 'after_slow'])
+        self.assertEqual(results['after_slow'], 'after_slow')
+
+    def test_jobs_limit(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def task():
+            lock.acquire()
+            running.append(1)
+            peak.append(len(running))
+            lock.release()
+            time.sleep(0.05)
+            lock.acquire()
+            running.pop()
+            lock.release()
+
+        scheduler = TaskScheduler(2)
+        for index in range(6):
+            scheduler.add_task(index, task)
+        scheduler.run()
+        self.assertEqual(max(peak), 2)
+
+    def test_cyclic_requires(self):
+        scheduler = TaskScheduler(2)
+        scheduler.add_task('a', lambda: None, requires=['b'])
+        scheduler.add_task('b', lambda: None, requires=['a'])
+        self.assertRaises(SchedulerError, scheduler.run)
+
+    def test_failed_task(self):
+        def fail():
+            raise IOError("failed")
+
+        started = []
+        scheduler = TaskScheduler(1)
+        scheduler.add_task('fail', fail)
+        scheduler.add_task('next', lambda: started.append(1),
+                           requires=['fail'])
+        try:
+            scheduler.run()
+        except IOError:
+            # the traceback leads to the failed task
+            frames = traceback.extract_tb(sys.exc_info()[2])
+            self.assertEqual(frames[-1][2], 'fail')
+        else:
+            self.fail("IOError not raised")
+        self.assertEqual(started, [])
+
+
+class TestFilesystemWalker(base.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.root = os.path.join(self.temp_dir, 'root')
+        os.makedirs(os.path.join(self.root, 'bin'))
+        os.makedirs(os.path.join(self.root, 'etc', 'conf.d'))
+        for name, mode in [('bin/tool', 0o755), ('bin/data', 0o644),
+                           ('etc/conf.d/a.conf', 0o600), ('etc/b', 0o700)]:
+            path = os.path.join(self.root, name)
+            FileHelper.write_to_file(path, 'wb', '')
+            os.chmod(path, mode)
+        os.symlink('tool', os.path.join(self.root, 'bin', 'link'))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _get_lines(self, path):
+        return [x.rstrip('\n') for x in
+                FileHelper.get_file_content(path, 'rb', method=True)]
+
+    def test_projections(self):
+        all_files = os.path.join(self.temp_dir, 'all.log')
+        executables = os.path.join(self.temp_dir, 'executable.log')
+        walker = FilesystemWalker([self.root], chunk_size=3,
+                                  temp_dir=self.temp_dir)
+        walker.add_projection(all_files, 'all')
+        walker.add_projection(executables, 'executable')
+        walker.run()
+        expected = [self.root] + [os.path.join(self.root, x) for x in
+                                  ['bin', 'bin/data', 'bin/link', 'bin/tool',
+                                   'etc', 'etc/b', 'etc/conf.d',
+                                   'etc/conf.d/a.conf']]
+        self.assertEqual(self._get_lines(all_files), sorted(expected))
+        self.assertEqual(self._get_lines(executables),
+                         [os.path.join(self.root, 'bin/tool'),
+                          os.path.join(self.root, 'etc/b')])
+
+    def test_external_sort(self):
+        output = os.path.join(self.temp_dir, 'sorted.log')
+        sorter = ExternalSorter(chunk_size=2, temp_dir=self.temp_dir)
+        lines = [b'%d\n' % x for x in [5, 3, 9, 1, 7, 2, 8]]
+        for line in lines:
+            sorter.add(line)
+        sorter.write(output)
+        self.assertEqual(FileHelper.get_file_content(output, 'rb', True, False),
+                         sorted(lines))
+
+
+class TestCommonResults(base.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.scripts = os.path.join(self.temp_dir, 'scripts.txt')
+        lines = ['sleep 0.2; echo first=first.log=FIRST=First log=NO\n',
+                 '# commented out\n',
+                 'cat first.log=second.log=SECOND=Second log=NO\n',
+                 'echo third=third.log=THIRD=Third log=NO\n']
+        FileHelper.write_to_file(self.scripts, 'wb', lines)
+        self.common_requires = settings.common_requires
+        settings.common_requires = {'second.log': ['first.log']}
+
+    def tearDown(self):
+        settings.common_requires = self.common_requires
+        shutil.rmtree(self.temp_dir)
+
+    def _get_common(self, refresh_common=False):
+        conf = DummyConf(common_scripts=self.scripts,
+                         cache_dir=self.temp_dir,
+                         refresh_common=refresh_common,
+                         jobs=3)
+        return Common(Conf(conf, settings))
+
+    def test_common_results(self):
+        common = self._get_common()
+        self.assertEqual(common.common_results(), 1)
+        for log_file, content in [('first.log', 'first\n'),
+                                  ('second.log', 'first\n'),
+                                  ('third.log', 'third\n')]:
+            self.assertEqual(FileHelper.get_file_content(
+                common.common_logfiles(log_file), 'rb'), content)
+
+
+class TestCommonCache(TestCommonResults):
+
+    def setUp(self):
+        TestCommonResults.setUp(self)
+        self.input_file = os.path.join(self.temp_dir, 'input')
+        self.runs_file = os.path.join(self.temp_dir, 'runs')
+        FileHelper.write_to_file(self.input_file, 'wb', 'first\n')
+        lines = ['echo first >> %s; cat %s=first.log=FIRST=First log=NO\n'
+                 % (self.runs_file, self.input_file),
+                 'echo second >> %s; cat first.log=second.log=SECOND=Second'
+                 ' log=NO\n' % self.runs_file,
+                 'echo third >> %s=third.log=THIRD=Third log=NO\n'
+                 % self.runs_file]
+        FileHelper.write_to_file(self.scripts, 'wb', lines)
+        self.common_inputs = settings.common_inputs
+        settings.common_inputs = {'first.log': [self.input_file]}
+
+    def tearDown(self):
+        settings.common_inputs = self.common_inputs
+        TestCommonResults.tearDown(self)
+
+    def _get_runs(self):
+        runs = FileHelper.get_file_content(self.runs_file, 'rb', method=True)
+        os.remove(self.runs_file)
+        return sorted(x.strip() for x in runs)
+
+    def test_common_results(self):
+        self.assertEqual(self._get_common().common_results(), 1)
+        self.assertEqual(self._get_runs(), ['first', 'second', 'third'])
+        # only the log without inputs is generated again
+        self.assertEqual(self._get_common().common_results(), 1)
+        self.assertEqual(self._get_runs(), ['third'])
+        # changed input invalidates the log and the logs which require it
+        FileHelper.write_to_file(self.input_file, 'wb', 'changed input\n')
+        self.assertEqual(self._get_common().common_results(), 1)
+        self.assertEqual(self._get_runs(), ['first', 'second', 'third'])
+        self.assertEqual(self._get_common(True).common_results(), 1)
+        self.assertEqual(self._get_runs(), ['first', 'second', 'third'])
+
+    def test_input_dir(self):
+        input_dir = os.path.join(self.temp_dir, 'input.d')
+        os.mkdir(input_dir)
+        config = os.path.join(input_dir, 'config')
+        FileHelper.write_to_file(config, 'wb', 'disable = no\n')
+        settings.common_inputs = {'first.log': [input_dir]}
+        common = self._get_common()
+        fingerprint = common.get_fingerprint('cmd', 'first.log')
+        dir_stat = os.stat(input_dir)
+        # file edited in place without change of the directory
+        FileHelper.write_to_file(config, 'wb', 'disable = yes\n')
+        os.utime(config, (dir_stat.st_atime, dir_stat.st_mtime + 10))
+        os.utime(input_dir, (dir_stat.st_atime, dir_stat.st_mtime))
+        self.assertNotEqual(common.get_fingerprint('cmd', 'first.log'),
+                            fingerprint)
+
+
+class TestPackageIndex(base.TestCase):
+
+    api_files = os.path.join(os.path.dirname(__file__), 'api_files')
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.rpm_qa = os.path.join(self.temp_dir, 'rpm_qa.log')
+        self.rpm_rhsigned = os.path.join(self.temp_dir, 'rpm_rhsigned.log')
+        shutil.copyfile(os.path.join(self.api_files, 'rpm_qa'), self.rpm_qa)
+        shutil.copyfile(os.path.join(self.api_files, 'rpm_rhsigned'),
+                        self.rpm_rhsigned)
+        self.db_path = os.path.join(self.temp_dir, settings.package_index_db)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _check_index(self, index):
+        self.assertTrue(index.is_installed('preupgrade-assistant'))
+        self.assertFalse(index.is_installed('preupgrade-assistant-modules'))
+        self.assertTrue(index.is_signed('foobar'))
+        self.assertFalse(index.is_signed('preupgrade-assistant'))
+        self.assertEqual(index.get_vendor('testbar'), 'Bar Foo')
+        self.assertEqual(index.get_names(), ['foobar', 'barfoo', 'testbar',
+                                             'footest',
+                                             'preupgrade-assistant'])
+
+    def test_from_logs(self):
+        self._check_index(PackageIndex.from_logs(self.rpm_qa,
+                                                 self.rpm_rhsigned))
+
+    def test_db(self):
+        self.assertEqual(PackageIndex.from_db(self.db_path, self.rpm_qa,
+                                              self.rpm_rhsigned), None)
+        PackageIndex.from_logs(self.rpm_qa, self.rpm_rhsigned).write_db(
+            self.db_path, self.rpm_qa, self.rpm_rhsigned)
+        index = PackageIndex.from_db(self.db_path, self.rpm_qa,
+                                     self.rpm_rhsigned)
+        self._check_index(index)
+        index.close()
+        # the index built from other logs is not used
+        FileHelper.write_to_file(self.rpm_qa, 'ab', 'new\tVendor\t(none)\n')
+        self.assertEqual(PackageIndex.from_db(self.db_path, self.rpm_qa,
+                                              self.rpm_rhsigned), None)
+
+    def test_dist_native_list(self):
+        index = PackageIndex.from_logs(self.rpm_qa, self.rpm_rhsigned)
+        path = os.path.join(self.temp_dir, settings.dist_native_list)
+        logs = [self.rpm_qa, self.rpm_rhsigned]
+        listed = os.path.join(self.temp_dir, 'dist_native')
+        FileHelper.write_to_file(listed, 'wb', 'testbar\nnon-sense\n')
+        for devel_mode, dist_native, expected in [
+                (0, listed, ['foobar', 'barfoo', 'testbar', 'footest']),
+                (1, 'all', index.get_names()),
+                (1, listed, ['testbar'])]:
+            write_dist_native_list(path, index, devel_mode, dist_native)
+            packages = read_dist_native_list(path, logs, devel_mode,
+                                             dist_native)
+            self.assertEqual([x[0] for x in packages], index.get_names())
+            self.assertEqual([x[0] for x in packages if x[1]], expected)
+        # the list is not used for other mode nor when the logs are newer
+        self.assertEqual(read_dist_native_list(path, logs, 1, 'all'), None)
+        stat = os.stat(path)
+        os.utime(self.rpm_qa, (stat.st_atime, stat.st_mtime + 10))
+        self.assertEqual(read_dist_native_list(path, logs, 1, listed), None)
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestTaskScheduler))
+    suite.addTest(loader.loadTestsFromTestCase(TestFilesystemWalker))
+    suite.addTest(loader.loadTestsFromTestCase(TestCommonResults))
+    suite.addTest(loader.loadTestsFromTestCase(TestCommonCache))
+    suite.addTest(loader.loadTestsFromTestCase(TestPackageIndex))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=3).run(suite())
@@ -6,6 +6,9 @@ import os
 from glob import glob
 
 from preupg.xmlgen.compose import XCCDFCompose, ComposeXML
+from preupg.xccdf import XccdfHelper
+from preupg.report_parser import ReportParser
+from preupg.xml_manager import XmlManager
 from preupg.utils import FileHelper
 from preupg import settings
 
@@ -72,6 +75,37 @@ class TestGlobalContent(base.TestCase):
         self.assertTrue(os.path.exists(all_xccdf))
         dummy_lines = FileHelper.get_file_content(all_xccdf, 'rb')
 
+    def test_module_manifest(self):
+        xccdf_compose = XCCDFCompose(os.path.join(self.temp_dir, FOO_DIR))
+        xccdf_compose.generate_xml()
+        modules = XccdfHelper.get_module_manifest(self.result_dir)
+        by_path = dict((x['path'], x) for x in modules)
+        self.assertEqual(by_path['pass'], {
+            'path': 'pass',
+            'rule_id': 'xccdf_preupg_rule_pass_check',
+            'title': 'dummy_pass',
+            'solution': 'pass/solution.txt',
+            'script_type': 'sh'})
+        # the manifest agrees with the composed all-xccdf.xml
+        all_xccdf = os.path.join(self.result_dir,
+                                 settings.all_xccdf_xml_filename)
+        parser = ReportParser(all_xccdf)
+        rules = parser._get_all_rules()
+        self.assertEqual([x['rule_id'] for x in modules],
+                         [x.get('id') for x in rules])
+        self.assertEqual(XccdfHelper.get_list_rules(all_xccdf),
+                         [x.get('id') for x in rules])
+        titles = dict((x.get('id'), parser.get_nodes_text(x, 'title'))
+                      for x in rules)
+        self.assertEqual(parser.get_name_of_checks(), titles)
+        # modules are not searched for in the directory tree
+        os.makedirs(os.path.join(self.result_dir, 'not_a_module'))
+        FileHelper.write_to_file(os.path.join(
+            self.result_dir, 'not_a_module', settings.check_script), 'wb', '')
+        self.assertEqual(
+            sorted(XmlManager(self.temp_dir, self.result_dir).get_module_dirs()),
+            sorted(os.path.join(self.result_dir, x) for x in by_path))
+
 
 def suite():
     loader = unittest.TestLoader()
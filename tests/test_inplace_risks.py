@@ -5,6 +5,7 @@ import shutil
 import os
 
 from preupg.xccdf import XccdfHelper
+from preupg.report_parser import ReportParser
 from preupg.utils import FileHelper
 from preupg import settings
 from preupg.settings import ModuleValues
@@ -162,11 +163,50 @@ class TestCombinedRiskCheck(base.TestCase):
         self.assertEqual(self._update_xccdf_file(['not_applicable', 'pass'], [None, None]), ModuleValues.NOT_ALL)
 
 
+class TestPostprocessResults(base.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        xccdf_file = os.path.join(os.getcwd(), 'tests', 'generated_results', 'inplace_risk_test.xml')
+        content = FileHelper.get_file_content(xccdf_file, 'rb', decode_flag=False)
+        content = content.replace(b'INPLACE_TAG',
+                                  b'preupg.risk.MEDIUM: Test risk\n'
+                                  b'preupg.log.DEBUG: Test debug message')
+        content = content.replace(b'RESULT_VALUE', b'fail')
+        self.paths = []
+        for name in ['steps.xml', 'pipeline.xml']:
+            path = os.path.join(self.temp_dir, name)
+            FileHelper.write_to_file(path, 'wb', content, False)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_postprocess_results(self):
+        parser = ReportParser(self.paths[0])
+        parser.strip_whitespaces()
+        parser.replace_inplace_risk()
+        parser.remove_debug_info()
+        parser.reload_xml(self.paths[0])
+        parser.update_check_description()
+
+        parser = ReportParser(self.paths[1])
+        parser.postprocess_results()
+        content = FileHelper.get_file_content(self.paths[1], 'rb')
+        self.assertEqual(FileHelper.get_file_content(self.paths[0], 'rb'),
+                         content)
+        self.assertFalse('preupg.log.DEBUG' in content)
+        results = [parser.get_nodes_text(x, 'result')
+                   for x in parser.get_all_result_rules()]
+        self.assertEqual(results[0], settings.needs_inspection)
+
+
 def suite():
     loader = unittest.TestLoader()
     suite = unittest.TestSuite()
     suite.addTest(loader.loadTestsFromTestCase(TestRiskCheck))
     suite.addTest(loader.loadTestsFromTestCase(TestCombinedRiskCheck))
+    suite.addTest(loader.loadTestsFromTestCase(TestPostprocessResults))
     return suite
 
 if __name__ == '__main__':
@@ -8,7 +8,7 @@ from preupg.application import Application
 from preupg.conf import Conf, DummyConf
 from preupg.cli import CLI
 from preupg import settings, xml_manager
-from preupg.utils import (PostupgradeHelper, FileHelper,
+from preupg.utils import (PostupgradeHelper, FileHelper, ProcessHelper,
                           OpenSCAPHelper, ModuleSetUtils)
 from preupg.report_parser import ReportParser
 
@@ -222,6 +222,35 @@ class TestHashes(base.TestCase):
         self.assertTrue(return_value)
 
 
+class TestProcessHelper(base.TestCase):
+
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+        self.chunk_size = settings.subprocess_chunk_size
+
+    def tearDown(self):
+        settings.subprocess_chunk_size = self.chunk_size
+        shutil.rmtree(self.dir_name)
+
+    def test_output_file(self):
+        settings.subprocess_chunk_size = 7
+        output = os.path.join(self.dir_name, "output")
+        cmd = "seq 1 1000; echo error >&2; exit 3"
+        self.assertEqual(ProcessHelper.run_subprocess(cmd, output=output,
+                                                      shell=True), 3)
+        expected = ''.join("%d\n" % x for x in range(1, 1001)) + "error\n"
+        self.assertEqual(FileHelper.get_file_content(output, 'rb'), expected)
+
+    def test_function(self):
+        lines = []
+        output = os.path.join(self.dir_name, "output")
+        ProcessHelper.run_subprocess(["printf", "first\\nsecond\\n"],
+                                     output=output, function=lines.append)
+        self.assertEqual(lines, ["first\n", "second\n"])
+        self.assertEqual(FileHelper.get_file_content(output, 'rb'),
+                         "first\nsecond\n")
+
+
 class TestSolutionReplacement(base.TestCase):
 
     def test_solution_bold_tag(self):
@@ -261,6 +290,109 @@ class TestSolutionReplacement(base.TestCase):
         self.assertEqual(expected_text, line)
 
 
+class TestRuleIndex(base.TestCase):
+
+    rules = ['xccdf_preupg_rule_first_check', 'xccdf_preupg_rule_second_check']
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'all-xccdf.xml')
+        selects = ''.join('<select idref="%s" selected="true"/>' % x
+                          for x in self.rules)
+        rules = ''.join('<Rule id="%s"><title>Title of %s</title></Rule>'
+                        % (x, x) for x in self.rules)
+        FileHelper.write_to_file(
+            self.path, 'wb',
+            '<Benchmark xmlns="http://checklists.nist.gov/xccdf/1.2">'
+            '<Profile id="xccdf_preupg_profile_default">%s</Profile>'
+            '<Group id="xccdf_preupg_group_modules">%s</Group>'
+            '</Benchmark>' % (selects, rules))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_lookups(self):
+        rp = ReportParser(self.path)
+        self.assertEqual(rp.get_rule(self.rules[0]).get('id'), self.rules[0])
+        self.assertEqual(rp.get_rule('unknown'), None)
+        self.assertEqual(rp.get_name_of_checks(),
+                         dict((x, 'Title of ' + x) for x in self.rules))
+        self.assertEqual(rp.check_rules([self.rules[1], 'first', 'unknown']),
+                         ['unknown'])
+        rp.select_rules([self.rules[1]])
+        self.assertEqual(rp.get_name_of_checks(),
+                         {self.rules[1]: 'Title of ' + self.rules[1]})
+
+    def test_reload_invalidates_index(self):
+        rp = ReportParser(self.path)
+        self.assertTrue(rp.get_select(self.rules[0]) is not None)
+        FileHelper.write_to_file(
+            self.path, 'wb',
+            '<Benchmark xmlns="http://checklists.nist.gov/xccdf/1.2">'
+            '<Profile id="xccdf_preupg_profile_default"/></Benchmark>')
+        rp.reload_xml(self.path)
+        self.assertEqual(rp.get_select(self.rules[0]), None)
+        self.assertEqual(rp.check_rules([self.rules[0]]), [self.rules[0]])
+
+
+class TestUpdateReport(base.TestCase):
+
+    def setUp(self):
+        self.result_dir = tempfile.mkdtemp()
+        self.module_set = os.path.join(self.result_dir, 'FOOBAR6_7')
+        self.chunk_size = settings.report_chunk_size
+        solutions = {'foo/bar': 'Solution of [bold:foo/bar] & more\n',
+                     'bar': 'Solution of bar',
+                     'unused': 'Not used',
+                     'nosolution': None}
+        for module, solution in solutions.items():
+            module_dir = os.path.join(self.module_set, module)
+            os.makedirs(module_dir)
+            FileHelper.write_to_file(
+                os.path.join(module_dir, settings.check_script), 'wb', '')
+            if solution is not None:
+                FileHelper.write_to_file(
+                    os.path.join(module_dir, settings.solution_txt), 'wb',
+                    solution)
+
+    def tearDown(self):
+        settings.report_chunk_size = self.chunk_size
+        shutil.rmtree(self.result_dir)
+
+    def test_update_report(self):
+        report = ('<p>_foo_bar_SOLUTION_MSG</p><p>_bar_SOLUTION_MSG</p>'
+                  '<p>_nosolution_SOLUTION_MSG</p>_unknown_SOLUTION_MSG'
+                  '\u017e\n') * 20
+        expected = ('<p>Solution of <b>foo/bar</b> &amp; more<br/>\n</p>'
+                    '<p>Solution of bar</p><p></p>_unknown_SOLUTION_MSG'
+                    '\u017e\n') * 20
+        # placeholders split by the chunks are replaced as well
+        for chunk_size in [5, 16, 1048576]:
+            settings.report_chunk_size = chunk_size
+            FileHelper.write_to_file(
+                os.path.join(self.result_dir, 'result.html'), 'wb', report)
+            xml_mgr = xml_manager.XmlManager(self.result_dir,
+                                             self.module_set)
+            xml_mgr.update_report('result.html')
+            self.assertEqual(FileHelper.get_file_content(
+                os.path.join(self.result_dir, 'result.html'), 'rb'), expected)
+            # only solutions of found placeholders are loaded
+            self.assertEqual(sorted(xml_mgr.solution_texts),
+                             ['_bar_SOLUTION_MSG', '_foo_bar_SOLUTION_MSG',
+                              '_nosolution_SOLUTION_MSG'])
+
+    def test_update_report_keeps_file(self):
+        path = os.path.join(self.result_dir, 'result.html')
+        FileHelper.write_to_file(path, 'wb', '<p>_bar_SOLUTION_MSG</p>')
+        os.chmod(path, 0o640)
+        inode = os.stat(path).st_ino
+        xml_manager.XmlManager(self.result_dir,
+                               self.module_set).update_report('result.html')
+        self.assertEqual(os.stat(path).st_ino, inode)
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+        self.assertFalse(os.path.exists(path + '.new'))
+
+
 class TestModuleSet(base.TestCase):
     '''
     Test get_scenario method, to get directory with modules
@@ -361,7 +493,10 @@ def suite():
     suite.addTest(loader.loadTestsFromTestCase(TestPreupgUpgrade))
     suite.addTest(loader.loadTestsFromTestCase(TestCLI))
     suite.addTest(loader.loadTestsFromTestCase(TestHashes))
+    suite.addTest(loader.loadTestsFromTestCase(TestProcessHelper))
     suite.addTest(loader.loadTestsFromTestCase(TestSolutionReplacement))
+    suite.addTest(loader.loadTestsFromTestCase(TestUpdateReport))
+    suite.addTest(loader.loadTestsFromTestCase(TestRuleIndex))
     suite.addTest(loader.loadTestsFromTestCase(TestXMLUpdates))
     suite.addTest(loader.loadTestsFromTestCase(TestModuleSet))
     suite.addTest(loader.loadTestsFromTestCase(TestModuleSetConfigParse))
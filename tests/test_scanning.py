@@ -0,0 +1,100 @@
+from __future__ import unicode_literals
+import unittest
+import tempfile
+import json
+import sys
+
+from preupg.scanning import ScanProgress
+from preupg import settings
+
+try:
+    import base
+except ImportError:
+    import tests.base as base
+
+
+class TestScanProgress(base.TestCase):
+
+    names = {'xccdf_preupg_rule_a_check': 'First module',
+             'xccdf_preupg_rule_b_check': 'Second module'}
+
+    def setUp(self):
+        self.stdout = sys.stdout
+        sys.stdout = tempfile.TemporaryFile('w+')
+        self.refresh_interval = settings.progress_refresh_interval
+
+    def tearDown(self):
+        sys.stdout.close()
+        sys.stdout = self.stdout
+        settings.progress_refresh_interval = self.refresh_interval
+
+    def _run(self, output_format, lines):
+        progress = ScanProgress(len(self.names), False, output_format)
+        progress.set_names(self.names)
+        progress.start()
+        for line in lines:
+            progress.show_progress(line)
+        output_before_finish = self._get_output()
+        progress.finish()
+        return progress, output_before_finish, self._get_output()
+
+    def _get_output(self):
+        sys.stdout.flush()
+        sys.stdout.seek(0)
+        return sys.stdout.read()
+
+    def test_plain(self):
+        progress, dummy_output, output = self._run(
+            'plain', ['xccdf_preupg_rule_a_check:pass\n',
+                      'xccdf_preupg_rule_b_check:fail\n'])
+        lines = output.splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('001/002 done    (First module)'))
+        self.assertTrue(lines[1].startswith('002/002 done    (Second module)'))
+        self.assertFalse('\r' in output or '\b' in output)
+        self.assertEqual(progress.get_output_data(),
+                         ['First module:xccdf_preupg_rule_a_check:pass',
+                          'Second module:xccdf_preupg_rule_b_check:fail'])
+
+    def test_update_data(self):
+        progress, dummy_output, dummy_output = self._run(
+            'plain', ['xccdf_preupg_rule_a_check:fail\n',
+                      'xccdf_preupg_rule_b_check:fail\n'])
+        progress.update_data(['xccdf_preupg_rule_b_check:needs_inspection'])
+        self.assertEqual(progress.get_output_data(),
+                         ['First module:xccdf_preupg_rule_a_check:fail',
+                          'Second module:xccdf_preupg_rule_b_check:'
+                          'needs_inspection'])
+
+    def test_json(self):
+        dummy_progress, dummy_output, output = self._run(
+            'json', ['xccdf_preupg_rule_b_check:fail\n', 'some output\n'])
+        events = [json.loads(x) for x in output.splitlines()]
+        self.assertEqual([x['event'] for x in events],
+                         ['started', 'rule', 'output', 'finished'])
+        self.assertEqual(events[1]['rule'], 'xccdf_preupg_rule_b_check')
+        self.assertEqual(events[1]['title'], 'Second module')
+        self.assertEqual(events[1]['result'], 'fail')
+        self.assertEqual(events[2]['text'], 'some output')
+
+    def test_tty_rate_limit(self):
+        settings.progress_refresh_interval = 3600
+        dummy_progress, output_before_finish, output = self._run(
+            'tty', ['xccdf_preupg_rule_a_check:pass\n',
+                    'xccdf_preupg_rule_b_check:fail\n'])
+        # finished rules are printed on the next redraw
+        self.assertFalse('done' in output_before_finish)
+        self.assertTrue('001/002 ...running (First module)' in
+                        output_before_finish)
+        self.assertTrue('002/002 done    (Second module)' in output)
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestScanProgress))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=3).run(suite())
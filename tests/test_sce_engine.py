@@ -0,0 +1,147 @@
+from __future__ import unicode_literals
+import unittest
+import tempfile
+import shutil
+import os
+import threading
+
+from preupg.sce_engine import SCEEngine
+from preupg.report_parser import ReportParser
+from preupg.utils import FileHelper
+from preupg import settings
+
+try:
+    import base
+except ImportError:
+    import tests.base as base
+
+BENCHMARK = """<?xml version="1.0" encoding="UTF-8"?>
+<Benchmark xmlns="http://checklists.nist.gov/xccdf/1.2" id="xccdf_preupg-content_benchmark_all">
+  <version>1.0</version>
+  <Profile id="xccdf_preupg_profile_default">
+    <select idref="xccdf_preupg_rule_first_check" selected="true"/>
+    <select idref="xccdf_preupg_rule_second_check" selected="true"/>
+    <select idref="xccdf_preupg_rule_skipped_check" selected="false"/>
+  </Profile>
+  <Value id="xccdf_preupg_value_report_dir" type="string">
+    <value>{report_dir}</value>
+  </Value>
+  <Group id="xccdf_preupg_group_modules">
+    {rules}
+  </Group>
+</Benchmark>
+"""
+
+RULE = """
+    <Rule id="xccdf_preupg_rule_{name}_check" selected="true">
+      <title>{name}</title>
+      <check system="http://open-scap.org/page/SCE">
+        <check-import import-name="stdout"/>
+        <check-import import-name="stderr"/>
+        <check-export export-name="REPORT_DIR" value-id="xccdf_preupg_value_report_dir"/>
+        <check-content-ref href="{name}/check"/>
+      </check>
+    </Rule>
+"""
+
+
+class TestSCEEngine(base.TestCase):
+
+    modules = {
+        # the first module is slow; the second has to wait for it
+        'first': ('sleep 0.3; echo first >> "$XCCDF_VALUE_REPORT_DIR/order"\n'
+                  'echo "first output"\nexit $XCCDF_RESULT_PASS\n', None),
+        'second': ('echo second >> "$XCCDF_VALUE_REPORT_DIR/order"\n'
+                   'echo "second error" >&2\nexit $XCCDF_RESULT_FAIL\n',
+                   'first'),
+        'skipped': ('exit $XCCDF_RESULT_PASS\n', None),
+    }
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for name, (script, run_after) in self.modules.items():
+            module_dir = os.path.join(self.temp_dir, name)
+            os.makedirs(module_dir)
+            check = os.path.join(module_dir, settings.check_script)
+            FileHelper.write_to_file(check, 'wb', '#!/bin/bash\n' + script)
+            os.chmod(check, 0o755)
+            if run_after:
+                FileHelper.write_to_file(
+                    os.path.join(module_dir, settings.module_ini), 'wb',
+                    '[preupgrade]\n%s = %s\n' % (settings.module_run_after,
+                                                 run_after))
+        rules = ''.join(RULE.format(name=x) for x in sorted(self.modules))
+        self.content = os.path.join(self.temp_dir, settings.all_xccdf_xml_filename)
+        FileHelper.write_to_file(
+            self.content, 'wb',
+            BENCHMARK.format(rules=rules, report_dir=self.temp_dir))
+        self.result = os.path.join(self.temp_dir, 'result.xml')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_run(self):
+        progress = []
+        engine = SCEEngine(self.content, self.result,
+                           'xccdf_preupg_profile_default', jobs=4)
+        self.assertEqual(engine.run(function=progress.append), 0)
+        self.assertEqual(progress, ['xccdf_preupg_rule_first_check:pass\n',
+                                    'xccdf_preupg_rule_second_check:fail\n'])
+        self.assertEqual(FileHelper.get_file_content(
+            os.path.join(self.temp_dir, 'order'), 'rb'), 'first\nsecond\n')
+
+        parser = ReportParser(self.result)
+        results = {}
+        outputs = {}
+        for rule in parser.get_all_result_rules():
+            results[rule.get('idref')] = parser.get_nodes_text(rule, 'result')
+            for node in parser.filter_grandchildren(rule, 'check',
+                                                    'check-import'):
+                outputs[(rule.get('idref'), node.get('import-name'))] = \
+                    (node.text or '').strip()
+        self.assertEqual(results, {
+            'xccdf_preupg_rule_first_check': 'pass',
+            'xccdf_preupg_rule_second_check': 'fail',
+            'xccdf_preupg_rule_skipped_check': 'notselected'})
+        self.assertEqual(
+            outputs[('xccdf_preupg_rule_first_check', 'stdout')],
+            'first output')
+        self.assertEqual(
+            outputs[('xccdf_preupg_rule_second_check', 'stderr')],
+            'second error')
+
+    def test_timeout(self):
+        FileHelper.write_to_file(
+            os.path.join(self.temp_dir, 'first', settings.check_script),
+            'wb', '#!/bin/bash\nsleep 10\nexit $XCCDF_RESULT_PASS\n')
+        progress = []
+        engine = SCEEngine(self.content, self.result,
+                           'xccdf_preupg_profile_default', jobs=4, timeout=1)
+        engine.run(function=progress.append)
+        self.assertEqual(progress, ['xccdf_preupg_rule_first_check:error\n',
+                                    'xccdf_preupg_rule_second_check:fail\n'])
+        timing = engine.timings['xccdf_preupg_rule_first_check']
+        self.assertTrue(timing['timed_out'])
+        self.assertTrue(timing['wall_time'] < 5)
+        timing = engine.timings['xccdf_preupg_rule_second_check']
+        self.assertFalse(timing['timed_out'])
+        for key in ['user_time', 'system_time', 'max_rss', 'read_bytes',
+                    'write_bytes']:
+            self.assertTrue(key in timing)
+
+    def test_kill_finished(self):
+        # the timer fired after the check was reaped
+        state = {'finished': True, 'killed': False}
+        SCEEngine._kill(None, threading.Lock(), state)
+        self.assertFalse(state['killed'])
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestSCEEngine))
+    return suite
+
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=3).run(suite())
@@ -0,0 +1,115 @@
+from __future__ import unicode_literals
+import unittest
+import tarfile
+import tempfile
+import shutil
+import struct
+import os
+
+from preupg import settings
+from preupg.tarball import TarballWriter, acl_to_text, is_gzip
+from preupg.utils import FileHelper, TarballHelper
+
+try:
+    import base
+except ImportError:
+    import tests.base as base
+
+
+class TestTarball(base.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = os.path.join(self.temp_dir, 'results')
+        os.makedirs(os.path.join(self.source, 'dirtyconf', 'etc'))
+        self.content = b''.join(struct.pack('<I', x) for x in range(50000))
+        FileHelper.write_to_file(
+            os.path.join(self.source, 'dirtyconf', 'etc', 'big'), 'wb',
+            self.content, False)
+        os.symlink('big', os.path.join(self.source, 'dirtyconf', 'etc', 'link'))
+        self.block_size = settings.tarball_block_size
+        settings.tarball_block_size = 4096
+
+    def tearDown(self):
+        settings.tarball_block_size = self.block_size
+        shutil.rmtree(self.temp_dir)
+
+    def _check_tarball(self, path):
+        tar = tarfile.open(path, 'r:gz')
+        try:
+            self.assertEqual(tar.getnames(),
+                             ['results', 'results/dirtyconf',
+                              'results/dirtyconf/etc',
+                              'results/dirtyconf/etc/big',
+                              'results/dirtyconf/etc/link'])
+            for member in tar.getmembers():
+                self.assertEqual(member.uname, '')
+                self.assertEqual(member.gname, '')
+            self.assertEqual(tar.getmember('results/dirtyconf/etc/link').linkname,
+                             'big')
+            member = tar.extractfile('results/dirtyconf/etc/big')
+            self.assertEqual(member.read(), self.content)
+        finally:
+            tar.close()
+
+    def test_gzip(self):
+        path = os.path.join(self.temp_dir, 'results.tar.gz')
+        writer = TarballWriter(path, 'gzip', 6, 1)
+        writer.add(self.source, 'results')
+        writer.close()
+        self._check_tarball(path)
+
+    def test_parallel_gzip(self):
+        path = os.path.join(self.temp_dir, 'results.tar.gz')
+        writer = TarballWriter(path, 'gzip', 1, 4)
+        writer.add(self.source, 'results')
+        writer.close()
+        self._check_tarball(path)
+
+    def test_abort(self):
+        path = os.path.join(self.temp_dir, 'results.tar.gz')
+        writer = TarballWriter(path, 'gzip', 6, 2)
+        writer.add(self.source, 'results')
+        writer.abort()
+        self.assertFalse(os.path.exists(path))
+
+    def test_tarball_result_dir(self):
+        saved = (settings.assessment_results_dir, settings.tarball_result_dir)
+        settings.assessment_results_dir = self.source
+        settings.tarball_result_dir = os.path.join(self.temp_dir, 'tarballs')
+        try:
+            tarball = TarballHelper.tarball_result_dir('preupg_results-{0}',
+                                                       False)
+        finally:
+            settings.assessment_results_dir, settings.tarball_result_dir = saved
+        self.assertEqual(os.path.dirname(tarball),
+                         os.path.join(self.temp_dir, 'tarballs'))
+        self.assertTrue(tarball.endswith('.tar.gz'))
+        self.assertTrue(is_gzip(tarball))
+        # the assessment directory keeps the tarball as well
+        self.assertEqual(
+            FileHelper.get_file_content(os.path.join(
+                self.source, os.path.basename(tarball)), 'rb', False, False),
+            FileHelper.get_file_content(tarball, 'rb', False, False))
+        self.assertFalse(is_gzip(os.path.join(self.source, 'dirtyconf',
+                                              'etc', 'big')))
+
+    def test_acl_to_text(self):
+        entries = [(0x01, 6, 0xffffffff), (0x02, 4, 1000),
+                   (0x04, 5, 0xffffffff), (0x10, 7, 0xffffffff),
+                   (0x20, 0, 0xffffffff)]
+        data = struct.pack('<I', 2) + b''.join(
+            struct.pack('<HHI', *x) for x in entries)
+        self.assertEqual(acl_to_text(data),
+                         'user::rw-\nuser:1000:r--\ngroup::r-x\n'
+                         'mask::rwx\nother::---')
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestTarball))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=3).run(suite())
@@ -0,0 +1,134 @@
+from __future__ import unicode_literals
+import unittest
+import tempfile
+import hashlib
+import socket
+import shutil
+import os
+
+try:
+    import xmlrpclib
+except ImportError:
+    import xmlrpc.client as xmlrpclib
+
+from preupg.upload import ChunkedUpload, get_file_checksum
+from preupg.utils import FileHelper
+
+try:
+    import base
+except ImportError:
+    import tests.base as base
+
+
+class UploadServer(object):
+
+    """In-memory server side of the chunked upload protocol"""
+
+    def __init__(self, fail_calls=()):
+        self.sessions = {}
+        self.calls = 0
+        self.fail_calls = fail_calls
+        self.committed = None
+        self.submit = self
+
+    def _call(self, opts):
+        # the same limits as the real transport
+        xmlrpclib.dumps((opts, ))
+        self.calls += 1
+        if self.calls in self.fail_calls:
+            raise socket.error("connection reset")
+
+    def upload_open(self, opts):
+        self._call(opts)
+        session = self.sessions.setdefault(opts['checksum'],
+                                           [int(opts['size']), b''])
+        return {'status': 'OK', 'upload_id': opts['checksum'],
+                'offset': str(len(session[1]))}
+
+    def upload_chunk(self, opts):
+        self._call(opts)
+        session = self.sessions[opts['upload_id']]
+        data = opts['data'].data
+        if hashlib.sha256(data).hexdigest() != opts['checksum']:
+            return {'status': 'ERROR', 'message': 'checksum'}
+        if int(opts['offset']) == len(session[1]):
+            session[1] += data
+        return {'status': 'OK', 'offset': str(len(session[1]))}
+
+    def upload_commit(self, opts):
+        self._call(opts)
+        self.committed = self.sessions.pop(opts['upload_id'])[1]
+        return {'status': 'OK', 'url': 'http://localhost/results/1/'}
+
+
+class TestChunkedUpload(base.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'results.tar.gz')
+        self.content = os.urandom(10000)
+        FileHelper.write_to_file(self.path, 'wb', self.content, False)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_upload(self):
+        server = UploadServer()
+        upload = ChunkedUpload(server, self.path, 'localhost', chunk_size=1024)
+        self.assertEqual(upload.checksum,
+                         hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(upload.open()['status'], 'OK')
+        self.assertEqual(upload.offset, 0)
+        self.assertEqual(upload.send()['status'], 'OK')
+        self.assertEqual(server.committed, self.content)
+        # open, 10 chunks and commit
+        self.assertEqual(server.calls, 12)
+
+    def test_resume(self):
+        # the connection fails on the 4th chunk, on the first attempt to
+        # resume and on the commit
+        server = UploadServer(fail_calls=(5, 6, 14))
+        upload = ChunkedUpload(server, self.path, 'localhost',
+                               chunk_size=1024, retries=2)
+        upload.open()
+        self.assertEqual(upload.send()['status'], 'OK')
+        self.assertEqual(server.committed, self.content)
+
+    def test_resume_next_run(self):
+        server = UploadServer(fail_calls=range(5, 10))
+        upload = ChunkedUpload(server, self.path, 'localhost',
+                               chunk_size=1024, retries=2)
+        upload.open()
+        self.assertRaises(socket.error, upload.send)
+        # a new upload of the same tarball continues where the last stopped
+        upload = ChunkedUpload(server, self.path, 'localhost', chunk_size=1024)
+        self.assertEqual(upload.open()['status'], 'OK')
+        self.assertEqual(upload.offset, 3072)
+        self.assertEqual(upload.send()['status'], 'OK')
+        self.assertEqual(server.committed, self.content)
+
+    def test_large_tarball(self):
+        upload = ChunkedUpload(UploadServer(), self.path, 'localhost')
+        # sizes over 2 GiB do not fit XML-RPC integers
+        upload.size = 3 * 1024 ** 3
+        self.assertEqual(upload.open()['status'], 'OK')
+        upload.offset = 2 * 1024 ** 3
+        f = open(self.path, 'rb')
+        try:
+            self.assertEqual(upload._send_chunk(f)['status'], 'OK')
+        finally:
+            f.close()
+
+    def test_file_checksum(self):
+        self.assertEqual(get_file_checksum(self.path, 999),
+                         hashlib.sha256(self.content).hexdigest())
+
+
+def suite():
+    loader = unittest.TestLoader()
+    suite = unittest.TestSuite()
+    suite.addTest(loader.loadTestsFromTestCase(TestChunkedUpload))
+    return suite
+
+if __name__ == '__main__':
+    unittest.TextTestRunner(verbosity=3).run(suite())